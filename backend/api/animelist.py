@@ -0,0 +1,241 @@
+"""
+Query options of ``cached-animelist``.
+
+    ?fields=mal_id,title,image_url     only these keys (grid views skip dates and scores)
+    ?status=watching,on_hold           only these list statuses
+    ?ordering=-last_updated            or last_updated
+    ?limit=100&cursor=...              one page at a time
+    ?since=<watermark>                 only what changed since then (delta feed)
+
+Without ``limit``/``cursor`` the whole (filtered) list is streamed, as before.
+Pages are keyset-paginated on ``(last_updated, id)`` within the user, which
+the ``entry_user_last_updated_id`` index serves in either direction: a page
+costs the same at the end of a long list as at its start, unlike OFFSET.
+The cursor is opaque to clients; it holds the ordering and the sort key of
+the last row sent. Entries without ``last_updated`` sort as the oldest.
+
+Replicas: every response carries a watermark (``X-Watermark``, or in the
+body of a delta). ``since=<watermark>`` returns the entries written after it,
+from ``updated_at``, and the ``mal_id`` of entries deleted after it, from
+``AnimeEntryTombstone``. The watermark trails the clock by ``DELTA_OVERLAP``
+so a sync committing while the response is read is picked up by the next
+delta; the overlap means a few rows can come twice, which replicas apply
+idempotently.
+"""
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import fastjson
+from .models import AnimeEntry, AnimeEntryTombstone
+from .sync import TOMBSTONE_RETENTION
+
+# Output key -> what to select; the catalog ones are joined only when asked for
+LIST_FIELDS = {
+    "mal_id": "mal_id",
+    "status": "status",
+    "score": "score",
+    "episodes_watched": "episodes_watched",
+    "is_rewatching": "is_rewatching",
+    "start_date": "start_date",
+    "finish_date": "finish_date",
+    "last_updated": "last_updated",
+    "title": F("anime__title"),
+    "image_url": F("anime__image_url"),
+}
+
+ORDERINGS = ("-last_updated", "last_updated")
+DEFAULT_ORDERING = "-last_updated"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Watermarks are this far behind the clock (see the module docstring)
+DELTA_OVERLAP = timedelta(seconds=5)
+
+# Options that don't apply to a delta
+_NOT_WITH_SINCE = ("status", "ordering", "limit", "cursor")
+
+# Aggregates the cached-animelist ETag is made of (see views.anime_list_etag)
+SUMMARY = {"latest": Max("updated_at"), "catalog": Max("anime__list_fields_changed_at"), "count": Count("id")}
+
+# Sort key of each row, selected under names no list field uses
+_KEY_FIELDS = {"_cursor_last_updated": F("last_updated"), "_cursor_id": F("id")}
+
+
+def parse_query(params):
+    """
+    Options from the request's query ``params``. Raises ValueError, with a
+    message for the client, on unknown fields or ordering or a bad cursor.
+    """
+    fields = list(LIST_FIELDS)
+    if params.get("fields"):
+        fields = [f.strip() for f in params["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in LIST_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(LIST_FIELDS)}")
+
+    statuses = [s.strip() for s in params.get("status", "").split(",") if s.strip()]
+
+    ordering = params.get("ordering") or None
+    if ordering is not None and ordering not in ORDERINGS:
+        raise ValueError(f"Unknown ordering: {ordering}. Allowed: {', '.join(ORDERINGS)}")
+
+    since = None
+    if params.get("since"):
+        since = parse_since(params["since"])
+        combined = [name for name in _NOT_WITH_SINCE if name in params]
+        if combined:
+            raise ValueError(f"since can't be combined with {', '.join(combined)}")
+
+    paginated = "limit" in params or "cursor" in params
+    cursor = None
+    if params.get("cursor"):
+        cursor = decode_cursor(params["cursor"])
+        if ordering is not None and cursor["ordering"] != ordering:
+            raise ValueError("The cursor belongs to another ordering")
+        ordering = cursor["ordering"]
+
+    limit = None
+    if paginated:
+        ordering = ordering or DEFAULT_ORDERING
+        try:
+            limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            limit = DEFAULT_PAGE_SIZE
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+
+    return {
+        "fields": fields, "statuses": statuses, "ordering": ordering, "limit": limit, "cursor": cursor,
+        "since": since,
+    }
+
+
+def parse_since(value):
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        since = None
+    if since is None:
+        raise ValueError("Invalid since, expected a watermark from a previous response")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def watermark(now=None):
+    """The watermark for a response whose rows are read from now on"""
+    mark = (now or timezone.now()) - DELTA_OVERLAP
+    return mark.astimezone(dt_timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def since_expired(since, now=None):
+    """True when tombstones from ``since`` on may have been pruned already"""
+    return since < (now or timezone.now()) - TOMBSTONE_RETENTION
+
+
+def encode_cursor(ordering, last_updated, pk):
+    raw = fastjson.dumps([ordering, last_updated.isoformat() if last_updated else None, pk])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        ordering, last_updated, pk = fastjson.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if ordering not in ORDERINGS or not isinstance(pk, int):
+            raise ValueError
+        return {
+            "ordering": ordering,
+            "last_updated": datetime.fromisoformat(last_updated) if last_updated else None,
+            "id": pk,
+        }
+    except (ValueError, TypeError, fastjson.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def _segments(cursor, descending):
+    """
+    Filters for the rows after ``cursor``, in page order. Undated rows come
+    last newest-first and first oldest-first; they are a separate segment
+    because an ``OR last_updated IS NULL`` would stop the index range seek.
+    """
+    last_updated, pk = (cursor["last_updated"], cursor["id"]) if cursor else (None, None)
+    dated, undated = Q(last_updated__isnull=False), Q(last_updated__isnull=True)
+    if descending:
+        if cursor is None:
+            return [dated, undated]
+        if last_updated is None:
+            return [undated & Q(id__lt=pk)]
+        return [Q(last_updated__lte=last_updated) & (Q(last_updated__lt=last_updated) | Q(id__lt=pk)), undated]
+    if cursor is None:
+        return [undated, dated]
+    if last_updated is None:
+        return [undated & Q(id__gt=pk), dated]
+    return [Q(last_updated__gte=last_updated) & (Q(last_updated__gt=last_updated) | Q(id__gt=pk))]
+
+
+def _projection(user, query, with_key=False):
+    entries = AnimeEntry.objects.filter(user=user)
+    if query["statuses"]:
+        entries = entries.filter(status__in=query["statuses"])
+    names = [f for f in query["fields"] if isinstance(LIST_FIELDS[f], str)]
+    expressions = {f: LIST_FIELDS[f] for f in query["fields"] if f not in names}
+    if with_key:
+        expressions.update(_KEY_FIELDS)
+    return entries.values(*names, **expressions)
+
+
+def rows(user, query):
+    """
+    The user's entries as the dicts ``cached-animelist`` returns, narrowed
+    by ``query`` (from ``parse_query``). Unordered unless asked for.
+    """
+    entries = _projection(user, query)
+    if query["ordering"] == "-last_updated":
+        entries = entries.order_by(F("last_updated").desc(nulls_last=True), "-id")
+    elif query["ordering"] == "last_updated":
+        entries = entries.order_by(F("last_updated").asc(nulls_first=True), "id")
+    return entries
+
+
+def changes(user, query):
+    """
+    The delta since ``query["since"]``: the rows written after it (as
+    ``rows`` returns them) and the ``mal_id`` of entries deleted after it.
+    Entries whose title or picture changed in the catalog count as written
+    when those are among the fields.
+    """
+    since = query["since"]
+    written = Q(updated_at__gt=since)
+    if {"title", "image_url"} & set(query["fields"]):
+        written |= Q(anime__list_fields_changed_at__gt=since)
+    deleted = AnimeEntryTombstone.objects.filter(user=user, deleted_at__gt=since).values_list("mal_id", flat=True)
+    return _projection(user, query).filter(written), list(deleted)
+
+
+def page(user, query):
+    """One page of ``rows`` and the cursor of the next one (None on the last page)"""
+    limit = query["limit"]
+    descending = query["ordering"].startswith("-")
+    entries = _projection(user, query, with_key=True).order_by(
+        *(("-last_updated", "-id") if descending else ("last_updated", "id"))
+    )
+    results = []
+    for segment in _segments(query["cursor"], descending):
+        # One more than a page, to know whether there is a next one
+        results += entries.filter(segment)[:limit + 1 - len(results)]
+        if len(results) > limit:
+            break
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor(query["ordering"], last["_cursor_last_updated"], last["_cursor_id"])
+    for row in results:
+        for key in _KEY_FIELDS:
+            del row[key]
+    return results, next_cursor
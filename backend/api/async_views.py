@@ -0,0 +1,343 @@
+"""
+Native async versions of the I/O-bound endpoints.
+
+These are plain Django async views (DRF's ``@api_view`` is sync-only), so JWT
+authentication is done by hand through ``LoggingJWTAuthentication``. They are
+routed in place of the sync views when ``ASYNC_VIEWS`` is enabled and the app
+is served through ``backend.asgi``, letting one process keep many MAL calls in
+flight instead of pinning a worker thread for each round-trip.
+"""
+import asyncio
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import LoggingJWTAuthentication
+from .mal_client import AsyncMALClient, MALError, async_mal_client
+from .models import SyncJob, UserProfile
+from . import cache as api_cache
+from . import animelist, catalog, progress, ranking_cache, recommendation_cache, streaming, views
+from .conditional import etag_matches, not_modified, with_etag
+from .fastjson import FastJsonResponse
+from .sync import ingest_fetched_list
+from .search_cache import (
+    canonical_query, clamp_limit, limit_bucket, aget_cached, aset_cached, slice_results,
+    DEFAULT_SEARCH_LIMIT,
+)
+
+logger = logging.getLogger(__name__)
+
+POSTHOG_HOST = 'https://us.i.posthog.com'
+posthog_client = AsyncMALClient(base_url=POSTHOG_HOST, timeout=10, track_budget=False)
+
+
+def _resolve_user(request):
+    """Run JWT auth and load the profile (sync ORM work, called via sync_to_async)"""
+    result = LoggingJWTAuthentication().authenticate(request)
+    if result is None:
+        return None, None
+    user, _ = result
+    try:
+        return user, user.userprofile
+    except UserProfile.DoesNotExist:
+        return user, None
+
+
+def _unauthorized(detail):
+    response = FastJsonResponse({"detail": detail}, status=401)
+    response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+async def _authenticate(request, name):
+    """Authenticate ``request``; returns ``(profile, None)`` or ``(None, error response)``"""
+    try:
+        user, profile = await sync_to_async(_resolve_user)(request)
+    except AuthenticationFailed as e:
+        return None, _unauthorized(str(e.detail))
+
+    if user is None:
+        return None, _unauthorized("Authentication credentials were not provided.")
+
+    request.user = user
+    logger.info(f"[{name}] User: {user.username}")
+    return profile, None
+
+
+def login_required(view):
+    """Async equivalent of ``IsAuthenticated`` for views that don't call MAL"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        _, error = await _authenticate(request, view.__name__)
+        if error is not None:
+            return error
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def mal_token_required(view):
+    """
+    Async equivalent of ``IsAuthenticated`` plus the profile/MAL token checks
+    every MAL-backed view starts with. The view receives the token as its
+    second argument.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        name = view.__name__
+        profile, error = await _authenticate(request, name)
+        if error is not None:
+            return error
+
+        if profile is None:
+            logger.error(f"[{name}] No profile found")
+            return FastJsonResponse({"error": "User profile not found"}, status=404)
+
+        if not profile.mal_access_token:
+            logger.error(f"[{name}] No MAL token")
+            return FastJsonResponse({"error": "Not authenticated with MAL"}, status=401)
+
+        return await view(request, profile.mal_access_token, *args, **kwargs)
+
+    return wrapper
+
+
+@require_GET
+@mal_token_required
+async def anime_detail(request, token, anime_id):
+    try:
+        return FastJsonResponse(await catalog.aget_anime_detail(request.user, token, anime_id))
+    except MALError as e:
+        return FastJsonResponse(e.to_dict(), status=e.status_code)
+
+
+@require_GET
+@mal_token_required
+async def search_anime(request, token):
+    query = canonical_query(request.GET.get("q"))
+    limit = clamp_limit(request.GET.get("limit", DEFAULT_SEARCH_LIMIT))
+
+    if not query:
+        return FastJsonResponse({"error": "Missing search query"}, status=400)
+
+    bucket = limit_bucket(limit)
+    payload = await aget_cached(query, bucket)
+    if payload is None:
+        params = {
+            "q": query,
+            "limit": bucket
+        }
+        try:
+            payload = await async_mal_client.get("/anime", token, params=params)
+        except MALError as e:
+            return FastJsonResponse(e.to_dict(), status=e.status_code)
+        await aset_cached(query, bucket, payload)
+
+    return FastJsonResponse(slice_results(payload, limit))
+
+
+async def fetch_user_list(user, token, params):
+    """Async version of views.fetch_user_list"""
+    key = views.user_list_key(params)
+    data = await api_cache.aget("user_list", key, scope=user.id)
+    if data is None:
+        data = await async_mal_client.get_all("/users/@me/animelist", token, params=params)
+        await api_cache.aset("user_list", key, data, scope=user.id)
+        await sync_to_async(ingest_fetched_list)(user, data)
+    return data
+
+
+async def fetch_completed_list(user, token):
+    """Async version of views.fetch_completed_list"""
+    if await sync_to_async(views.user_has_synced_list)(user):
+        return await sync_to_async(catalog.list_items)(user, status="completed")
+    return await fetch_user_list(user, token, views.RECOMMENDATION_LIST_PARAMS)
+
+
+# ============= RECOMMENDATIONS =============
+
+async def _get_data(user_id, path, token, params):
+    """Cached candidate pool for a MAL search, treating failures as an empty result"""
+    async def fetch():
+        return (await async_mal_client.get(path, token, params=params)).get("data", [])
+
+    try:
+        return await recommendation_cache.aget_pool(user_id, path, params, fetch)
+    except MALError as e:
+        logger.warning(f"[async recommendations] {path} failed: {e.message}")
+        return []
+
+
+async def find_similar_anime(token, anchor_anime, watched_ids):
+    if not anchor_anime.get("genres"):
+        return []
+
+    try:
+        ranking_data = await ranking_cache.aget_ranking(token, **views.POPULARITY_RANKING_PARAMS)
+    except MALError as e:
+        logger.warning(f"[find_similar_anime] Ranking fetch failed: {e.message}")
+        ranking_data = []
+
+    # Ranking writes a debug file, keep that off the event loop
+    return await asyncio.to_thread(views.rank_similar_anime, anchor_anime, ranking_data, watched_ids)
+
+
+async def search_by_genre(user_id, token, genre_name, watched_ids, limit=10):
+    results = await _get_data(user_id, "/anime", token, views.genre_search_params(genre_name))
+    return views.filter_genre_results(results, genre_name, watched_ids, limit)
+
+
+async def search_by_studio(user_id, token, studio_name, watched_ids, limit=8):
+    results = await _get_data(user_id, "/anime", token, views.studio_search_params(studio_name))
+    return views.filter_studio_results(results, studio_name, watched_ids, limit)
+
+
+async def find_hidden_gems(user_id, token, genres, watched_ids):
+    results_by_genre = await asyncio.gather(*(
+        _get_data(user_id, "/anime", token, views.hidden_gem_params(genre))
+        for genre in genres[:views.HIDDEN_GEM_GENRES]
+    ))
+    return views.filter_hidden_gems(results_by_genre, watched_ids)
+
+
+async def run_sections_concurrently(sections, timeout=views.RECOMMENDATION_SECTION_TIMEOUT):
+    """Async counterpart of views.run_sections_concurrently"""
+    async def run(name, coro):
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[get_recommendations] Section '{name}' timed out after {timeout}s")
+        except Exception as e:
+            logger.error(f"[get_recommendations] Section '{name}' failed: {e}", exc_info=True)
+        return None
+
+    names = list(sections)
+    values = await asyncio.gather(*(run(name, sections[name]) for name in names))
+    return dict(zip(names, values))
+
+
+@require_GET
+@mal_token_required
+async def get_recommendations(request, token):
+    async def build_profile():
+        user_anime = await fetch_completed_list(request.user, token)
+        return views.build_preference_profile(user_anime)
+
+    user_id = request.user.id
+    try:
+        prefs = await recommendation_cache.aget_profile(user_id, build_profile)
+    except MALError as e:
+        return FastJsonResponse({"error": "Failed to fetch anime list"}, status=e.status_code)
+    watched_ids = prefs["watched_ids"]
+    top_genres = prefs["top_genres"]
+    top_studios = prefs["top_studios"]
+    anchor = views.pick_anchor(prefs["high_rated_anime"])
+
+    sections = {}
+    if anchor:
+        sections["because_you_liked"] = find_similar_anime(token, anchor, watched_ids)
+    if top_genres:
+        sections["from_genres"] = search_by_genre(user_id, token, top_genres[0][0], watched_ids, limit=10)
+    if top_studios:
+        sections["from_studios"] = search_by_studio(user_id, token, top_studios[0][0], watched_ids, limit=8)
+    if top_genres:
+        sections["hidden_gems"] = find_hidden_gems(user_id, token, [g[0] for g in top_genres], watched_ids)
+
+    results = await run_sections_concurrently(sections)
+    recommendations = views.assemble_recommendations(anchor, top_genres, top_studios, results)
+
+    return FastJsonResponse(recommendations)
+
+
+# PostHog reverse proxy to bypass ad blockers
+@csrf_exempt
+async def posthog_proxy(request, path=''):
+    """Async version of views.posthog_proxy"""
+    url = f"{POSTHOG_HOST}/{path}"
+
+    query_string = request.META.get('QUERY_STRING', '')
+    if query_string:
+        url += '?' + query_string
+
+    headers = {
+        'User-Agent': request.META.get('HTTP_USER_AGENT', 'Mozilla/5.0'),
+    }
+
+    try:
+        if request.method == 'POST':
+            headers['Content-Type'] = request.META.get('CONTENT_TYPE', 'application/json')
+            response = await posthog_client.request('POST', url, headers=headers, content=request.body)
+        else:
+            response = await posthog_client.request('GET', url, headers=headers)
+    except MALError as e:
+        logger.error(f"[PostHog Proxy Error] {e.details}")
+        return FastJsonResponse({'error': e.details}, status=500)
+
+    django_response = HttpResponse(response.content, status=response.status_code)
+
+    # Copy important headers (NOT Content-Encoding - httpx already decompresses)
+    for header in ['Content-Type', 'Cache-Control']:
+        if header in response.headers:
+            django_response[header] = response.headers[header]
+
+    return django_response
+
+
+@require_GET
+@login_required
+async def sync_progress(request, job_id):
+    """Async ``views.sync_progress``: the stream awaits between cache polls instead of holding a thread"""
+    job = await SyncJob.objects.filter(pk=job_id, user=request.user).afirst()
+    if job is None:
+        return FastJsonResponse({"error": "Sync job not found"}, status=404)
+
+    initial = await sync_to_async(progress.initial_record, thread_sensitive=False)(job)
+    logger.info(f"[sync_progress] Streaming sync {job.pk} for {request.user.username} ({job.status})")
+    # Same thread the ORM calls above ran on, so this releases their connection
+    await sync_to_async(lambda: connection.close())()
+    return views.event_stream_response(progress.aevent_stream(job.pk, initial))
+
+
+@require_GET
+@login_required
+async def get_cached_anime_list(request):
+    """
+    Async ``views.get_cached_anime_list``. Under ASGI Django would buffer the
+    sync view's iterator whole before sending it; ``aiterator`` keeps the
+    stream incremental.
+    """
+    as_ndjson = streaming.wants_ndjson(request)
+    try:
+        query = animelist.parse_query(request.GET)
+    except ValueError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+    mark = animelist.watermark()
+
+    etag, count = await sync_to_async(views.anime_list_etag)(request, as_ndjson)
+    if etag_matches(request, etag):
+        logger.info(f"[get_cached_anime_list] Not modified ({count} entries)")
+        return not_modified(etag)
+
+    if query["since"] is not None:
+        if animelist.since_expired(query["since"]):
+            return FastJsonResponse({"error": views.ANIME_LIST_HISTORY_EXPIRED}, status=410)
+        changed, deleted = await sync_to_async(animelist.changes)(request.user, query)
+        logger.info(f"[get_cached_anime_list] Delta since {query['since']}, {len(deleted)} deleted")
+        rows = changed.aiterator(chunk_size=streaming.STREAM_CHUNK_SIZE)
+        return with_etag(streaming.stream_object({"watermark": mark, "deleted": deleted}, "changed", rows), etag)
+
+    logger.info(f"[get_cached_anime_list] Found {count} entries")
+    if query["limit"] is not None:
+        results, next_cursor = await sync_to_async(animelist.page)(request.user, query)
+        response = views.anime_list_page_response(results, next_cursor, as_ndjson)
+    else:
+        rows = animelist.rows(request.user, query).aiterator(chunk_size=streaming.STREAM_CHUNK_SIZE)
+        response = streaming.stream_rows(rows, as_ndjson)
+    response["X-Watermark"] = mark
+    return with_etag(response, etag)
@@ -4,10 +4,32 @@ Custom authentication classes for the API.
 from rest_framework.authentication import SessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from datetime import timedelta
+from django.utils import timezone
 import logging
 
+from . import cache as api_cache
+from .models import UserProfile
+
 logger = logging.getLogger(__name__)
 
+
+# last_seen_at feeds the refresh scheduler; hourly resolution is plenty
+SEEN_RESOLUTION = timedelta(hours=1)
+
+
+def mark_seen(user_id):
+    """Record activity, writing at most once per SEEN_RESOLUTION per user"""
+    now = timezone.now()
+    UserProfile.objects.filter(user_id=user_id).exclude(last_seen_at__gt=now - SEEN_RESOLUTION).update(last_seen_at=now)
+
+
+def invalidate_cached_user(user_id):
+    """Drop every cached (user, profile) resolved for ``user_id``"""
+    api_cache.invalidate("auth", scope=user_id)
+
+
 class LoggingJWTAuthentication(JWTAuthentication):
     """
     JWT Authentication with detailed logging for debugging auth issues.
@@ -23,6 +45,32 @@ class LoggingJWTAuthentication(JWTAuthentication):
         '/api/posthog/',
     ]
     
+    def get_user(self, validated_token):
+        """
+        Resolve the token's user with its profile attached, caching the pair
+        per token ``jti`` for the "auth" namespace TTL. A warm request costs no
+        queries for either ``request.user`` or ``request.user.userprofile``.
+        Profile/user saves invalidate the user's entries (see api.signals).
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if user_id is None or jti is None:
+            return super().get_user(validated_token)
+
+        user = api_cache.get("auth", jti, scope=user_id)
+        if user is not None:
+            return user
+
+        user = super().get_user(validated_token)
+        mark_seen(user.pk)
+        try:
+            # Load the profile now so it is cached along with the user
+            user.userprofile
+        except UserProfile.DoesNotExist:
+            pass
+        api_cache.set("auth", jti, user, scope=user_id)
+        return user
+
     def authenticate(self, request):
         """
         Override authenticate to add logging.
@@ -0,0 +1,52 @@
+"""
+Global MAL request budget.
+
+Every MAL call made through ``MALClient``/``AsyncMALClient`` is counted in a
+fixed one-minute window kept in the default cache, so the count is shared by
+all web processes and workers. Interactive requests are never refused;
+background work such as the refresh scheduler checks ``remaining()`` first
+and only spends what is left.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# MAL requests allowed per window across every process
+MAL_REQUEST_BUDGET = getattr(settings, 'MAL_REQUEST_BUDGET', 120)
+
+WINDOW_SECONDS = 60
+
+
+def _window_key(now=None):
+    return f"mal_budget:{int((now or time.time()) // WINDOW_SECONDS)}"
+
+
+def record(count=1):
+    """Count ``count`` MAL requests against the current window"""
+    key = _window_key()
+    try:
+        cache.add(key, 0, timeout=WINDOW_SECONDS * 2)
+        cache.incr(key, count)
+    except Exception as e:
+        # Accounting must never break the request itself
+        logger.warning(f"[budget] Could not record MAL request: {e}")
+
+
+def used():
+    return cache.get(_window_key(), 0)
+
+
+def remaining():
+    return max(MAL_REQUEST_BUDGET - used(), 0)
+
+
+def seconds_until_reset():
+    return WINDOW_SECONDS - (time.time() % WINDOW_SECONDS)
+
+
+def stats():
+    return {"budget": MAL_REQUEST_BUDGET, "used": used(), "window_seconds": WINDOW_SECONDS}
@@ -0,0 +1,224 @@
+"""
+Tiered cache for the API.
+
+``TieredCache`` is a Django cache backend that keeps a small per-process LRU
+(L1) in front of a cache shared by all workers (L2: file-based by default, or
+Redis when REDIS_URL is set). L1 only holds an entry for ``L1_TIMEOUT``
+seconds so invalidations made by another worker show up quickly.
+
+The module-level helpers add namespaces on top of the default cache. Each
+namespace has its own TTL (``API_CACHE_TTLS``) and a version number baked into
+every key, so a whole namespace, or one scope of it such as a single user, is
+invalidated by bumping the version instead of hunting down keys. Versions
+start from the clock rather than 1, so a version key lost to culling can't
+resurrect what was cached before an invalidation.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+from .lru import LRUCache
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """
+    Django cache backend: in-process LRU (L1) in front of another configured
+    cache alias (L2), given as LOCATION.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._l2_alias = location or "shared"
+        self._l1_timeout = options.get("L1_TIMEOUT", 5)
+        # Values are pickled in L1 so callers can't mutate each other's copies
+        self._l1 = LRUCache(maxsize=options.get("L1_MAX_ENTRIES", 2048))
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._l1_timeout
+        return min(timeout, self._l1_timeout)
+
+    def _l1_set(self, key, value, timeout, version):
+        ttl = self._l1_ttl(timeout)
+        k = self.make_and_validate_key(key, version=version)
+        if ttl <= 0:
+            self._l1.delete(k)
+        else:
+            self._l1.set(k, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl=ttl)
+
+    def get(self, key, default=None, version=None):
+        k = self.make_and_validate_key(key, version=version)
+        raw = self._l1.get(k, _MISSING)
+        if raw is not _MISSING:
+            return pickle.loads(raw)
+
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1_set(key, value, None, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self._l1_set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._l1_set(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self.l2.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self):
+        self._l1.clear()
+        self.l2.clear()
+
+    def l1_stats(self):
+        return self._l1.stats()
+
+
+# ---------------------------------------------------------------------------
+# Namespaced helpers
+# ---------------------------------------------------------------------------
+
+NAMESPACE_TTLS = {
+    "ranking": 60 * 60,
+    "detail": 60 * 60,
+    "search": 10 * 60,
+    "user_list": 15 * 60,
+    "recommendations": 60 * 60,
+    "auth": 60,
+}
+NAMESPACE_TTLS.update(getattr(settings, "API_CACHE_TTLS", {}))
+
+_counters = defaultdict(lambda: {"hits": 0, "misses": 0})
+_counters_lock = threading.Lock()
+
+
+def ttl(namespace):
+    return NAMESPACE_TTLS.get(namespace, 5 * 60)
+
+
+def hashed(value):
+    """Short stable digest for free-form key parts (queries, field lists)"""
+    return hashlib.md5(str(value).encode("utf-8")).hexdigest()[:16]
+
+
+def _version_key(namespace, scope):
+    return f"ver:{namespace}:{'*' if scope is None else scope}"
+
+
+def _new_version():
+    # Version keys can be culled or expire in L2. A fresh one starts from the
+    # clock, above every version handed out before, so entries cached under
+    # an old version never come back to life.
+    return time.time_ns()
+
+
+def get_version(namespace, scope=None):
+    key = _version_key(namespace, scope)
+    version = cache.get(key)
+    if version is None:
+        seed = _new_version()
+        cache.add(key, seed, timeout=None)
+        version = cache.get(key, seed)
+    return version
+
+
+def invalidate(namespace, scope=None):
+    """Drop every key in ``namespace`` (or only those under ``scope``)."""
+    key = _version_key(namespace, scope)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _new_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def build_key(namespace, key, scope=None):
+    parts = [namespace, f"v{get_version(namespace)}"]
+    if scope is not None:
+        parts += [str(scope), f"v{get_version(namespace, scope)}"]
+    parts.append(str(key))
+    return ":".join(parts)
+
+
+def _count(namespace, hit):
+    with _counters_lock:
+        _counters[namespace]["hits" if hit else "misses"] += 1
+
+
+def get(namespace, key, scope=None, default=None):
+    value = cache.get(build_key(namespace, key, scope), _MISSING)
+    _count(namespace, value is not _MISSING)
+    return default if value is _MISSING else value
+
+
+def set(namespace, key, value, scope=None, timeout=None):
+    cache.set(build_key(namespace, key, scope), value, timeout=timeout or ttl(namespace))
+
+
+def add(namespace, key, value, scope=None, timeout=None):
+    return cache.add(build_key(namespace, key, scope), value, timeout=timeout or ttl(namespace))
+
+
+def delete(namespace, key, scope=None):
+    return cache.delete(build_key(namespace, key, scope))
+
+
+def get_or_set(namespace, key, default_func, scope=None, timeout=None):
+    value = get(namespace, key, scope, default=_MISSING)
+    if value is _MISSING:
+        value = default_func()
+        set(namespace, key, value, scope, timeout)
+    return value
+
+
+aget = sync_to_async(get, thread_sensitive=False)
+aset = sync_to_async(set, thread_sensitive=False)
+
+
+def stats():
+    with _counters_lock:
+        namespaces = {name: dict(counts) for name, counts in _counters.items()}
+    data = {"namespaces": namespaces, "ttls": NAMESPACE_TTLS}
+    default_cache = caches["default"]
+    if isinstance(default_cache, TieredCache):
+        data["l1"] = default_cache.l1_stats()
+    return data
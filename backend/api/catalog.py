@@ -0,0 +1,304 @@
+"""
+Shared anime catalog.
+
+Everything about an anime that is the same for every user (title, picture,
+episodes, genres/studios/themes, the detail payload) is stored once on
+``Anime`` and its tag tables; each user's ``AnimeEntry`` only holds their list
+status and points at the catalog row. List syncs upsert the catalog fields of
+the entries they write, so stats and recommendations join locally instead of
+asking MAL again.
+
+anime_detail serves the stored payload until it goes stale; only
+``my_list_status`` is personal, and is read from the user's synced
+``AnimeEntry`` (or fetched on its own, which is a tiny call).
+"""
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache as api_cache
+from . import fastjson
+from .mal_client import mal_client, async_mal_client, MALError
+from .models import Anime, AnimeEntry, Genre, Studio, Theme
+
+logger = logging.getLogger(__name__)
+
+ANIME_DETAIL_FIELDS = (
+    'id,title,main_picture,alternative_titles,'
+    'start_date,end_date,synopsis,mean,rank,'
+    'popularity,num_list_users,num_scoring_users,'
+    'nsfw,created_at,updated_at,media_type,status,'
+    'genres,my_list_status,num_episodes,start_season,'
+    'broadcast,source,average_episode_duration,'
+    'rating,pictures,background,related_anime,'
+    'related_manga,recommendations,studios,statistics'
+)
+
+# How long a stored detail payload is served before refetching it
+DETAIL_MAX_AGE = timedelta(seconds=getattr(settings, 'ANIME_DETAIL_MAX_AGE', 24 * 60 * 60))
+
+# Airing shows change score/rank/episode counts quickly, refresh them sooner
+AIRING_DETAIL_MAX_AGE = timedelta(seconds=getattr(settings, 'ANIME_DETAIL_AIRING_MAX_AGE', 6 * 60 * 60))
+
+
+def detail_entry(detail, fetched_at):
+    """
+    Cache entry for a stored detail payload. The payload is kept encoded, so
+    a hit is written to the response without decoding and re-encoding it.
+    """
+    return {"json": fastjson.dumps(detail), "status": detail.get("status"), "fetched_at": fetched_at}
+
+
+def is_fresh(entry, now=None):
+    fetched_at = entry["fetched_at"]
+    if not fetched_at:
+        return False
+    max_age = AIRING_DETAIL_MAX_AGE if entry["status"] == "currently_airing" else DETAIL_MAX_AGE
+    return (now or timezone.now()) - fetched_at < max_age
+
+
+def load_detail(anime_id):
+    """
+    ``detail_entry`` for ``anime_id`` from the "detail" cache namespace,
+    falling back to the catalog row. None if we have never seen it.
+    """
+    entry = api_cache.get("detail", anime_id)
+    # Entries cached before payloads were kept encoded are rebuilt
+    if entry is None or "json" not in entry:
+        anime = Anime.objects.filter(mal_id=anime_id).only("detail", "detail_fetched_at").first()
+        if anime is None or not anime.detail:
+            return None
+        entry = detail_entry(anime.detail, anime.detail_fetched_at)
+        api_cache.set("detail", anime_id, entry)
+    return entry
+
+
+def store_detail(payload):
+    """
+    Save a MAL detail payload to the catalog, minus the per-user fields.
+    ``list_fields_at`` is left to list syncs: a detail payload has no themes,
+    so the row is not complete until a list sync has stored it.
+    """
+    detail = {k: v for k, v in payload.items() if k != "my_list_status"}
+    now = timezone.now()
+    fields = catalog_fields_from_node(detail)
+    defaults = {
+        **fields,
+        "detail": detail,
+        "detail_fetched_at": now,
+        "mal_updated_at": parse_datetime(detail["updated_at"]) if detail.get("updated_at") else None,
+    }
+    if Anime.objects.filter(mal_id=detail["id"]).values_list("title", "image_url").first() != _shown_fields(fields):
+        defaults["list_fields_changed_at"] = now
+    anime, _ = Anime.objects.update_or_create(mal_id=detail["id"], defaults=defaults)
+    store_tags([detail], {anime.mal_id: anime.pk})
+    api_cache.set("detail", anime.mal_id, detail_entry(anime.detail, anime.detail_fetched_at))
+    return anime
+
+
+# Extra animelist fields stored on the catalog (title and main_picture always come along)
+LIST_CATALOG_FIELDS = 'genres,studios,themes,num_episodes,average_episode_duration,media_type'
+
+# Node key -> tag model, for the catalog's many-to-many fields of the same name
+TAG_MODELS = {"genres": Genre, "studios": Studio, "themes": Theme}
+
+
+def catalog_fields_from_node(node):
+    """Catalog columns carried by one animelist ``node``"""
+    return {
+        "title": node.get("title", "")[:255],
+        "image_url": (node.get("main_picture") or {}).get("medium"),
+        "media_type": node.get("media_type") or "",
+        "num_episodes": node.get("num_episodes"),
+        "average_episode_duration": node.get("average_episode_duration"),
+    }
+
+
+def _shown_fields(fields):
+    """The catalog columns cached-animelist shows, from ``catalog_fields_from_node``"""
+    return fields["title"], fields["image_url"]
+
+
+def store_tags(nodes, anime_ids):
+    """
+    Upsert the genres/studios/themes named by ``nodes`` and replace the links
+    of each node's anime with them. ``anime_ids`` maps MAL id to Anime pk.
+    Only the keys a node has are replaced: a detail payload has no themes,
+    and must not drop the ones a list sync stored.
+    """
+    for key, model in TAG_MODELS.items():
+        keyed = [node for node in nodes if key in node]
+        if not keyed:
+            continue
+        through = getattr(Anime, key).through
+        tag_column = f"{model._meta.model_name}_id"
+
+        tags = {tag["id"]: tag["name"] for node in keyed for tag in node[key]}
+        tag_ids = {}
+        if tags:
+            model.objects.bulk_create(
+                [model(mal_id=mal_id, name=name[:100]) for mal_id, name in tags.items()],
+                update_conflicts=True,
+                unique_fields=["mal_id"],
+                update_fields=["name"],
+            )
+            tag_ids = dict(model.objects.filter(mal_id__in=tags).values_list("mal_id", "pk"))
+
+        through.objects.filter(anime_id__in=[anime_ids[node["id"]] for node in keyed]).delete()
+        links = [
+            through(anime_id=anime_ids[node["id"]], **{tag_column: tag_ids[tag["id"]]})
+            for node in keyed
+            for tag in node[key]
+        ]
+        through.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def store_list_nodes(nodes):
+    """
+    Bulk upsert catalog rows and their tags from animelist nodes and return
+    ``{mal_id: Anime pk}``. Only the list fields are written, a stored detail
+    payload is left alone. ``list_fields_changed_at`` moves only for rows whose
+    title or picture differ from the stored ones.
+    """
+    if not nodes:
+        return {}
+    now = timezone.now()
+    mal_ids = [node["id"] for node in nodes]
+    stored = Anime.objects.filter(mal_id__in=mal_ids).values_list("mal_id", "title", "image_url")
+    shown = {mal_id: (title, image_url) for mal_id, title, image_url in stored}
+    rows = [Anime(mal_id=node["id"], list_fields_at=now, list_fields_changed_at=now, **catalog_fields_from_node(node))
+            for node in nodes]
+    changed = [row.mal_id for row in rows if row.mal_id in shown and shown[row.mal_id] != (row.title, row.image_url)]
+    Anime.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["mal_id"],
+        # list_fields_changed_at is only written for new rows here
+        update_fields=[
+            "title", "image_url", "media_type", "num_episodes", "average_episode_duration",
+            "list_fields_at", "updated_at",
+        ],
+    )
+    if changed:
+        Anime.objects.filter(mal_id__in=changed).update(list_fields_changed_at=now)
+    anime_ids = dict(Anime.objects.filter(mal_id__in=mal_ids).values_list("mal_id", "pk"))
+    store_tags(nodes, anime_ids)
+    return anime_ids
+
+
+def anime_node(anime):
+    """Render a catalog row (tags prefetched) in the shape of a MAL animelist ``node``"""
+    node = {
+        "id": anime.mal_id,
+        "title": anime.title,
+        "media_type": anime.media_type,
+        "num_episodes": anime.num_episodes,
+        "average_episode_duration": anime.average_episode_duration,
+    }
+    if anime.image_url:
+        node["main_picture"] = {"medium": anime.image_url}
+    for key in TAG_MODELS:
+        node[key] = [{"id": tag.mal_id, "name": tag.name} for tag in getattr(anime, key).all()]
+    return node
+
+
+def list_items(user, status=None):
+    """
+    The user's stored list (optionally one ``status``) as MAL animelist items,
+    joined from the catalog instead of fetched
+    """
+    entries = (
+        AnimeEntry.objects.filter(user=user)
+        .select_related("anime")
+        .prefetch_related(*(f"anime__{key}" for key in TAG_MODELS))
+    )
+    if status:
+        entries = entries.filter(status=status)
+    return [{"node": anime_node(entry.anime), "list_status": entry_list_status(entry)} for entry in entries]
+
+
+def entry_list_status(entry):
+    """Render an AnimeEntry in the shape of MAL's ``my_list_status``"""
+    return {
+        "status": entry.status,
+        "score": int(entry.score or 0),
+        "num_episodes_watched": entry.episodes_watched or 0,
+        "is_rewatching": entry.is_rewatching,
+        "start_date": entry.start_date.isoformat() if entry.start_date else None,
+        "finish_date": entry.finish_date.isoformat() if entry.finish_date else None,
+        "updated_at": entry.last_updated.isoformat() if entry.last_updated else None,
+    }
+
+
+def local_list_status(user, anime_id):
+    entry = AnimeEntry.objects.filter(user=user, mal_id=anime_id).first()
+    return entry_list_status(entry) if entry else None
+
+
+def _with_list_status(raw, list_status):
+    """The encoded detail payload ``raw`` with the user's ``my_list_status`` spliced in"""
+    if not list_status:
+        return raw
+    return fastjson.with_key(raw, "my_list_status", list_status)
+
+
+def get_anime_detail(user, token, anime_id):
+    """
+    Detail payload for ``anime_id`` as seen by ``user``, as encoded JSON.
+    Raises MALError only if the anime is not in the catalog and MAL cannot be
+    reached.
+    """
+    entry = load_detail(anime_id)
+
+    if entry is not None and is_fresh(entry):
+        list_status = local_list_status(user, anime_id)
+        if list_status is None:
+            try:
+                list_status = mal_client.get(
+                    f'/anime/{anime_id}', token, params={'fields': 'my_list_status'}
+                ).get("my_list_status")
+            except MALError as e:
+                logger.warning(f"[catalog] my_list_status fetch for {anime_id} failed: {e.message}")
+        return _with_list_status(entry["json"], list_status)
+
+    try:
+        live = mal_client.get(f'/anime/{anime_id}', token, params={'fields': ANIME_DETAIL_FIELDS})
+    except MALError:
+        if entry is not None:
+            logger.warning(f"[catalog] MAL unavailable, serving stale detail for {anime_id}")
+            return _with_list_status(entry["json"], local_list_status(user, anime_id))
+        raise
+
+    store_detail(live)
+    return fastjson.dumps(live)
+
+
+async def aget_anime_detail(user, token, anime_id):
+    """Async version of ``get_anime_detail``"""
+    entry = await sync_to_async(load_detail)(anime_id)
+
+    if entry is not None and is_fresh(entry):
+        list_status = await sync_to_async(local_list_status)(user, anime_id)
+        if list_status is None:
+            try:
+                list_status = (await async_mal_client.get(
+                    f'/anime/{anime_id}', token, params={'fields': 'my_list_status'}
+                )).get("my_list_status")
+            except MALError as e:
+                logger.warning(f"[catalog] my_list_status fetch for {anime_id} failed: {e.message}")
+        return _with_list_status(entry["json"], list_status)
+
+    try:
+        live = await async_mal_client.get(f'/anime/{anime_id}', token, params={'fields': ANIME_DETAIL_FIELDS})
+    except MALError:
+        if entry is not None:
+            logger.warning(f"[catalog] MAL unavailable, serving stale detail for {anime_id}")
+            return _with_list_status(entry["json"], await sync_to_async(local_list_status)(user, anime_id))
+        raise
+
+    await sync_to_async(store_detail)(live)
+    return fastjson.dumps(live)
@@ -0,0 +1,39 @@
+"""
+Helpers for conditional GET (ETag / If-None-Match -> 304).
+
+Endpoints compute a cheap validator first, so an unchanged resource is answered
+with an empty 304 before its rows are loaded or serialized.
+"""
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+
+# Clients may store the response but must revalidate it every time
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts):
+    """Strong ETag from the given validator parts"""
+    raw = ":".join("" if p is None else str(p) for p in parts)
+    return '"%s"' % hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def etag_matches(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = {e[2:] if e.startswith("W/") else e for e in parse_etags(header)}
+    return "*" in candidates or etag in candidates
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag):
+    response["ETag"] = etag
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
@@ -0,0 +1,69 @@
+"""
+JSON encoding for every API response.
+
+Uses orjson when it is installed (it is in requirements.txt) and falls back to
+the stdlib ``json`` module with Django's encoder otherwise, so the output is
+the same shape either way: compact, UTF-8, datetimes as ISO 8601 with ``Z``
+for UTC. ``dumps`` returns bytes, ready to be written to a response.
+
+``JsonResponse`` and DRF's ``JSONRenderer``/``JSONParser`` are replaced by
+``FastJsonResponse`` here and ``api.renderers.FastJSONRenderer`` /
+``api.parsers.FastJSONParser``.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised where orjson has no wheel
+    orjson = None
+
+JSON_CONTENT_TYPE = "application/json"
+
+# What orjson doesn't know natively (Decimal, lazy translations...) goes through Django's encoder
+_django_default = DjangoJSONEncoder().default
+
+if orjson is not None:
+    BACKEND = "orjson"
+    JSONDecodeError = orjson.JSONDecodeError
+    _OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        return orjson.dumps(data, default=_django_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    BACKEND = "json"
+    JSONDecodeError = json.JSONDecodeError
+    _encoder = DjangoJSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(data):
+        return _encoder.encode(data).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    Drop-in ``JsonResponse`` encoded with ``dumps``. Already encoded bytes
+    (e.g. a cached payload) are sent as they are.
+    """
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, (dict, bytes)):
+            raise TypeError("In order to allow non-dict objects to be serialized set the safe parameter to False.")
+        kwargs.setdefault("content_type", JSON_CONTENT_TYPE)
+        super().__init__(content=data if isinstance(data, bytes) else dumps(data), **kwargs)
+
+
+def with_key(raw, key, value):
+    """
+    Add ``key`` to an encoded JSON object without decoding it. ``raw`` must
+    come from ``dumps`` of a dict that doesn't already have ``key``.
+    """
+    member = dumps(key) + b":" + dumps(value)
+    if raw == b"{}":
+        return b"{" + member + b"}"
+    return raw[:-1] + b"," + member + b"}"
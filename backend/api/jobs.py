@@ -0,0 +1,154 @@
+"""
+DB-backed queue for anime list syncs.
+
+``sync_anime_list`` only enqueues a ``SyncJob`` and answers 202 with its id;
+``python manage.py run_sync_worker`` claims and runs jobs on separate
+capacity. The partial unique constraint on SyncJob allows one queued/running
+job per user, so a client retry gets the job already in flight instead of
+starting a second sync.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import progress
+from .mal_client import MALError
+from .models import SyncJob, UserProfile
+from .sync import SYNC_PAGE_SIZE, sync_from_mal
+
+logger = logging.getLogger(__name__)
+
+# Run jobs inside the enqueueing request instead of a worker (local dev only)
+SYNC_JOBS_EAGER = getattr(settings, 'SYNC_JOBS_EAGER', False)
+
+# A running job whose heartbeat is older than this is assumed lost with its worker
+STALE_AFTER = timedelta(seconds=getattr(settings, 'SYNC_JOB_STALE_AFTER', 10 * 60))
+
+# Lost jobs are re-queued until they have been started this many times
+MAX_ATTEMPTS = 3
+
+
+def active_job(user):
+    return SyncJob.objects.filter(user=user, status__in=SyncJob.ACTIVE_STATUSES).first()
+
+
+def enqueue_sync(user):
+    """Return ``(job, created)``: the user's queued/running job, or a new one"""
+    try:
+        with transaction.atomic():
+            job = SyncJob.objects.create(user=user)
+    except IntegrityError:
+        job = active_job(user)
+        if job is None:
+            # The active job finished between our insert and this read
+            return enqueue_sync(user)
+        logger.info(f"[jobs] {user.username} already has sync {job.pk} ({job.status})")
+        return job, False
+
+    logger.info(f"[jobs] Queued sync {job.pk} for {user.username}")
+    progress.publish(job.pk, SyncJob.QUEUED, "queued")
+    if SYNC_JOBS_EAGER:
+        claimed = claim(job, worker="eager")
+        if claimed is not None:
+            run_job(claimed)
+            job.refresh_from_db()
+    return job, True
+
+
+def claim(job, worker):
+    """Move ``job`` from queued to running for ``worker``; None if someone beat us to it"""
+    now = timezone.now()
+    claimed = SyncJob.objects.filter(pk=job.pk, status=SyncJob.QUEUED).update(
+        status=SyncJob.RUNNING,
+        worker=worker,
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def claim_next(worker):
+    """Claim the oldest queued job, or return None if the queue is empty"""
+    for job in SyncJob.objects.filter(status=SyncJob.QUEUED).order_by('created_at')[:10]:
+        claimed = claim(job, worker)
+        if claimed is not None:
+            return claimed
+    return None
+
+
+def heartbeat(job):
+    SyncJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now())
+
+
+def finish(job, status, result=None, error=""):
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    logger.info(f"[jobs] Sync {job.pk} {status}" + (f": {error}" if error else ""))
+    progress.publish(job.pk, status, "done" if status == SyncJob.SUCCEEDED else "failed",
+                     result=result, error=error)
+    return job
+
+
+def run_job(job):
+    """Run a claimed job to completion, recording the outcome on the job"""
+    user = job.user
+    try:
+        token = user.userprofile.mal_access_token
+    except UserProfile.DoesNotExist:
+        token = None
+    if not token:
+        return finish(job, SyncJob.FAILED, error="Not authenticated with MAL")
+
+    def on_progress(phase, counts):
+        if phase == "syncing":
+            heartbeat(job)
+        progress.publish(job.pk, SyncJob.RUNNING, phase, counts, page_size=SYNC_PAGE_SIZE)
+
+    progress.publish(job.pk, SyncJob.RUNNING, "fetching")
+    try:
+        counts = sync_from_mal(user, token, on_progress=on_progress)
+    except MALError as e:
+        return finish(job, SyncJob.FAILED, error=e.message)
+    except Exception as e:
+        logger.error(f"[jobs] Sync {job.pk} crashed: {e}", exc_info=True)
+        return finish(job, SyncJob.FAILED, error=str(e))
+
+    UserProfile.objects.filter(user=user).update(list_synced_at=timezone.now())
+    return finish(job, SyncJob.SUCCEEDED, result=counts)
+
+
+def reclaim_stale():
+    """
+    Re-queue running jobs whose worker stopped sending heartbeats, or fail
+    them once they have used up their attempts. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    stale = SyncJob.objects.filter(status=SyncJob.RUNNING, heartbeat_at__lt=now - STALE_AFTER)
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=SyncJob.QUEUED, worker="")
+    failed = stale.update(status=SyncJob.FAILED, error="Worker stopped responding", finished_at=now)
+    if requeued or failed:
+        logger.warning(f"[jobs] Reclaimed stale syncs: {requeued} re-queued, {failed} failed")
+    return requeued, failed
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.pk,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error or None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,340 @@
+"""
+Shared client for the MyAnimeList API.
+
+All MAL traffic goes through one process-wide ``requests.Session`` so TCP/TLS
+connections to api.myanimelist.net are pooled and kept alive between calls
+instead of being re-negotiated for every request. ``AsyncMALClient`` is the
+httpx-based equivalent used by the async views. Both count their calls
+against the shared request budget in ``api.budget`` unless told not to.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+
+from . import budget
+
+logger = logging.getLogger(__name__)
+
+MAL_API_BASE = "https://api.myanimelist.net/v2"
+
+# (connect, read) in seconds
+DEFAULT_TIMEOUT = (5, 20)
+
+# Recommendations fan out several calls at once, so keep enough sockets per host
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+
+class MALError(Exception):
+    """
+    Raised for any failed MAL call. ``status_code`` is the status our API
+    should answer with, not necessarily the one MAL returned.
+    """
+
+    def __init__(self, message, status_code=502, details=None, upstream_status=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details
+        self.upstream_status = upstream_status
+
+    def to_dict(self, error=None):
+        data = {"error": error or self.message}
+        if self.details:
+            data["details"] = self.details
+        return data
+
+
+def map_upstream_status(status_code):
+    """Map a MAL HTTP status to the status we return to our own clients."""
+    if status_code in (401, 403):
+        return 401
+    if status_code in (404, 429):
+        return status_code
+    if status_code >= 500:
+        return 502
+    return 400
+
+
+class MALClient:
+    """
+    Thin wrapper around a pooled ``requests.Session``.
+
+    ``get`` returns decoded JSON and raises ``MALError`` for network errors and
+    non-200 responses, so views only have one exception type to handle.
+    """
+
+    def __init__(self, base_url=MAL_API_BASE, timeout=DEFAULT_TIMEOUT,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, track_budget=True):
+        self.base_url = base_url.rstrip("/")
+        self.track_budget = track_budget
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._session = None
+        self._lock = threading.Lock()
+        self._request_count = 0
+        self._error_count = 0
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def build_url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, token=None, headers=None, timeout=None, **kwargs):
+        """
+        Send a request on the pooled session and return the raw response.
+        Only network failures raise; status codes are left to the caller.
+        """
+        url = self.build_url(path)
+        request_headers = dict(headers or {})
+        if token:
+            request_headers["Authorization"] = f"Bearer {token}"
+
+        with self._lock:
+            self._request_count += 1
+        if self.track_budget:
+            budget.record()
+
+        try:
+            return self.session.request(
+                method,
+                url,
+                headers=request_headers,
+                timeout=timeout or self.timeout,
+                **kwargs
+            )
+        except requests.exceptions.Timeout as e:
+            self._record_error()
+            logger.error(f"[MALClient] Timeout on {method} {url}: {e}")
+            raise MALError("MAL API timed out", status_code=504, details=str(e))
+        except requests.exceptions.RequestException as e:
+            self._record_error()
+            logger.error(f"[MALClient] Request failed on {method} {url}: {e}")
+            raise MALError("Failed to connect to MAL API", status_code=502, details=str(e))
+
+    def get(self, path, token=None, params=None, **kwargs):
+        """GET ``path`` and return the decoded JSON body."""
+        response = self.request("GET", path, token=token, params=params, **kwargs)
+        return self.json_or_raise(response)
+
+    def iter_pages(self, path, token=None, params=None, **kwargs):
+        """
+        Yield the ``data`` list of each page of a paginated endpoint, following
+        ``paging.next`` until MAL stops returning one. Only the current page is
+        held, so callers can stream lists of any length.
+        """
+        url, page_params = path, params
+        while url:
+            body = self.get(url, token, params=page_params, **kwargs)
+            yield body.get("data", [])
+            # next is an absolute URL that already carries the query string
+            url, page_params = (body.get("paging") or {}).get("next"), None
+
+    def get_all(self, path, token=None, params=None, **kwargs):
+        """Every item of a paginated endpoint as one list"""
+        return [item for page in self.iter_pages(path, token, params, **kwargs) for item in page]
+
+    def post(self, path, token=None, data=None, **kwargs):
+        """POST ``path`` and return the decoded JSON body."""
+        response = self.request("POST", path, token=token, data=data, **kwargs)
+        return self.json_or_raise(response)
+
+    def json_or_raise(self, response):
+        if response.status_code != 200:
+            self._record_error()
+            logger.warning(f"[MALClient] {response.request.method} {response.url} -> {response.status_code}")
+            raise MALError(
+                "MAL error",
+                status_code=map_upstream_status(response.status_code),
+                details=response.text,
+                upstream_status=response.status_code,
+            )
+        try:
+            return response.json()
+        except ValueError as e:
+            self._record_error()
+            raise MALError("Invalid JSON from MAL API", status_code=502, details=str(e))
+
+    def _record_error(self):
+        with self._lock:
+            self._error_count += 1
+
+    def stats(self):
+        """
+        Connection pool statistics. ``reused`` counts requests that were served
+        on an already-open connection instead of a fresh TCP+TLS handshake.
+        """
+        pools = []
+        if self._session is not None:
+            for adapter in self._session.adapters.values():
+                container = adapter.poolmanager.pools
+                for key in list(container.keys()):
+                    pool = container.get(key)
+                    if pool is None:
+                        continue
+                    pools.append({
+                        "host": pool.host,
+                        "requests": pool.num_requests,
+                        "connections": pool.num_connections,
+                        "reused": max(pool.num_requests - pool.num_connections, 0),
+                    })
+
+        return {
+            "requests": self._request_count,
+            "errors": self._error_count,
+            "pools": pools,
+            "connections_opened": sum(p["connections"] for p in pools),
+            "connections_reused": sum(p["reused"] for p in pools),
+        }
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class AsyncMALClient:
+    """
+    asyncio counterpart of ``MALClient`` built on ``httpx.AsyncClient``.
+
+    httpx pools are bound to the event loop that created them, so one pooled
+    client is kept per running loop. Under ASGI that is a single client per
+    process; under WSGI each request gets its own short-lived loop.
+    """
+
+    def __init__(self, base_url=MAL_API_BASE, timeout=DEFAULT_TIMEOUT,
+                 max_connections=200, max_keepalive_connections=50, track_budget=True):
+        self.base_url = base_url.rstrip("/")
+        self.track_budget = track_budget
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self._clients = weakref.WeakKeyDictionary()
+        self._request_count = 0
+        self._error_count = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    def build_url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def request(self, method, path, token=None, headers=None, timeout=None, **kwargs):
+        """Async version of ``MALClient.request``; returns an ``httpx.Response``."""
+        url = self.build_url(path)
+        request_headers = dict(headers or {})
+        if token:
+            request_headers["Authorization"] = f"Bearer {token}"
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        self._request_count += 1
+        if self.track_budget:
+            await sync_to_async(budget.record, thread_sensitive=False)()
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return await self._get_client().request(method, url, headers=request_headers, **kwargs)
+        except httpx.TimeoutException as e:
+            self._error_count += 1
+            logger.error(f"[AsyncMALClient] Timeout on {method} {url}: {e}")
+            raise MALError("MAL API timed out", status_code=504, details=str(e))
+        except httpx.HTTPError as e:
+            self._error_count += 1
+            logger.error(f"[AsyncMALClient] Request failed on {method} {url}: {e}")
+            raise MALError("Failed to connect to MAL API", status_code=502, details=str(e))
+        finally:
+            self._in_flight -= 1
+
+    async def get(self, path, token=None, params=None, **kwargs):
+        response = await self.request("GET", path, token=token, params=params, **kwargs)
+        return self.json_or_raise(response)
+
+    async def iter_pages(self, path, token=None, params=None, **kwargs):
+        """Async version of ``MALClient.iter_pages``"""
+        url, page_params = path, params
+        while url:
+            body = await self.get(url, token, params=page_params, **kwargs)
+            yield body.get("data", [])
+            url, page_params = (body.get("paging") or {}).get("next"), None
+
+    async def get_all(self, path, token=None, params=None, **kwargs):
+        return [item async for page in self.iter_pages(path, token, params, **kwargs) for item in page]
+
+    def json_or_raise(self, response):
+        if response.status_code != 200:
+            self._error_count += 1
+            logger.warning(f"[AsyncMALClient] {response.request.method} {response.url} -> {response.status_code}")
+            raise MALError(
+                "MAL error",
+                status_code=map_upstream_status(response.status_code),
+                details=response.text,
+                upstream_status=response.status_code,
+            )
+        try:
+            return response.json()
+        except ValueError as e:
+            self._error_count += 1
+            raise MALError("Invalid JSON from MAL API", status_code=502, details=str(e))
+
+    def stats(self):
+        return {
+            "requests": self._request_count,
+            "errors": self._error_count,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "event_loops": len(self._clients),
+        }
+
+    async def aclose(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+# Process-wide clients used by every view
+mal_client = MALClient()
+async_mal_client = AsyncMALClient()
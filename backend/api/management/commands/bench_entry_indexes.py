@@ -0,0 +1,141 @@
+"""
+Query plans and timings of the AnimeEntry access patterns, with and without
+the indexes declared on ``AnimeEntry.Meta.indexes``.
+
+    python manage.py bench_entry_indexes --users 1000 --entries 1000   # 1M rows
+
+Everything runs in a throwaway SQLite file (``--path``, deleted afterwards)
+migrated to the current schema, so the configured database is never touched.
+Rows are inserted with raw ``executemany``; the queries are the ORM queries
+the API runs, measured for one user in the middle of the table.
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import F, Q
+
+from api import animelist
+from api.models import AnimeEntry
+
+ALIAS = "bench_entry_indexes"
+
+STATUSES = ["completed", "watching", "plan_to_watch", "dropped", "on_hold"]
+
+
+def access_patterns(user_id):
+    """``{label: queryset}`` for the reads the API makes against one user's entries"""
+    entries = AnimeEntry.objects.using(ALIAS).filter(user_id=user_id)
+    pivot = datetime.now(timezone.utc) - timedelta(minutes=7 * 10 ** 5)
+    return {
+        "completed (stats/recs)": entries.filter(status="completed").values_list("anime_id", "score"),
+        "completed, score >= 8": entries.filter(status="completed", score__gte=8).values_list("anime_id", flat=True),
+        "score >= 9": entries.filter(score__gte=9).values_list("mal_id", flat=True),
+        "recently updated": entries.order_by("-last_updated", "-id").values_list("mal_id", flat=True)[:50],
+        # A cached-animelist keyset page deep into the list, grid fields only
+        "keyset page (grid)": entries.filter(
+            Q(last_updated__lte=pivot) & (Q(last_updated__lt=pivot) | Q(id__lt=2 ** 62))
+        ).order_by("-last_updated", "-id").values("mal_id", title=F("anime__title"), image_url=F("anime__image_url"))[:101],
+        # The aggregate behind the cached-animelist ETag, grouped so it can be explained
+        "cached list ETag summary": entries.values("user_id").annotate(**animelist.SUMMARY),
+        # A since= delta from a replica that synced a day ago
+        "delta feed": entries.filter(updated_at__gt=datetime.now(timezone.utc) - timedelta(days=1)).values_list("mal_id", flat=True),
+        "cached list projection": entries.values(
+            "mal_id", "status", "score", "episodes_watched", "is_rewatching",
+            "start_date", "finish_date", "last_updated",
+            title=F("anime__title"), image_url=F("anime__image_url"),
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark AnimeEntry query plans on a synthetic table, with and without its indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--entries", type=int, default=1000, help="Entries per user")
+        parser.add_argument("--catalog", type=int, default=20000, help="Distinct anime")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--path", help="SQLite file to build the table in (default: a temp file)")
+
+    def handle(self, *args, **options):
+        path = options["path"] or os.path.join(tempfile.mkdtemp(), "bench_entry_indexes.sqlite3")
+        connections.settings[ALIAS] = {**connections.settings["default"], "ENGINE": "django.db.backends.sqlite3", "NAME": path}
+        connection = connections[ALIAS]
+        try:
+            self.stdout.write(f"Building {options['users'] * options['entries']:,} entries in {path}")
+            # Only the apps the table needs; some third-party data migrations ignore the alias
+            for app in ("auth", "api"):
+                call_command("migrate", app, database=ALIAS, verbosity=0)
+            self.populate(connection, options["users"], options["entries"], options["catalog"])
+
+            user_id = options["users"] // 2 + 1
+            indexes = AnimeEntry._meta.indexes
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(AnimeEntry, index)
+            connection.cursor().execute("ANALYZE")
+            before = self.measure(user_id, options["repeat"])
+
+            start = time.perf_counter()
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(AnimeEntry, index)
+            connection.cursor().execute("ANALYZE")
+            self.stdout.write(f"Created {len(indexes)} indexes in {time.perf_counter() - start:.1f}s\n")
+            after = self.measure(user_id, options["repeat"])
+
+            for label in before:
+                (ms_before, plan_before), (ms_after, plan_after) = before[label], after[label]
+                self.stdout.write(f"{label}: {ms_before:.2f} ms -> {ms_after:.2f} ms ({ms_before / ms_after:.1f}x)")
+                self.stdout.write(f"  without: {plan_before}")
+                self.stdout.write(f"  with:    {plan_after}")
+        finally:
+            connection.close()
+            del connections[ALIAS]
+            if not options["path"] and os.path.exists(path):
+                os.remove(path)
+
+    def populate(self, connection, users, per_user, catalog_size):
+        start = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        rng = random.Random(0)
+        with transaction.atomic(using=ALIAS), connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO auth_user (id, password, is_superuser, username, first_name, last_name, "
+                "email, is_staff, is_active, date_joined) VALUES (%s, '', 0, %s, '', '', '', 0, 1, %s)",
+                [(u, f"bench{u}", now) for u in range(1, users + 1)],
+            )
+            cursor.executemany(
+                "INSERT INTO api_anime (id, mal_id, title, media_type, list_fields_changed_at, created_at, updated_at) "
+                "VALUES (%s, %s, %s, 'tv', %s, %s, %s)",
+                [(a, a, f"Anime {a}", now, now, now) for a in range(1, catalog_size + 1)],
+            )
+            for u in range(1, users + 1):
+                cursor.executemany(
+                    "INSERT INTO api_animeentry (user_id, mal_id, anime_id, status, score, episodes_watched, "
+                    "is_rewatching, last_updated, updated_at) VALUES (%s, %s, %s, %s, %s, 12, 0, %s, %s)",
+                    [
+                        (u, a, a, rng.choice(STATUSES), rng.randint(0, 10), changed, changed)
+                        for a in rng.sample(range(1, catalog_size + 1), min(per_user, catalog_size))
+                        for changed in [now - timedelta(minutes=rng.randint(0, 10 ** 6))]
+                    ],
+                )
+        self.stdout.write(f"Inserted in {time.perf_counter() - start:.1f}s")
+
+    def measure(self, user_id, repeat):
+        results = {}
+        for label, queryset in access_patterns(user_id).items():
+            plan = " | ".join(line.strip() for line in queryset.explain().splitlines())
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                best = min(best, time.perf_counter() - start)
+            results[label] = (best * 1000, plan)
+        return results
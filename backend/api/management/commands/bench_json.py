@@ -0,0 +1,111 @@
+"""
+Serializer microbenchmarks: the stdlib JSON path the API used before against
+``api.fastjson``.
+
+    python manage.py bench_json --rows 5000 --repeat 50
+
+Payloads are synthetic but shaped like real responses: a MAL detail payload
+(anime_detail), the cached list rows (cached-animelist, with dates and
+datetimes), and a request body for the parser. "stdlib" is what
+``JsonResponse`` and DRF's ``JSONRenderer``/``JSONParser`` do; "fast" is
+``api.fastjson`` with whichever backend is installed. For anime_detail the
+cached path is also timed: splicing ``my_list_status`` into the stored
+encoded payload instead of copying and re-encoding the dict.
+"""
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+from api import fastjson
+from api.renderers import FastJSONRenderer
+
+
+def detail_payload(anime_id=1):
+    """A MAL ``/anime/{id}`` response with every field anime_detail asks for"""
+    node = lambda i: {"id": i, "title": f"Related {i}", "main_picture": {"medium": f"https://cdn/{i}.jpg", "large": f"https://cdn/{i}l.jpg"}}
+    return {
+        "id": anime_id, "title": "Bench Anime", "main_picture": {"medium": "https://cdn/m.jpg", "large": "https://cdn/l.jpg"},
+        "alternative_titles": {"synonyms": ["BA", "Bench"], "en": "Bench Anime", "ja": "ベンチアニメ"},
+        "start_date": "2020-04-01", "end_date": "2020-06-30", "synopsis": "Lorem ipsum dolor sit amet. " * 60,
+        "mean": 8.41, "rank": 120, "popularity": 300, "num_list_users": 1_234_567, "num_scoring_users": 654_321,
+        "nsfw": "white", "created_at": "2019-01-01T00:00:00+00:00", "updated_at": "2024-01-01T00:00:00+00:00",
+        "media_type": "tv", "status": "finished_airing",
+        "genres": [{"id": g, "name": f"Genre {g}"} for g in range(6)],
+        "num_episodes": 24, "start_season": {"year": 2020, "season": "spring"},
+        "broadcast": {"day_of_the_week": "saturday", "start_time": "01:00"}, "source": "manga",
+        "average_episode_duration": 1440, "rating": "pg_13",
+        "pictures": [{"medium": f"https://cdn/p{i}.jpg", "large": f"https://cdn/p{i}l.jpg"} for i in range(12)],
+        "background": "Background text. " * 20,
+        "related_anime": [{"node": node(i), "relation_type": "sequel", "relation_type_formatted": "Sequel"} for i in range(15)],
+        "related_manga": [],
+        "recommendations": [{"node": node(100 + i), "num_recommendations": 50 - i} for i in range(10)],
+        "studios": [{"id": 1, "name": "Bench Studio"}],
+        "statistics": {"status": {"watching": "1000", "completed": "50000", "on_hold": "900",
+                                  "dropped": "800", "plan_to_watch": "20000"}, "num_list_users": 1_234_567},
+    }
+
+
+def list_rows(rows):
+    """Rows as ``views.anime_list_rows`` returns them"""
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "mal_id": i, "status": "completed", "score": float(i % 11), "episodes_watched": 12,
+            "is_rewatching": False, "start_date": date(2023, 1, 1) + timedelta(days=i % 300),
+            "finish_date": None, "last_updated": now - timedelta(minutes=i),
+            "title": f"Anime {i}", "image_url": f"https://cdn.myanimelist.net/images/anime/{i}.jpg",
+        }
+        for i in range(rows)
+    ]
+
+
+def stdlib_dumps(data):
+    """What ``JsonResponse`` does"""
+    return json.dumps(data, cls=DjangoJSONEncoder).encode("utf-8")
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Command(BaseCommand):
+    help = "Benchmark the stdlib JSON path against api.fastjson on API-shaped payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Rows in the cached list payload")
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        detail = detail_payload()
+        rows = list_rows(options["rows"])
+        list_status = {"status": "completed", "score": 9, "num_episodes_watched": 24, "is_rewatching": False,
+                       "updated_at": "2024-01-01T00:00:00+00:00"}
+        stored = fastjson.dumps(detail)
+        body = stdlib_dumps({"message": "x" * 200, "history": [{"role": "user", "content": "y" * 200}] * 20})
+        drf, fast = JSONRenderer(), FastJSONRenderer()
+
+        self.stdout.write(f"fastjson backend: {fastjson.BACKEND}")
+        cases = [
+            ("anime_detail, render", lambda: stdlib_dumps(dict(detail, my_list_status=list_status)),
+             lambda: fastjson.dumps(dict(detail, my_list_status=list_status))),
+            ("anime_detail, cached hit", lambda: stdlib_dumps(dict(detail, my_list_status=list_status)),
+             lambda: fastjson.with_key(stored, "my_list_status", list_status)),
+            (f"cached-animelist, {len(rows)} rows", lambda: stdlib_dumps(rows), lambda: fastjson.dumps(rows)),
+            ("DRF renderer, detail", lambda: drf.render(detail), lambda: fast.render(detail)),
+            ("parser, request body", lambda: json.loads(body.decode("utf-8")), lambda: fastjson.loads(body)),
+        ]
+        for label, before, after in cases:
+            slow, quick = best_of(repeat, before), best_of(repeat, after)
+            self.stdout.write(
+                f"{label:<32} stdlib {slow * 1e6:10.1f} us   fast {quick * 1e6:10.1f} us   ({slow / quick:.1f}x)"
+            )
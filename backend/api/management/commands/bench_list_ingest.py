@@ -0,0 +1,106 @@
+"""
+Compare anime list ingestion strategies on the configured database.
+
+    python manage.py bench_list_ingest --rows 800 --batch-size 100 --batch-size 500
+
+"loop" is the old sync write path: one ``AnimeEntry.objects.create`` per
+item in autocommit mode, i.e. one transaction (and fsync on SQLite) per row;
+its catalog rows are written beforehand, outside the timing.
+"upsert" is ``api.sync.upsert_entries`` (catalog and entries) inside a single
+transaction. Rows are written for a throwaway user that is deleted afterwards.
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import catalog
+from api.models import Anime, AnimeEntry
+from api.stats import deferred_stats
+from api.sync import entry_fields, upsert_entries
+
+BENCH_USERNAME = "__bench_list_ingest__"
+
+# Synthetic MAL ids start here so the bench never overwrites real catalog rows
+BENCH_MAL_ID_BASE = 900_000_000
+
+
+def synthetic_list(rows, day=1):
+    return [
+        {
+            "node": {"id": mal_id, "title": f"Bench Anime {mal_id}"},
+            "list_status": {
+                "status": "completed",
+                "score": mal_id % 11,
+                "num_episodes_watched": 12,
+                "is_rewatching": False,
+                "updated_at": f"2024-01-{day:02d}T00:00:00+00:00",
+            },
+        }
+        for mal_id in range(BENCH_MAL_ID_BASE + 1, BENCH_MAL_ID_BASE + rows + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-row creates against the bulk upsert used by list sync"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=800)
+        parser.add_argument("--batch-size", type=int, action="append", dest="batch_sizes",
+                            help="Upsert batch size to try (repeatable, default 500)")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        batch_sizes = options["batch_sizes"] or [500]
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        Anime.objects.filter(mal_id__gt=BENCH_MAL_ID_BASE).delete()
+        user = User.objects.create(username=BENCH_USERNAME)
+
+        try:
+            self.stdout.write(f"{rows} rows, best of {options['repeat']}")
+            self.report("loop (insert)", self.best(options["repeat"], lambda: self.run_loop(user, rows)), rows)
+            for batch_size in batch_sizes:
+                self.report(
+                    f"upsert batch={batch_size} (insert)",
+                    self.best(options["repeat"], lambda: self.run_upsert(user, rows, batch_size, fresh=True)),
+                    rows,
+                )
+                self.report(
+                    f"upsert batch={batch_size} (update)",
+                    self.best(options["repeat"], lambda: self.run_upsert(user, rows, batch_size, fresh=False)),
+                    rows,
+                )
+        finally:
+            user.delete()
+            Anime.objects.filter(mal_id__gt=BENCH_MAL_ID_BASE).delete()
+
+    def best(self, repeat, func):
+        return min(func() for _ in range(repeat))
+
+    def report(self, label, seconds, rows):
+        self.stdout.write(f"  {label:<32} {seconds * 1000:8.1f} ms  {rows / seconds:10.0f} rows/s")
+
+    def run_loop(self, user, rows):
+        AnimeEntry.objects.filter(user=user).delete()
+        items = synthetic_list(rows)
+        anime_ids = catalog.store_list_nodes([item["node"] for item in items])
+        with deferred_stats(user.id):
+            start = time.perf_counter()
+            for item in items:
+                mal_id = item["node"]["id"]
+                AnimeEntry.objects.create(user=user, mal_id=mal_id, anime_id=anime_ids[mal_id], **entry_fields(item))
+            return time.perf_counter() - start
+
+    def run_upsert(self, user, rows, batch_size, fresh):
+        if fresh:
+            AnimeEntry.objects.filter(user=user).delete()
+        else:
+            upsert_entries(user, synthetic_list(rows), batch_size)
+        items = synthetic_list(rows, day=2)
+        with deferred_stats(user.id):
+            start = time.perf_counter()
+            with transaction.atomic():
+                upsert_entries(user, items, batch_size)
+            return time.perf_counter() - start
@@ -0,0 +1,138 @@
+"""
+Concurrent readers and writers against SQLite, with Django's stock
+connection settings and with the profile configured in ``DATABASES``.
+
+    python manage.py bench_sqlite_concurrency --writers 4 --readers 8 --seconds 5
+
+"stock" is a plain ``django.db.backends.sqlite3`` alias: rollback journal,
+deferred transactions, a new connection per request (CONN_MAX_AGE=0).
+"configured" copies the default database's OPTIONS and CONN_MAX_AGE (WAL,
+pragmas, IMMEDIATE transactions, persistent connections). Each profile gets
+a fresh temp file. Writers do what a sync or stats update does: read, then
+upsert a batch, in one transaction. Readers fetch one user's rows. Every
+operation ends like a request does, with ``close_if_unusable_or_obsolete``.
+"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+USERS = 200
+ROWS_PER_USER = 500
+WRITE_BATCH = 100
+
+
+def profiles(path_for):
+    default = settings.DATABASES["default"]
+    if default["ENGINE"] != "django.db.backends.sqlite3":
+        raise CommandError("The default database is not SQLite, nothing to compare")
+    stock = {**connections.settings["default"], "NAME": path_for("stock"), "OPTIONS": {},
+             "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}
+    configured = {**connections.settings["default"], "NAME": path_for("configured")}
+    return {"stock": stock, "configured": configured}
+
+
+class Command(BaseCommand):
+    help = "Compare SQLite throughput and lock errors under concurrency, stock vs configured settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        tmpdir = tempfile.mkdtemp()
+        for name, db_settings in profiles(lambda name: os.path.join(tmpdir, f"{name}.sqlite3")).items():
+            alias = f"bench_{name}"
+            connections.settings[alias] = db_settings
+            try:
+                self.seed(alias)
+                results = self.run(alias, options["writers"], options["readers"], options["seconds"])
+                self.report(name, results, options["seconds"])
+            finally:
+                connections[alias].close()
+                del connections[alias]
+                for suffix in ("", "-wal", "-shm", "-journal"):
+                    if os.path.exists(db_settings["NAME"] + suffix):
+                        os.remove(db_settings["NAME"] + suffix)
+
+    def seed(self, alias):
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute(
+                "CREATE TABLE bench_entry (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+                "mal_id INTEGER, score INTEGER, updated_at REAL, UNIQUE (user_id, mal_id))"
+            )
+            cursor.executemany(
+                "INSERT INTO bench_entry (user_id, mal_id, score, updated_at) VALUES (%s, %s, 0, 0)",
+                [(u, m) for u in range(USERS) for m in range(ROWS_PER_USER)],
+            )
+        connections[alias].close()
+
+    def write(self, alias, rng):
+        user_id = rng.randrange(USERS)
+        rows = [(user_id, rng.randrange(ROWS_PER_USER), rng.randint(0, 10), time.time()) for _ in range(WRITE_BATCH)]
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM bench_entry WHERE user_id = %s", [user_id])
+            cursor.executemany(
+                "INSERT INTO bench_entry (user_id, mal_id, score, updated_at) VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (user_id, mal_id) DO UPDATE SET score = excluded.score, updated_at = excluded.updated_at",
+                rows,
+            )
+
+    def read(self, alias, rng):
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT mal_id, score FROM bench_entry WHERE user_id = %s", [rng.randrange(USERS)])
+            cursor.fetchall()
+
+    def run(self, alias, writers, readers, seconds):
+        results = {"write": [], "read": []}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def worker(kind, seed):
+            op = self.write if kind == "write" else self.read
+            rng = random.Random(seed)
+            latencies, errors = [], 0
+            try:
+                while time.monotonic() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        op(alias, rng)
+                        latencies.append(time.perf_counter() - start)
+                    except OperationalError:
+                        errors += 1
+                    # End of "request": stock closes here, persistent connections are kept
+                    connections[alias].close_if_unusable_or_obsolete()
+            finally:
+                connections[alias].close()
+            with lock:
+                results[kind].append((latencies, errors))
+
+        threads = [threading.Thread(target=worker, args=("write", i)) for i in range(writers)]
+        threads += [threading.Thread(target=worker, args=("read", 1000 + i)) for i in range(readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, name, results, seconds):
+        self.stdout.write(name)
+        for kind, per_thread in results.items():
+            latencies = sorted(l for thread_latencies, _ in per_thread for l in thread_latencies)
+            errors = sum(e for _, e in per_thread)
+            if not latencies:
+                self.stdout.write(f"  {kind:<5} no successful operations, {errors} locked")
+                continue
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+            self.stdout.write(
+                f"  {kind:<5} {len(latencies) / seconds:8.0f} ops/s  "
+                f"median {statistics.median(latencies) * 1000:7.2f} ms  p95 {p95 * 1000:8.2f} ms  "
+                f"{errors} 'database is locked'"
+            )
@@ -0,0 +1,38 @@
+"""
+Rebuild the materialized UserStats rollups from stored entries.
+
+    python manage.py rebuild_stats              # every user with entries
+    python manage.py rebuild_stats --missing    # only users without a UserStats row yet
+    python manage.py rebuild_stats --user alice --user bob
+
+Run once after upgrading to the UserStats rollup: until then the stats page
+of users whose lists were synced before it shows zeros, and nothing else
+fills their row in before their next list sync.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import AnimeEntry, UserStats
+from api.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild UserStats rollups from the stored anime lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", default=[], help="Username to rebuild (repeatable)")
+        parser.add_argument("--missing", action="store_true", help="Skip users who already have a UserStats row")
+
+    def handle(self, *args, **options):
+        user_ids = AnimeEntry.objects.values_list("user_id", flat=True).distinct()
+        if options["user"]:
+            user_ids = user_ids.filter(user__username__in=options["user"])
+            if not user_ids.exists():
+                raise CommandError(f"No stored entries for {', '.join(options['user'])}")
+        if options["missing"]:
+            user_ids = user_ids.exclude(user_id__in=UserStats.objects.values("user_id"))
+
+        rebuilt = 0
+        for user_id in list(user_ids.order_by("user_id")):
+            rebuild_user_stats(user_id)
+            rebuilt += 1
+        self.stdout.write(f"Rebuilt stats for {rebuilt} user(s)")
@@ -0,0 +1,47 @@
+"""
+Keep active users' lists and profiles fresh in the background.
+
+    python manage.py run_refresh_scheduler           # loop forever
+    python manage.py run_refresh_scheduler --once    # one round, then exit
+
+Each round refreshes due users most-stale/most-active first and stops when
+the shared MAL budget (MAL_REQUEST_BUDGET per minute) has no room left,
+waiting for the next budget window before continuing.
+"""
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import budget, refresh
+
+
+class Command(BaseCommand):
+    help = "Refresh stale user lists and profiles within the MAL request budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run a single round and exit")
+        parser.add_argument("--interval", type=float, default=60.0,
+                            help="Seconds to sleep when no user is due")
+        parser.add_argument("--max-users", type=int, default=None,
+                            help="Refresh at most this many users per round")
+        parser.add_argument("--name", default=f"scheduler:{socket.gethostname()}:{os.getpid()}",
+                            help="Worker name recorded on the sync jobs it runs")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                refreshed, deferred = refresh.run_round(options["name"], options["max_users"])
+                self.stdout.write(f"Refreshed {refreshed} user(s), {deferred} still due")
+                if options["once"]:
+                    break
+                if deferred:
+                    # Out of budget (or max-users): pick up again in the next window
+                    time.sleep(budget.seconds_until_reset())
+                else:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
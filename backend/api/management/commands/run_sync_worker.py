@@ -0,0 +1,51 @@
+"""
+Process queued anime list syncs.
+
+    python manage.py run_sync_worker            # run until interrupted
+    python manage.py run_sync_worker --once     # drain the queue and exit
+
+Run as many workers as there is MAL/DB capacity for; jobs are claimed with a
+conditional UPDATE so two workers never run the same one.
+"""
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued anime list sync jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to wait between polls of an empty queue")
+        parser.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}",
+                            help="Worker name recorded on claimed jobs")
+
+    def handle(self, *args, **options):
+        name = options["name"]
+        self.stdout.write(f"Sync worker {name} started")
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                jobs.reclaim_stale()
+                job = jobs.claim_next(name)
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                self.stdout.write(f"Running sync {job.pk} for {job.user.username}")
+                job = jobs.run_job(job)
+                processed += 1
+                self.stdout.write(f"Sync {job.pk} {job.status}")
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Sync worker {name} stopped after {processed} job(s)")
@@ -0,0 +1,245 @@
+"""
+Response compression for the API.
+
+WhiteNoise serves static files pre-compressed, but API responses (anime
+detail payloads, stats, the streamed anime list) would otherwise go out as
+plain JSON. ``CompressionMiddleware`` negotiates ``Accept-Encoding``:
+brotli when the client accepts it, gzip otherwise. ``Brotli`` is in
+requirements.txt; where it can't be installed only gzip is offered.
+
+- Responses under ``COMPRESSION_MIN_SIZE`` bytes are sent as they are; the
+  headers would eat most of the saving.
+- Streaming responses are compressed chunk by chunk, each chunk flushed, so
+  NDJSON and the chunked list still reach the client as they are produced.
+- Server-Sent Events are never compressed: the compressor would hold events
+  back, and they are tiny anyway.
+- Auth and token endpoints (``COMPRESSION_EXCLUDED_PATHS``) are never
+  compressed. Their bodies carry secrets (JWTs, CSRF tokens) next to
+  request input, which is what BREACH needs to recover a secret from the
+  compressed length. Buffered gzip bodies also get a random-length file
+  name in the gzip header, as Django's GZipMiddleware does, so lengths
+  give away less elsewhere. Brotli has no such field.
+
+Bytes in and out per encoding are counted per process (``stats()``, shown
+by debug-config) to keep an eye on the compression ratio.
+"""
+import gzip
+import logging
+import re
+import secrets
+import threading
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Smaller bodies are not worth compressing
+COMPRESSION_MIN_SIZE = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+# Dynamic responses are compressed on every request, so favour speed
+GZIP_LEVEL = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+BROTLI_QUALITY = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+# Path prefixes whose responses hold secrets; see the module docstring
+COMPRESSION_EXCLUDED_PATHS = tuple(getattr(settings, 'COMPRESSION_EXCLUDED_PATHS', (
+    '/admin/',
+    '/oauth/',
+    '/api/login/',
+    '/api/callback/',
+    '/api/exchange-token/',
+    '/api/token/',
+    '/api/csrf-token/',
+    '/api/session-status/',
+    '/api/logout/',
+)))
+
+# Buffered gzip bodies get a file name of up to this many random bytes (0: none)
+GZIP_MAX_RANDOM_BYTES = getattr(settings, 'COMPRESSION_GZIP_MAX_RANDOM_BYTES', 100)
+
+# text/event-stream is deliberately not here, see the module docstring
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/xml",
+}
+
+_coding_re = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$")
+
+_counters = defaultdict(lambda: {"responses": 0, "streamed": 0, "bytes_in": 0, "bytes_out": 0})
+_skipped = defaultdict(int)
+_counters_lock = threading.Lock()
+
+
+def _count(encoding, bytes_in, bytes_out, streamed=False):
+    with _counters_lock:
+        counts = _counters[encoding]
+        counts["responses"] += 1
+        counts["streamed"] += int(streamed)
+        counts["bytes_in"] += bytes_in
+        counts["bytes_out"] += bytes_out
+
+
+def _skip(reason):
+    with _counters_lock:
+        _skipped[reason] += 1
+
+
+def stats():
+    with _counters_lock:
+        encodings = {name: dict(counts) for name, counts in _counters.items()}
+        skipped = dict(_skipped)
+    for counts in encodings.values():
+        counts["ratio"] = round(counts["bytes_out"] / counts["bytes_in"], 3) if counts["bytes_in"] else None
+    return {"encodings": encodings, "skipped": skipped, "brotli_available": brotli is not None}
+
+
+def accepted_encoding(header):
+    """
+    The encoding to use for an ``Accept-Encoding`` header: "br", "gzip" or
+    None. Brotli wins when both are accepted, q-values of 0 exclude.
+    """
+    weights = {}
+    for part in header.split(","):
+        match = _coding_re.match(part)
+        if not match:
+            continue
+        coding, q = match.group(1).lower(), match.group(2)
+        try:
+            weights[coding] = float(q) if q is not None else 1.0
+        except ValueError:
+            continue
+    wildcard = weights.get("*", 0)
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    accepted = [c for c in candidates if weights.get(c, wildcard) > 0]
+    if not accepted:
+        return None
+    # Highest q first, our preference order on ties
+    return max(accepted, key=lambda c: (weights.get(c, wildcard), -candidates.index(c)))
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    compressed = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    if not GZIP_MAX_RANDOM_BYTES:
+        return compressed
+    # As django.utils.text.compress_string: set FNAME and put the name after the 10-byte header
+    header = bytearray(compressed[:10])
+    header[3] = gzip.FNAME
+    filename = b"a" * secrets.randbelow(GZIP_MAX_RANDOM_BYTES) + b"\x00"
+    return bytes(header) + filename + compressed[10:]
+
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.bytes_in = self.bytes_out = 0
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits 16 + MAX_WBITS: gzip header and trailer
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data):
+        self.bytes_in += len(data)
+        if self.encoding == "br":
+            out = self._brotli.process(data) + self._brotli.flush()
+        else:
+            out = self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        self.bytes_out += len(out)
+        return out
+
+    def finish(self):
+        out = self._brotli.finish() if self.encoding == "br" else self._zlib.flush(zlib.Z_FINISH)
+        self.bytes_out += len(out)
+        _count(self.encoding, self.bytes_in, self.bytes_out, streamed=True)
+        return out
+
+
+def _compress_stream(chunks, compressor):
+    for data in chunks:
+        out = compressor.chunk(data)
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+async def _acompress_stream(chunks, compressor):
+    async for data in chunks:
+        out = compressor.chunk(data)
+        if out:
+            yield out
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Brotli/gzip for API responses; see the module docstring. Works for sync
+    and async (ASGI) requests and responses.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding") or response.status_code in (204, 304):
+            return response
+        if request.path.startswith(COMPRESSION_EXCLUDED_PATHS):
+            _skip("excluded")
+            return response
+        media_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        if media_type not in COMPRESSIBLE_TYPES:
+            return response
+
+        # The body now depends on the request's Accept-Encoding
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        if not response.streaming and len(response.content) < COMPRESSION_MIN_SIZE:
+            _skip("small")
+            return response
+
+        encoding = accepted_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            _skip("not_accepted")
+            return response
+
+        if response.streaming:
+            compressor = _StreamCompressor(encoding)
+            if response.is_async:
+                response.streaming_content = _acompress_stream(response.streaming_content, compressor)
+            else:
+                response.streaming_content = _compress_stream(response.streaming_content, compressor)
+            # The compressed length isn't known up front
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                _skip("incompressible")
+                return response
+            _count(encoding, len(response.content), len(compressed))
+            logger.debug(f"[compression] {request.path}: {len(response.content)} -> {len(compressed)} bytes ({encoding})")
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        # Same resource, different bytes: a strong ETag would no longer be valid
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_userprofile_birthday_userprofile_joined_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Anime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mal_id', models.IntegerField(unique=True)),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('detail', models.JSONField(blank=True, null=True)),
+                ('detail_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('mal_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_anime'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anime',
+            name='average_episode_duration',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='genres',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='media_type',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='num_episodes',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='studios',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_count', models.IntegerField(default=0)),
+                ('scored_count', models.IntegerField(default=0)),
+                ('score_total', models.IntegerField(default=0)),
+                ('total_watch_minutes', models.FloatField(default=0)),
+                ('genre_counts', models.JSONField(blank=True, default=dict)),
+                ('studio_counts', models.JSONField(blank=True, default=dict)),
+                ('score_histogram', models.JSONField(blank=True, default=dict)),
+                ('media_type_counts', models.JSONField(blank=True, default=dict)),
+                ('perfect_scores', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
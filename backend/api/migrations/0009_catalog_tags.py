@@ -0,0 +1,89 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_userprofile_refresh_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mal_id', models.IntegerField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Studio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mal_id', models.IntegerField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Theme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mal_id', models.IntegerField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        # The name lists make way for the many-to-many fields and are dropped
+        # in 0011, once 0010 has copied them over
+        migrations.RenameField(
+            model_name='anime',
+            old_name='genres',
+            new_name='genre_names',
+        ),
+        migrations.RenameField(
+            model_name='anime',
+            old_name='studios',
+            new_name='studio_names',
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='image_url',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='list_fields_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='genres',
+            field=models.ManyToManyField(blank=True, related_name='anime', to='api.genre'),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='studios',
+            field=models.ManyToManyField(blank=True, related_name='anime', to='api.studio'),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='themes',
+            field=models.ManyToManyField(blank=True, related_name='anime', to='api.theme'),
+        ),
+        migrations.AddField(
+            model_name='animeentry',
+            name='anime',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='api.anime'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+"""
+Move per-entry titles/pictures and the catalog's genre/studio name lists onto
+the normalized catalog, and point every AnimeEntry at its Anime row.
+
+Tags are keyed by MAL id, but the old name lists only had names; ids are
+taken from stored detail payloads. A catalog row with a name that can't be
+resolved keeps ``list_fields_at`` empty, which makes the next list sync
+rewrite it with full tag data.
+"""
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 500
+
+
+def populate_catalog(apps, schema_editor):
+    Anime = apps.get_model('api', 'Anime')
+    AnimeEntry = apps.get_model('api', 'AnimeEntry')
+    db = schema_editor.connection.alias
+    tag_models = {
+        'genres': apps.get_model('api', 'Genre'),
+        'studios': apps.get_model('api', 'Studio'),
+    }
+
+    # Every anime on someone's list gets a catalog row, titled from the newest entry
+    known = set(Anime.objects.using(db).values_list('mal_id', flat=True))
+    missing = {}
+    images = {}
+    for mal_id, title, image_url in AnimeEntry.objects.using(db).order_by('-updated_at').values_list('mal_id', 'title', 'image_url'):
+        if image_url and mal_id not in images:
+            images[mal_id] = image_url
+        if mal_id not in known and mal_id not in missing:
+            missing[mal_id] = Anime(mal_id=mal_id, title=title[:255], image_url=image_url)
+    Anime.objects.using(db).bulk_create(missing.values(), batch_size=BATCH_SIZE)
+
+    # name -> MAL id, from the detail payloads we have
+    tag_ids = {key: {} for key in tag_models}
+    for detail in Anime.objects.using(db).exclude(detail=None).values_list('detail', flat=True).iterator():
+        for key, ids in tag_ids.items():
+            for tag in detail.get(key) or []:
+                ids.setdefault(tag['name'], tag['id'])
+    tag_pks = {}
+    for key, model in tag_models.items():
+        model.objects.using(db).bulk_create(
+            [model(mal_id=mal_id, name=name[:100]) for name, mal_id in tag_ids[key].items()],
+            ignore_conflicts=True,
+        )
+        tag_pks[key] = dict(model.objects.using(db).values_list('name', 'pk'))
+
+    links = {key: [] for key in tag_models}
+    updated = []
+    for anime in Anime.objects.using(db).iterator():
+        names = {'genres': anime.genre_names or [], 'studios': anime.studio_names or []}
+        resolved = True
+        for key, model in tag_models.items():
+            column = f'{model._meta.model_name}_id'
+            through = getattr(Anime, key).through
+            for name in names[key]:
+                if name in tag_pks[key]:
+                    links[key].append(through(anime_id=anime.pk, **{column: tag_pks[key][name]}))
+                else:
+                    resolved = False
+
+        if not anime.image_url:
+            anime.image_url = images.get(anime.mal_id) or ((anime.detail or {}).get('main_picture') or {}).get('medium')
+        # media_type is only blank if no list sync has stored this row yet
+        anime.list_fields_at = anime.updated_at if resolved and anime.media_type else None
+        updated.append(anime)
+
+    Anime.objects.using(db).bulk_update(updated, ['image_url', 'list_fields_at'], batch_size=BATCH_SIZE)
+    for key, rows in links.items():
+        getattr(Anime, key).through.objects.using(db).bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    AnimeEntry.objects.using(db).update(
+        anime=Subquery(Anime.objects.using(db).filter(mal_id=OuterRef('mal_id')).values('pk')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_catalog_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_catalog, migrations.RunPython.noop),
+    ]
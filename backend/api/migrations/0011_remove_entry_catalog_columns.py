@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_populate_catalog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='animeentry',
+            name='anime',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entries', to='api.anime'),
+        ),
+        migrations.RemoveField(
+            model_name='animeentry',
+            name='title',
+        ),
+        migrations.RemoveField(
+            model_name='animeentry',
+            name='image_url',
+        ),
+        migrations.RemoveField(
+            model_name='anime',
+            name='genre_names',
+        ),
+        migrations.RemoveField(
+            model_name='anime',
+            name='studio_names',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_remove_entry_catalog_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animeentry',
+            index=models.Index(fields=['user', 'status', 'score'], name='entry_user_status_score'),
+        ),
+        migrations.AddIndex(
+            model_name='animeentry',
+            index=models.Index(fields=['user', '-last_updated'], name='entry_user_last_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='animeentry',
+            index=models.Index(fields=['user', 'score'], name='entry_user_score'),
+        ),
+        migrations.AddIndex(
+            model_name='animeentry',
+            index=models.Index(fields=['user', 'updated_at', 'mal_id', 'anime', 'status', 'score', 'episodes_watched', 'is_rewatching', 'start_date', 'finish_date', 'last_updated'], name='entry_user_list_covering'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_animeentry_access_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='animeentry',
+            name='entry_user_last_updated',
+        ),
+        migrations.AddIndex(
+            model_name='animeentry',
+            index=models.Index(fields=['user', 'last_updated', 'id'], name='entry_user_last_updated_id'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:24
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_list_fields_changed_at(apps, schema_editor):
+    # updated_at is the best bound on when an existing row's title or picture last changed
+    Anime = apps.get_model('api', 'Anime')
+    Anime.objects.using(schema_editor.connection.alias).update(list_fields_changed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_animeentry_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anime',
+            name='list_fields_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_list_fields_changed_at, migrations.RunPython.noop),
+    ]
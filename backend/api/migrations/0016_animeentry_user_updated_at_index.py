@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_anime_list_fields_changed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='animeentry',
+            name='entry_user_list_covering',
+        ),
+        migrations.AddIndex(
+            model_name='animeentry',
+            index=models.Index(fields=['user', 'updated_at'], name='entry_user_updated_at'),
+        ),
+    ]
@@ -13,16 +13,24 @@ class UserProfile(models.Model):
     location = models.CharField(max_length=100, blank=True, null=True)
     joined_at = models.DateTimeField(blank=True, null=True)
     picture = models.URLField(blank=True, null=True)
+
+    # Bookkeeping for the background refresh scheduler
+    last_seen_at = models.DateTimeField(blank=True, null=True)
+    list_synced_at = models.DateTimeField(blank=True, null=True)
+    profile_synced_at = models.DateTimeField(blank=True, null=True)
     
     def __str__(self):
         return self.user.username
 
 
 class AnimeEntry(models.Model):
+    """
+    One anime on one user's list. Only the personal list status lives here;
+    title, picture, genres etc. come from the shared ``anime`` row.
+    """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='anime_entries')
     mal_id = models.IntegerField()
-    title = models.CharField(max_length=255)
-    image_url = models.URLField(blank=True, null=True)
+    anime = models.ForeignKey('Anime', on_delete=models.PROTECT, related_name='entries')
     status = models.CharField(max_length=50)
     score = models.FloatField(null=True, blank=True)
     episodes_watched = models.IntegerField(null=True, blank=True)
@@ -34,4 +42,151 @@ class AnimeEntry(models.Model):
 
     class Meta:
         unique_together = ('user', 'mal_id')
+        indexes = [
+            # Completed lists (stats, recommendations), optionally by score
+            models.Index(fields=['user', 'status', 'score'], name='entry_user_status_score'),
+            # Most recently updated first, and cached-animelist keyset pages on
+            # (last_updated, id); scanned backwards for the newest-first order
+            models.Index(fields=['user', 'last_updated', 'id'], name='entry_user_last_updated_id'),
+            models.Index(fields=['user', 'score'], name='entry_user_score'),
+            # The cached-animelist ETag summary (newest updated_at) and the
+            # since= delta feed (updated_at > since)
+            models.Index(fields=['user', 'updated_at'], name='entry_user_updated_at'),
+        ]
+
+
+class AnimeEntryTombstone(models.Model):
+    """
+    Marks an entry that a sync deleted, so the ``since=`` delta feed of
+    cached-animelist can tell replicas to drop it. Removed when the entry is
+    added back, and pruned after ``TOMBSTONE_RETENTION``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='anime_tombstones')
+    mal_id = models.IntegerField()
+    deleted_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'mal_id')
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_at'),
+        ]
+
+
+class CatalogTag(models.Model):
+    """A MAL genre/studio/theme, keyed by its MAL id"""
+    mal_id = models.IntegerField(unique=True)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.name
+
+
+class Genre(CatalogTag):
+    pass
+
+
+class Studio(CatalogTag):
+    pass
+
 
+class Theme(CatalogTag):
+    pass
+
+
+class Anime(models.Model):
+    """
+    Shared, user-independent MAL data for one anime, referenced by every
+    user's AnimeEntry for it. ``detail`` holds the anime_detail payload
+    without ``my_list_status`` so every user can be served from the same row.
+    """
+    mal_id = models.IntegerField(unique=True)
+    title = models.CharField(max_length=255, blank=True)
+    image_url = models.URLField(blank=True, null=True)
+    media_type = models.CharField(max_length=50, blank=True)
+    num_episodes = models.IntegerField(null=True, blank=True)
+    average_episode_duration = models.IntegerField(null=True, blank=True)  # seconds
+    genres = models.ManyToManyField(Genre, related_name='anime', blank=True)
+    studios = models.ManyToManyField(Studio, related_name='anime', blank=True)
+    themes = models.ManyToManyField(Theme, related_name='anime', blank=True)
+    # When the list fields above were last stored; None until a list sync has seen it
+    list_fields_at = models.DateTimeField(null=True, blank=True)
+    # When title or image_url (what cached-animelist shows) last changed. The
+    # list's ETag and delta feed follow this rather than updated_at, which any
+    # user's sync touching the row bumps.
+    list_fields_changed_at = models.DateTimeField(null=True, blank=True)
+    detail = models.JSONField(null=True, blank=True)
+    detail_fetched_at = models.DateTimeField(null=True, blank=True)
+    mal_updated_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title or str(self.mal_id)
+
+
+class UserStats(models.Model):
+    """
+    Materialized rollup of a user's completed anime for the stats page.
+    Maintained from AnimeEntry changes by ``api.stats``; never edit by hand.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats')
+    completed_count = models.IntegerField(default=0)
+    scored_count = models.IntegerField(default=0)
+    score_total = models.IntegerField(default=0)
+    total_watch_minutes = models.FloatField(default=0)
+    genre_counts = models.JSONField(default=dict, blank=True)
+    studio_counts = models.JSONField(default=dict, blank=True)
+    score_histogram = models.JSONField(default=dict, blank=True)
+    media_type_counts = models.JSONField(default=dict, blank=True)
+    perfect_scores = models.JSONField(default=dict, blank=True)  # mal_id -> title of every 10/10
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.user.username}"
+
+
+class SyncJob(models.Model):
+    """
+    One queued anime list sync, run by the ``run_sync_worker`` command. At
+    most one job per user can be queued or running at a time.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='one_active_sync_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Sync {self.pk} for {self.user.username} ({self.status})"
@@ -0,0 +1,18 @@
+"""
+Extra DRF parsers.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from . import fastjson
+
+
+class FastJSONParser(BaseParser):
+    """Default JSON parser: ``JSONParser`` on ``api.fastjson``"""
+    media_type = fastjson.JSON_CONTENT_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return fastjson.loads(stream.read())
+        except (fastjson.JSONDecodeError, UnicodeDecodeError) as e:
+            raise ParseError(f"JSON parse error - {e}")
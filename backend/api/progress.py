@@ -0,0 +1,159 @@
+"""
+Live progress for sync jobs.
+
+The worker running a ``SyncJob`` publishes a small progress record (phase,
+pages fetched, rows upserted, ETA) to the shared cache after every committed
+page. ``sync-progress/<job_id>/`` streams those records to the browser as
+Server-Sent Events. The stream only polls the cache, so an open connection
+holds no database connection while it waits. Streams are served under ASGI
+(``ASYNC_VIEWS``) only, where waiting costs no thread; the WSGI view answers
+406 and clients poll ``sync-status``.
+
+Records go straight to the shared cache, not through the tiered default
+cache: its per-process L1 could hide another process's update for up to
+``L1_TIMEOUT`` seconds.
+"""
+import asyncio
+import logging
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+from . import fastjson
+from .models import SyncJob
+
+logger = logging.getLogger(__name__)
+
+# Progress records outlive any sync, then expire on their own
+PROGRESS_TTL = 60 * 60
+
+# How often an open stream checks for a new record
+POLL_INTERVAL = 0.5
+
+# Comment line sent on quiet streams so proxies don't drop the connection
+KEEPALIVE_SECONDS = 15
+
+# Streams end after this long; the client falls back to sync-status
+STREAM_MAX_SECONDS = 5 * 60
+
+TERMINAL_STATUSES = (SyncJob.SUCCEEDED, SyncJob.FAILED)
+
+
+def _key(job_id):
+    return f"sync_progress:{job_id}"
+
+
+def _shared():
+    return caches["shared"]
+
+
+def read(job_id):
+    return _shared().get(_key(job_id))
+
+
+aread = sync_to_async(read, thread_sensitive=False)
+
+
+def estimate_eta(record, now):
+    """
+    Seconds left, from the average time per page so far and the page count
+    implied by how many entries the user had before this sync; None while
+    there is nothing to go on or the list turned out longer than expected.
+    """
+    pages = record.get("pages") or 0
+    expected = record.get("expected_pages") or 0
+    started = record.get("started")
+    if not pages or not started or pages >= expected:
+        return None
+    per_page = (now - started) / pages
+    return round(per_page * (expected - pages), 1)
+
+
+def publish(job_id, status, phase, counts=None, page_size=None, result=None, error=None):
+    """
+    Update the progress record of ``job_id``. ``counts`` is what the sync
+    pipeline reports (see ``api.sync.sync_user_pages``). Publishing never
+    raises: progress is best effort and must not fail the sync itself.
+    """
+    try:
+        now = time.time()
+        record = (None if phase == "queued" else read(job_id)) or {
+            "job_id": job_id, "seq": 0, "pages": 0, "rows_upserted": 0,
+        }
+        record.update(status=status, phase=phase, seq=record["seq"] + 1, result=result, error=error or None)
+        if phase == "fetching":
+            # (Re)started by a worker: time pages from here
+            record.update(started=now, pages=0, rows_upserted=0)
+        if counts is not None:
+            record["pages"] = counts["pages"]
+            record["rows_upserted"] = counts["created"] + counts["updated"]
+            if page_size:
+                expected = math.ceil(counts.get("expected_entries", 0) / page_size)
+                record["expected_pages"] = max(expected, counts["pages"])
+        record["eta_seconds"] = estimate_eta(record, now) if phase == "syncing" else None
+        _shared().set(_key(job_id), record, timeout=PROGRESS_TTL)
+        return record
+    except Exception as e:
+        logger.warning(f"[progress] Could not publish progress for sync {job_id}: {e}")
+        return None
+
+
+def event_payload(record):
+    """The record as sent to clients, without bookkeeping fields"""
+    return {k: v for k, v in record.items() if k not in ("seq", "started")}
+
+
+def format_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {fastjson.dumps(data).decode()}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _event_for(record):
+    event = "done" if record.get("status") in TERMINAL_STATUSES else "progress"
+    return event, format_event(event, event_payload(record), record.get("seq"))
+
+
+async def aevent_stream(job_id, initial):
+    """
+    Async generator of SSE chunks for ``job_id``, starting with ``initial``
+    (a record built from the job row). Ends after the terminal event.
+    """
+    event, chunk = _event_for(initial)
+    yield chunk
+    if event == "done":
+        return
+
+    last_seq = initial.get("seq")
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < STREAM_MAX_SECONDS:
+        await asyncio.sleep(POLL_INTERVAL)
+        record = await aread(job_id)
+        if record is not None and record["seq"] != last_seq:
+            last_seq = record["seq"]
+            last_sent = time.monotonic()
+            event, chunk = _event_for(record)
+            yield chunk
+            if event == "done":
+                return
+        elif time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+
+
+def initial_record(job):
+    """Starting point of a stream: the latest published record, or one built from the job row"""
+    record = read(job.pk)
+    if job.status in TERMINAL_STATUSES:
+        # The row is authoritative once the job is over
+        record = dict(record or {}, job_id=job.pk, status=job.status, result=job.result,
+                      phase="done" if job.status == SyncJob.SUCCEEDED else "failed",
+                      error=job.error or None, eta_seconds=None)
+    elif record is None:
+        record = {"job_id": job.pk, "status": job.status, "phase": "queued", "pages": 0,
+                  "rows_upserted": 0, "eta_seconds": None, "error": None}
+    return record
@@ -0,0 +1,116 @@
+"""
+Shared cache for MAL anime rankings.
+
+Rankings are the same for every user, so one fetch is shared by all requests
+through the "ranking" cache namespace. Entries are served for that namespace's
+TTL; after that the stale copy is still returned while a background thread
+refreshes it, so only a cold cache ever makes a request wait on MAL.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import cache as api_cache
+from .mal_client import mal_client, async_mal_client, MALError
+
+logger = logging.getLogger(__name__)
+
+# Serve a cached ranking this long before refreshing it (seconds)
+RANKING_CACHE_TTL = api_cache.ttl("ranking")
+
+# Stale entries stay usable this much longer while a refresh is in flight
+RANKING_CACHE_GRACE = getattr(settings, 'MAL_RANKING_CACHE_GRACE', 6 * 60 * 60)
+
+# Upper bound on one background refresh; also the refresh lock's lifetime
+REFRESH_LOCK_TIMEOUT = 60
+
+
+def ranking_cache_key(ranking_type, fields, limit):
+    """Cache key for a ranking request; field order does not matter."""
+    canonical_fields = ",".join(sorted(f.strip() for f in fields.split(",") if f.strip()))
+    return f"{ranking_type}:{limit}:{api_cache.hashed(canonical_fields)}"
+
+
+def _ranking_params(ranking_type, fields, limit):
+    return {"ranking_type": ranking_type, "limit": limit, "fields": fields}
+
+
+def _store(key, data):
+    api_cache.set(
+        "ranking",
+        key,
+        {"fetched_at": time.time(), "data": data},
+        timeout=RANKING_CACHE_TTL + RANKING_CACHE_GRACE,
+    )
+
+
+def _fetch_and_store(key, token, params, timeout=None):
+    data = mal_client.get("/anime/ranking", token, params=params, timeout=timeout).get("data", [])
+    _store(key, data)
+    logger.info(f"[ranking_cache] Refreshed {key} ({len(data)} items)")
+    return data
+
+
+def _background_refresh(key, token, params):
+    try:
+        _fetch_and_store(key, token, params)
+    except MALError as e:
+        logger.warning(f"[ranking_cache] Background refresh of {key} failed: {e.message}")
+    finally:
+        api_cache.delete("ranking", f"{key}:refreshing")
+
+
+def _schedule_refresh(key, token, params):
+    # add only succeeds for the first caller, so each stale window triggers
+    # a single refresh across all workers sharing the cache
+    if api_cache.add("ranking", f"{key}:refreshing", 1, timeout=REFRESH_LOCK_TIMEOUT):
+        threading.Thread(
+            target=_background_refresh,
+            args=(key, token, params),
+            name="ranking-refresh",
+            daemon=True,
+        ).start()
+
+
+def get_ranking(token, ranking_type, fields, limit, timeout=None):
+    """
+    Return the ``data`` list of ``/anime/ranking`` for these parameters.
+    Raises MALError only when nothing is cached and the live fetch fails.
+    ``timeout`` bounds that live fetch (default: the client's).
+    """
+    key = ranking_cache_key(ranking_type, fields, limit)
+    params = _ranking_params(ranking_type, fields, limit)
+
+    entry = api_cache.get("ranking", key)
+    if entry is not None:
+        if time.time() - entry["fetched_at"] > RANKING_CACHE_TTL:
+            _schedule_refresh(key, token, params)
+        return entry["data"]
+
+    logger.info(f"[ranking_cache] Miss for {key}, fetching from MAL")
+    return _fetch_and_store(key, token, params, timeout)
+
+
+async def aget_ranking(token, ranking_type, fields, limit):
+    """Async version of ``get_ranking`` for the async views."""
+    key = ranking_cache_key(ranking_type, fields, limit)
+    params = _ranking_params(ranking_type, fields, limit)
+
+    entry = await api_cache.aget("ranking", key)
+    if entry is not None:
+        if time.time() - entry["fetched_at"] > RANKING_CACHE_TTL:
+            # The refresh thread outlives the request's event loop, unlike a task
+            _schedule_refresh(key, token, params)
+        return entry["data"]
+
+    logger.info(f"[ranking_cache] Miss for {key}, fetching from MAL")
+    data = (await async_mal_client.get("/anime/ranking", token, params=params)).get("data", [])
+    await api_cache.aset(
+        "ranking",
+        key,
+        {"fetched_at": time.time(), "data": data},
+        timeout=RANKING_CACHE_TTL + RANKING_CACHE_GRACE,
+    )
+    return data
@@ -0,0 +1,66 @@
+"""
+Per-user cache for the recommendation pipeline.
+
+The preference profile and the raw MAL search results each section filters
+("candidate pools") only change when the user's list does, so they are kept in
+the "recommendations" cache namespace scoped to the user and dropped by
+``invalidate_user`` after a sync. A regenerate then only re-picks the anchor
+and re-runs the local filtering and ranking.
+"""
+import logging
+
+from . import cache as api_cache
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "recommendations"
+
+_MISSING = object()
+
+
+def pool_key(path, params):
+    return f"pool:{path}:{api_cache.hashed(sorted(params.items()))}"
+
+
+def get_profile(user_id, build):
+    """The user's preference profile, built with ``build()`` on a miss"""
+    return api_cache.get_or_set(NAMESPACE, "profile", build, scope=user_id)
+
+
+async def aget_profile(user_id, build):
+    """Async version of ``get_profile``; ``build`` is a coroutine function"""
+    prefs = await api_cache.aget(NAMESPACE, "profile", scope=user_id)
+    if prefs is None:
+        prefs = await build()
+        await api_cache.aset(NAMESPACE, "profile", prefs, scope=user_id)
+    return prefs
+
+
+def get_pool(user_id, path, params, fetch):
+    """
+    Candidates for one section search, fetched with ``fetch()`` on a miss.
+    MALError from ``fetch`` propagates and nothing is cached, so a failed
+    search is retried on the next request instead of pinning an empty pool.
+    """
+    key = pool_key(path, params)
+    data = api_cache.get(NAMESPACE, key, scope=user_id, default=_MISSING)
+    if data is _MISSING:
+        data = fetch()
+        api_cache.set(NAMESPACE, key, data, scope=user_id)
+    return data
+
+
+async def aget_pool(user_id, path, params, fetch):
+    """Async version of ``get_pool``; ``fetch`` is a coroutine function"""
+    key = pool_key(path, params)
+    data = await api_cache.aget(NAMESPACE, key, scope=user_id, default=_MISSING)
+    if data is _MISSING:
+        data = await fetch()
+        await api_cache.aset(NAMESPACE, key, data, scope=user_id)
+    return data
+
+
+def invalidate_user(user_id):
+    """Drop the cached profile and every candidate pool for this user"""
+    api_cache.invalidate(NAMESPACE, scope=user_id)
+    logger.info(f"[recommendation_cache] Invalidated user {user_id}")
@@ -0,0 +1,147 @@
+"""
+Background refresh of users' lists and profiles.
+
+``run_refresh_scheduler`` keeps local data warm so interactive pages rarely
+wait on MAL. Users are refreshed most-stale first, weighted by how recently
+they were active, and inactive users are left alone. The scheduler only
+spends what is left of the global MAL budget (``api.budget``). List refreshes
+go through the SyncJob queue, so they are deduplicated against syncs the user
+started themselves.
+"""
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import budget, jobs
+from .mal_client import mal_client, MALError
+from .models import AnimeEntry, SyncJob, UserProfile
+from .sync import SYNC_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Data younger than this is fresh enough, the user is not a candidate
+REFRESH_MIN_AGE = timedelta(seconds=getattr(settings, 'REFRESH_MIN_AGE', 6 * 60 * 60))
+
+# Users not seen for this long are not refreshed in the background at all
+REFRESH_INACTIVE_AFTER = timedelta(seconds=getattr(settings, 'REFRESH_INACTIVE_AFTER', 30 * 24 * 60 * 60))
+
+# Never-synced data counts as this stale when ranking
+NEVER_SYNCED_AGE = timedelta(days=365)
+
+
+def apply_mal_profile(profile, data):
+    """Copy a MAL ``/users/@me`` payload onto ``profile`` and save it"""
+    profile.name = data.get("name")
+    profile.birthday = data.get("birthday")
+    profile.location = data.get("location")
+    profile.joined_at = data.get("joined_at")
+    profile.picture = data.get("picture") # or data.get("main_picture", {}).get("medium")
+    profile.profile_synced_at = timezone.now()
+    # Only our columns, so a token refreshed meanwhile is not overwritten
+    profile.save(update_fields=["name", "birthday", "location", "joined_at", "picture", "profile_synced_at"])
+    return profile
+
+
+def refresh_profile(profile):
+    """Fetch the user's MAL profile and store it; raises MALError"""
+    return apply_mal_profile(profile, mal_client.get("/users/@me", profile.mal_access_token))
+
+
+def priority(profile, now):
+    """
+    Higher runs first: how stale the data is, scaled down the longer the user
+    has been away (someone active today outranks one last seen a week ago).
+    """
+    synced = min(
+        profile.list_synced_at or now - NEVER_SYNCED_AGE,
+        profile.profile_synced_at or now - NEVER_SYNCED_AGE,
+    )
+    staleness_hours = (now - synced).total_seconds() / 3600
+    idle_days = (now - profile.last_seen_at).total_seconds() / 86400
+    return staleness_hours / (1 + idle_days)
+
+
+def refresh_candidates(now=None):
+    """Profiles due for a refresh, highest priority first"""
+    now = now or timezone.now()
+    stale_before = now - REFRESH_MIN_AGE
+    busy = SyncJob.objects.filter(status__in=SyncJob.ACTIVE_STATUSES).values("user_id")
+    # Back off from users whose last sync failed (e.g. revoked MAL token)
+    failing = SyncJob.objects.filter(status=SyncJob.FAILED, finished_at__gte=stale_before).values("user_id")
+
+    profiles = (
+        UserProfile.objects
+        .select_related("user")
+        .exclude(mal_access_token__isnull=True)
+        .exclude(mal_access_token="")
+        .filter(last_seen_at__gte=now - REFRESH_INACTIVE_AFTER)
+        .exclude(user_id__in=busy)
+        .exclude(user_id__in=failing)
+    )
+    due = [
+        p for p in profiles
+        if not p.list_synced_at or p.list_synced_at < stale_before
+        or not p.profile_synced_at or p.profile_synced_at < stale_before
+    ]
+    return sorted(due, key=lambda p: priority(p, now), reverse=True)
+
+
+def estimated_cost(profile):
+    """MAL requests one refresh is expected to make: one per list page, plus the profile"""
+    entries = AnimeEntry.objects.filter(user_id=profile.user_id).count()
+    return max(math.ceil(entries / SYNC_PAGE_SIZE), 1) + 1
+
+
+def refresh_user(profile, worker="scheduler", now=None):
+    """
+    Refresh whichever of the user's list and profile is stale. The list is run
+    as a SyncJob claimed by this process; if the user already has one in
+    flight it is left to that job. Returns a short outcome dict.
+    """
+    now = now or timezone.now()
+    stale_before = now - REFRESH_MIN_AGE
+    outcome = {"user": profile.user.username, "profile": None, "list": None}
+
+    if not profile.profile_synced_at or profile.profile_synced_at < stale_before:
+        try:
+            refresh_profile(profile)
+            outcome["profile"] = "refreshed"
+        except MALError as e:
+            outcome["profile"] = f"failed: {e.message}"
+
+    if not profile.list_synced_at or profile.list_synced_at < stale_before:
+        job, created = jobs.enqueue_sync(profile.user)
+        if not created:
+            outcome["list"] = "already queued"
+        else:
+            # A sync worker (or eager mode) may have picked it up already
+            claimed = jobs.claim(job, worker)
+            outcome["list"] = jobs.run_job(claimed).status if claimed else job.status
+
+    logger.info(f"[refresh] {outcome}")
+    return outcome
+
+
+def run_round(worker="scheduler", max_users=None):
+    """
+    Refresh due users in priority order until the budget or ``max_users``
+    runs out. Returns ``(refreshed, deferred)``: how many users were handled
+    and how many are still due.
+    """
+    now = timezone.now()
+    candidates = refresh_candidates(now)
+    refreshed = 0
+    for profile in candidates:
+        if max_users is not None and refreshed >= max_users:
+            break
+        cost = estimated_cost(profile)
+        if budget.remaining() < cost:
+            logger.info(f"[refresh] Budget exhausted ({budget.used()}/{budget.MAL_REQUEST_BUDGET}), "
+                        f"{len(candidates) - refreshed} user(s) deferred")
+            break
+        refresh_user(profile, worker, now)
+        refreshed += 1
+    return refreshed, len(candidates) - refreshed
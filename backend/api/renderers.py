@@ -0,0 +1,54 @@
+"""
+Extra DRF renderers.
+"""
+from rest_framework.renderers import BaseRenderer
+
+from . import fastjson
+from .progress import format_event
+from .streaming import NDJSON_CONTENT_TYPE
+
+
+class FastJSONRenderer(BaseRenderer):
+    """
+    Default renderer: ``JSONRenderer`` on ``api.fastjson``. Bytes are taken
+    to be encoded JSON already and passed through.
+    """
+    media_type = fastjson.JSON_CONTENT_TYPE
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, bytes):
+            return data
+        return fastjson.dumps(data)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets SSE endpoints pass DRF content negotiation for
+    ``Accept: text/event-stream``. Successful responses are
+    StreamingHttpResponses that bypass rendering; this only renders the errors
+    DRF raises itself (401, 403...), as a single ``error`` event.
+    """
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event("error", data).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets list endpoints accept ``Accept: application/x-ndjson`` (or
+    ``?format=ndjson``). Rows are streamed by ``api.streaming``; this only
+    renders DRF's own errors, as a single JSON line.
+    """
+    media_type = NDJSON_CONTENT_TYPE
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return fastjson.dumps(data) + b"\n"
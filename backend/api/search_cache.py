@@ -0,0 +1,64 @@
+"""
+Cache for anime search results.
+
+Search-as-you-type sends the same short prefixes from many users, so results
+are cached under a canonical key: the query is case-folded and whitespace
+collapsed, and the requested limit is clamped and rounded up to a bucket.
+MAL is asked for the bucket size once and each caller gets a slice of it.
+
+Entries live in the "search" namespace of the tiered cache, so they are shared
+between workers and each worker's hot prefixes stay in its in-process LRU.
+"""
+from . import cache as api_cache
+
+# MAL's /anime endpoint caps limit at 100
+MAX_SEARCH_LIMIT = 100
+DEFAULT_SEARCH_LIMIT = 10
+LIMIT_BUCKETS = (10, 25, 50, 100)
+
+
+def canonical_query(query):
+    return " ".join((query or "").casefold().split())
+
+
+def clamp_limit(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_SEARCH_LIMIT
+    return min(max(limit, 1), MAX_SEARCH_LIMIT)
+
+
+def limit_bucket(limit):
+    return next(b for b in LIMIT_BUCKETS if b >= limit)
+
+
+def search_key(query, bucket):
+    # Queries are free text; hash them so keys stay short and backend-safe
+    return f"{bucket}:{api_cache.hashed(query)}"
+
+
+def get_cached(query, bucket):
+    return api_cache.get("search", search_key(query, bucket))
+
+
+def set_cached(query, bucket, payload):
+    api_cache.set("search", search_key(query, bucket), payload)
+
+
+async def aget_cached(query, bucket):
+    return await api_cache.aget("search", search_key(query, bucket))
+
+
+async def aset_cached(query, bucket, payload):
+    await api_cache.aset("search", search_key(query, bucket), payload)
+
+
+def slice_results(payload, limit):
+    """Trim a bucket-sized MAL response down to what the caller asked for"""
+    data = payload.get("data", [])
+    if len(data) <= limit:
+        return payload
+    # The upstream "next" link points past the bucket, not past this slice
+    paging = {k: v for k, v in payload.get("paging", {}).items() if k != "next"}
+    return {**payload, "data": data[:limit], "paging": paging}
@@ -1,9 +1,58 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, AnimeEntry
+from . import stats
+from .authentication import invalidate_cached_user
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+
+# Cached JWT user resolution (LoggingJWTAuthentication.get_user) must see
+# MAL token changes, deactivations and password changes straight away
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_for_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_auth_for_profile(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+# Keep UserStats in step with single-entry writes. Bulk paths run inside
+# stats.deferred_stats and rebuild once instead.
+
+@receiver(pre_save, sender=AnimeEntry)
+def remember_previous_entry(sender, instance, raw=False, **kwargs):
+    instance._stats_previous = None
+    if raw or instance.pk is None or stats.is_deferred(instance.user_id):
+        return
+    previous = AnimeEntry.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._stats_previous = stats.entry_contribution(previous)
+
+
+@receiver(post_save, sender=AnimeEntry)
+def update_stats_on_save(sender, instance, raw=False, **kwargs):
+    if raw or stats.is_deferred(instance.user_id):
+        return
+    stats.apply_change(
+        instance.user_id,
+        old=getattr(instance, "_stats_previous", None),
+        new=stats.entry_contribution(instance),
+    )
+
+
+@receiver(post_delete, sender=AnimeEntry)
+def update_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # The user's own deletion cascades to their stats row too
+    if isinstance(origin, User) or stats.is_deferred(instance.user_id):
+        return
+    stats.apply_change(instance.user_id, old=stats.entry_contribution(instance))
@@ -0,0 +1,188 @@
+"""
+Materialized per-user stats.
+
+``UserStats`` holds the rollups the stats page shows (genre/studio counts,
+score histogram, watch time, media types) for a user's completed anime, so
+serving them is one row lookup instead of a MAL round-trip.
+
+Single AnimeEntry writes are applied as deltas by the receivers in
+``api.signals``. Code that rewrites a whole list wraps itself in
+``deferred_stats`` (or ``suspended_stats`` plus its own rebuild) so the per-row
+deltas are skipped and the rollup is rebuilt once at the end; that rebuild
+also corrects any drift from catalog rows (episode counts, genres) changing
+between two deltas.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import Anime, AnimeEntry, UserStats
+
+logger = logging.getLogger(__name__)
+
+# Only finished shows count towards stats
+STATS_STATUS = "completed"
+
+_deferred = threading.local()
+
+
+def _deferred_users():
+    if not hasattr(_deferred, "users"):
+        _deferred.users = set()
+    return _deferred.users
+
+
+def is_deferred(user_id):
+    return user_id in _deferred_users()
+
+
+@contextmanager
+def suspended_stats(user_id):
+    """
+    Skip per-entry stats updates for ``user_id`` inside the block. The caller
+    is responsible for calling ``rebuild_user_stats`` afterwards.
+    """
+    users = _deferred_users()
+    if user_id in users:
+        yield
+        return
+
+    users.add(user_id)
+    try:
+        yield
+    finally:
+        users.discard(user_id)
+
+
+@contextmanager
+def deferred_stats(user_id):
+    """
+    Skip per-entry stats updates for ``user_id`` inside the block and rebuild
+    the rollup once when it exits cleanly.
+    """
+    with suspended_stats(user_id):
+        yield
+    rebuild_user_stats(user_id)
+
+
+def contribution(entry, anime):
+    """
+    What one entry adds to its user's rollup, or None if it isn't counted.
+    ``anime`` is the entry's catalog row with genres and studios prefetched.
+    """
+    if entry.status != STATS_STATUS:
+        return None
+    return {
+        "mal_id": entry.mal_id,
+        "title": anime.title,
+        "score": int(entry.score or 0),
+        "minutes": (anime.num_episodes or 0) * (anime.average_episode_duration or 0) / 60,
+        "genres": [genre.name for genre in anime.genres.all()],
+        "studios": [studio.name for studio in anime.studios.all()],
+        "media_type": anime.media_type or "unknown",
+    }
+
+
+def entry_contribution(entry):
+    if entry.status != STATS_STATUS:
+        return None
+    anime = Anime.objects.prefetch_related("genres", "studios").get(pk=entry.anime_id)
+    return contribution(entry, anime)
+
+
+def _bump(counts, key, delta):
+    value = counts.get(key, 0) + delta
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+
+def _apply(stats, contrib, sign):
+    stats.completed_count += sign
+    stats.total_watch_minutes = max(stats.total_watch_minutes + sign * contrib["minutes"], 0)
+    for genre in contrib["genres"]:
+        _bump(stats.genre_counts, genre, sign)
+    for studio in contrib["studios"]:
+        _bump(stats.studio_counts, studio, sign)
+    _bump(stats.media_type_counts, contrib["media_type"], sign)
+
+    score = contrib["score"]
+    if score > 0:
+        stats.scored_count += sign
+        stats.score_total += sign * score
+        _bump(stats.score_histogram, str(score), sign)
+    if score == 10:
+        if sign > 0:
+            stats.perfect_scores[str(contrib["mal_id"])] = contrib["title"]
+        else:
+            stats.perfect_scores.pop(str(contrib["mal_id"]), None)
+
+
+def apply_change(user_id, old=None, new=None):
+    """Swap ``old``'s contribution for ``new``'s in the user's rollup"""
+    if old is None and new is None:
+        return
+    with transaction.atomic():
+        stats, _ = UserStats.objects.select_for_update().get_or_create(user_id=user_id)
+        if old is not None:
+            _apply(stats, old, -1)
+        if new is not None:
+            _apply(stats, new, 1)
+        stats.save()
+
+
+def rebuild_user_stats(user_id):
+    """Recompute the whole rollup from the user's entries joined with the catalog"""
+    entries = list(
+        AnimeEntry.objects.filter(user_id=user_id, status=STATS_STATUS)
+        .select_related("anime")
+        .prefetch_related("anime__genres", "anime__studios")
+    )
+
+    stats = UserStats(user_id=user_id)
+    for entry in entries:
+        _apply(stats, contribution(entry, entry.anime), 1)
+
+    UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            field: getattr(stats, field)
+            for field in (
+                "completed_count", "scored_count", "score_total", "total_watch_minutes",
+                "genre_counts", "studio_counts", "score_histogram", "media_type_counts",
+                "perfect_scores",
+            )
+        },
+    )
+    logger.info(f"[stats] Rebuilt stats for user {user_id} ({len(entries)} completed)")
+    return stats
+
+
+def _ranked(counts):
+    return [
+        {"name": name, "count": count}
+        for name, count in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    ]
+
+
+def serialize_stats(stats):
+    """Response body for the stats endpoint; ``stats`` may be None before a first sync"""
+    if stats is None:
+        stats = UserStats()
+    return {
+        "completed_count": stats.completed_count,
+        "total_watch_minutes": round(stats.total_watch_minutes),
+        "average_score": round(stats.score_total / stats.scored_count, 2) if stats.scored_count else None,
+        "genres": _ranked(stats.genre_counts),
+        "studios": _ranked(stats.studio_counts),
+        "media_types": _ranked(stats.media_type_counts),
+        "score_histogram": [
+            {"score": int(score), "count": count}
+            for score, count in sorted(stats.score_histogram.items(), key=lambda kv: int(kv[0]))
+        ],
+        "top_rated": sorted(stats.perfect_scores.values()),
+        "updated_at": stats.updated_at.isoformat() if stats.updated_at else None,
+    }
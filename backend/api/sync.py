@@ -0,0 +1,291 @@
+"""
+Anime list sync.
+
+MAL bumps ``list_status.updated_at`` whenever a user touches an entry, so it
+is compared against the stored ``last_updated`` to work out which rows to
+insert, update or delete. Untouched rows are never written, so a returning
+user whose list did not change costs one read and no writes.
+
+Lists are consumed page by page (``paging.next``) and each page is written in
+its own short transaction as it arrives, with the next page fetched in the
+background meanwhile, so lists of any length sync in bounded memory and the
+database lock is never held across a MAL round-trip.
+"""
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache as api_cache
+from . import catalog, recommendation_cache
+from .mal_client import mal_client
+from .models import AnimeEntry, AnimeEntryTombstone
+from .stats import rebuild_user_stats, suspended_stats
+
+logger = logging.getLogger(__name__)
+
+# Items requested per MAL page (MAL's maximum for animelist)
+SYNC_PAGE_SIZE = 1000
+
+# Everything the sync stores: the list status plus the catalog's stats fields
+SYNC_LIST_PARAMS = {
+    "fields": f"list_status,{catalog.LIST_CATALOG_FIELDS}",
+    "limit": SYNC_PAGE_SIZE,
+}
+
+# Rows per INSERT ... ON CONFLICT statement; a page's batches share one transaction
+SYNC_BATCH_SIZE = getattr(settings, 'ANIME_SYNC_BATCH_SIZE', 500)
+
+# How long deletions are remembered for the delta feed; replicas older than
+# this have to reload the whole list
+TOMBSTONE_RETENTION = timedelta(seconds=getattr(settings, 'ANIME_TOMBSTONE_RETENTION', 30 * 24 * 60 * 60))
+
+# Columns an upsert overwrites on an existing (user, mal_id) row
+ENTRY_UPDATE_FIELDS = [
+    "anime", "status", "score", "episodes_watched", "is_rewatching",
+    "start_date", "finish_date", "last_updated", "updated_at",
+]
+
+
+def entry_fields(item):
+    """AnimeEntry list status columns for one MAL animelist item"""
+    status = item.get("list_status", {})
+    return {
+        "status": status.get("status", ""),
+        "score": status.get("score"),
+        "episodes_watched": status.get("num_episodes_watched"),
+        "is_rewatching": status.get("is_rewatching", False),
+        "start_date": status.get("start_date") or None,
+        "finish_date": status.get("finish_date") or None,
+        "last_updated": status.get("updated_at") or None,
+    }
+
+
+def _updated_at(item):
+    value = item.get("list_status", {}).get("updated_at")
+    return parse_datetime(value) if value else None
+
+
+def stored_entries(user):
+    """
+    ``{mal_id: (last_updated, has_list_fields)}`` for the user's stored
+    entries; ``has_list_fields`` is False while the catalog row lacks the
+    list fields (e.g. rows carried over from before the catalog had them)
+    """
+    entries = AnimeEntry.objects.filter(user=user).values_list("mal_id", "last_updated", "anime__list_fields_at")
+    return {
+        mal_id: (last_updated, list_fields_at is not None)
+        for mal_id, last_updated, list_fields_at in entries
+    }
+
+
+def plan_page(items, stored, seen):
+    """
+    Split one page into ``(to_create, to_update)`` against ``stored``.
+    Items already in ``seen`` (repeated across pages) are skipped; the rest
+    are added to it.
+    """
+    to_create, to_update = [], []
+    for item in items:
+        mal_id = item["node"]["id"]
+        if mal_id in seen:
+            continue
+        seen.add(mal_id)
+
+        if mal_id not in stored:
+            to_create.append(item)
+        else:
+            last_updated, has_list_fields = stored[mal_id]
+            if last_updated != _updated_at(item) or not has_list_fields:
+                to_update.append(item)
+    return to_create, to_update
+
+
+def upsert_entries(user, items, batch_size=None):
+    """
+    Upsert the catalog rows for ``items``, then insert or update the user's
+    AnimeEntry rows with ``INSERT ... ON CONFLICT (user, mal_id) DO UPDATE``
+    in batches of ``batch_size``. Call inside a transaction to get a single
+    commit. Bypasses the per-entry stats signals, so the caller rebuilds stats.
+    """
+    # Catalog first: entries reference it, and the stats rebuild reads genres/episodes from it
+    anime_ids = catalog.store_list_nodes([item["node"] for item in items])
+    rows = [
+        AnimeEntry(user=user, mal_id=item["node"]["id"], anime_id=anime_ids[item["node"]["id"]], **entry_fields(item))
+        for item in items
+    ]
+    if rows:
+        AnimeEntry.objects.bulk_create(
+            rows,
+            batch_size=batch_size or SYNC_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["user", "mal_id"],
+            update_fields=ENTRY_UPDATE_FIELDS,
+        )
+        # Back on the list: the delta feed now reports it as changed, not deleted
+        AnimeEntryTombstone.objects.filter(user=user, mal_id__in=[row.mal_id for row in rows]).delete()
+    return len(rows)
+
+
+def delete_entries(user, mal_ids):
+    """
+    Delete the user's entries for ``mal_ids`` and leave tombstones for the
+    delta feed; tombstones past ``TOMBSTONE_RETENTION`` are dropped meanwhile
+    """
+    with transaction.atomic():
+        AnimeEntry.objects.filter(user=user, mal_id__in=mal_ids).delete()
+        # Stamped once the write lock is held, not before waiting for it: a
+        # delete that queued longer than DELTA_OVERLAP would otherwise land
+        # behind a watermark handed out while it waited
+        now = timezone.now()
+        AnimeEntryTombstone.objects.bulk_create(
+            [AnimeEntryTombstone(user=user, mal_id=mal_id, deleted_at=now) for mal_id in mal_ids],
+            update_conflicts=True,
+            unique_fields=["user", "mal_id"],
+            update_fields=["deleted_at"],
+        )
+        AnimeEntryTombstone.objects.filter(user=user, deleted_at__lt=now - TOMBSTONE_RETENTION).delete()
+
+
+def invalidate_user_caches(user_id):
+    """Lists, profiles and candidate pools cached for recommendations"""
+    api_cache.invalidate("user_list", scope=user_id)
+    recommendation_cache.invalidate_user(user_id)
+
+
+class _PrefetchError:
+    def __init__(self, error):
+        self.error = error
+
+
+_PREFETCH_DONE = object()
+
+
+def prefetched(pages):
+    """
+    Iterate ``pages`` while a background thread already pulls the next one,
+    so fetching page N+1 overlaps with writing page N. At most one finished
+    page waits in the hand-off queue. Errors raised by ``pages`` are re-raised
+    in the consumer.
+    """
+    handoff = queue.Queue(maxsize=1)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+        except Exception as e:
+            put(_PrefetchError(e))
+            return
+        put(_PREFETCH_DONE)
+
+    threading.Thread(target=produce, name="list-prefetch", daemon=True).start()
+    try:
+        while True:
+            page = handoff.get()
+            if page is _PREFETCH_DONE:
+                return
+            if isinstance(page, _PrefetchError):
+                raise page.error
+            yield page
+    finally:
+        # Unblocks the producer if the consumer stopped early
+        stop.set()
+
+
+def sync_user_pages(user, pages, prune=True, invalidate=True, batch_size=None, on_progress=None):
+    """
+    Apply a MAL list, given as an iterable of pages, to the user's stored
+    entries and return ``{"pages", "created", "updated", "deleted", "unchanged"}``.
+
+    Each page's catalog rows and entry upserts are committed together as the
+    page arrives. Entries missing from the list are deleted once every page
+    is in; ``prune=False`` keeps them, for partial lists such as the
+    completed-only one recommendations fetch. If a page fails, pages already
+    written stay written, nothing is pruned, and the error propagates.
+
+    ``on_progress(phase, progress)`` is called with phase "syncing" after each
+    page is committed, then "pruning" and "stats"; ``progress`` is the running
+    counts plus ``expected_entries``, the number of entries stored beforehand.
+    """
+    stored = stored_entries(user)
+    seen = set()
+    counts = {"pages": 0, "created": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    def report(phase):
+        if on_progress is not None:
+            on_progress(phase, dict(counts, expected_entries=len(stored)))
+
+    try:
+        with suspended_stats(user.id):
+            for items in pages:
+                to_create, to_update = plan_page(items, stored, seen)
+                changed = to_create + to_update
+                if changed:
+                    with transaction.atomic():
+                        upsert_entries(user, changed, batch_size)
+                counts["pages"] += 1
+                counts["created"] += len(to_create)
+                counts["updated"] += len(to_update)
+                report("syncing")
+
+            counts["unchanged"] = len(seen) - counts["created"] - counts["updated"]
+            if prune:
+                report("pruning")
+                to_delete = [mal_id for mal_id in stored if mal_id not in seen]
+                if to_delete:
+                    delete_entries(user, to_delete)
+                counts["deleted"] = len(to_delete)
+    finally:
+        if counts["created"] or counts["updated"] or counts["deleted"]:
+            report("stats")
+            rebuild_user_stats(user.id)
+            if invalidate:
+                invalidate_user_caches(user.id)
+
+    logger.info(f"[sync] {user.username}: {counts}")
+    return counts
+
+
+def sync_user_list(user, anime_list, prune=True, invalidate=True, batch_size=None):
+    """``sync_user_pages`` for a list that is already in memory"""
+    return sync_user_pages(user, [anime_list], prune, invalidate, batch_size)
+
+
+def sync_from_mal(user, token, params=None, prune=True, on_progress=None):
+    """
+    Page through the user's MAL animelist for ``params`` (default: the full
+    list with ``SYNC_LIST_PARAMS``) and sync it, prefetching each next page
+    while the current one is written. Raises MALError if a page cannot be
+    fetched.
+    """
+    pages = mal_client.iter_pages("/users/@me/animelist", token, params=params or SYNC_LIST_PARAMS)
+    return sync_user_pages(user, prefetched(pages), prune=prune, on_progress=on_progress)
+
+
+def ingest_fetched_list(user, anime_list):
+    """
+    Store a list fetched for another purpose (e.g. recommendations) without
+    pruning. Failures are logged, never raised: the caller already has its data.
+    """
+    try:
+        return sync_user_list(user, anime_list, prune=False, invalidate=False)
+    except Exception as e:
+        logger.warning(f"[sync] Ingesting fetched list for {user.username} failed: {e}")
+        return None
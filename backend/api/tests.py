@@ -1,3 +1,685 @@
-from django.test import TestCase
+import gzip
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.cache import cache, caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone as django_timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import cache as api_cache
+from . import animelist, fastjson, jobs, progress, ranking_cache, sync, views
+from .authentication import LoggingJWTAuthentication
+from .cache import TieredCache
+from .mal_client import MALError
+from .middleware import CompressionMiddleware, accepted_encoding, brotli
+from .models import Anime, AnimeEntry, AnimeEntryTombstone, SyncJob
+from .sync import TOMBSTONE_RETENTION, plan_page, stored_entries, sync_user_list, sync_user_pages
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'api.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'L1_TIMEOUT': 5},
+    },
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+def list_item(mal_id, updated_at="2024-01-01T00:00:00+00:00", status="completed", title=None):
+    """One MAL animelist item, as a sync receives it"""
+    return {
+        "node": {
+            "id": mal_id,
+            "title": title or f"Anime {mal_id}",
+            "main_picture": {"medium": f"https://cdn.example.com/{mal_id}.jpg"},
+            "genres": [{"id": 1, "name": "Action"}],
+            "studios": [],
+            "themes": [],
+            "media_type": "tv",
+            "num_episodes": 12,
+            "average_episode_duration": 1440,
+        },
+        "list_status": {
+            "status": status,
+            "score": 7,
+            "num_episodes_watched": 12,
+            "is_rewatching": False,
+            "updated_at": updated_at,
+        },
+    }
+
+
+def stored_ids(user):
+    return set(AnimeEntry.objects.filter(user=user).values_list("mal_id", flat=True))
+
+
+def body(response):
+    """Response body, joined if it was streamed"""
+    return b"".join(response.streaming_content) if response.streaming else response.content
+
+
+def later(seconds):
+    """Patch the L1 clock ``seconds`` into the future"""
+    return mock.patch("api.lru.time.monotonic", return_value=time.monotonic() + seconds)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def l1_get(self, namespace, key, scope=None):
+        tiered = caches['default']
+        return tiered._l1.get(tiered.make_and_validate_key(api_cache.build_key(namespace, key, scope)))
+
+    def test_invalidating_a_namespace_misses_old_keys(self):
+        api_cache.set("search", "naruto", [1])
+        self.assertEqual(api_cache.get("search", "naruto"), [1])
+
+        api_cache.invalidate("search")
+        self.assertIsNone(api_cache.get("search", "naruto"))
+        api_cache.set("search", "naruto", [2])
+        self.assertEqual(api_cache.get("search", "naruto"), [2])
+
+    def test_invalidating_a_scope_leaves_other_scopes(self):
+        api_cache.set("user_list", "list", ["a"], scope=1)
+        api_cache.set("user_list", "list", ["b"], scope=2)
+
+        api_cache.invalidate("user_list", 1)
+        self.assertIsNone(api_cache.get("user_list", "list", scope=1))
+        self.assertEqual(api_cache.get("user_list", "list", scope=2), ["b"])
+
+    def test_lost_version_key_does_not_revive_old_entries(self):
+        api_cache.set("user_list", "list", ["stale"], scope=1)
+        api_cache.invalidate("user_list", 1)
+        # Culled from L2 (and gone from this worker's L1)
+        cache.delete(api_cache._version_key("user_list", 1))
+
+        self.assertIsNone(api_cache.get("user_list", "list", scope=1))
+
+    def test_l1_entries_expire_with_the_namespace_ttl(self):
+        with mock.patch.dict(api_cache.NAMESPACE_TTLS, {"search": 2}):
+            api_cache.set("search", "short", 1)
+        api_cache.set("ranking", "long", 1)
+
+        with later(3):
+            self.assertIsNone(self.l1_get("search", "short"))
+            self.assertIsNotNone(self.l1_get("ranking", "long"))
+        # Namespaces that outlive L1_TIMEOUT are still capped by it
+        with later(6):
+            self.assertIsNone(self.l1_get("ranking", "long"))
+
+    def test_writes_and_deletes_go_through_both_tiers(self):
+        tiered = caches['default']
+        tiered.set("k", {"n": 1})
+        self.assertEqual(caches['shared'].get("k"), {"n": 1})
+
+        # L1 hands out copies, not the cached object
+        tiered.get("k")["n"] = 2
+        self.assertEqual(tiered.get("k"), {"n": 1})
+
+        tiered.delete("k")
+        self.assertIsNone(caches['shared'].get("k"))
+        self.assertIsNone(tiered.get("k"))
+
+    def test_other_workers_invalidations_show_up_after_l1_timeout(self):
+        other_worker = TieredCache('shared', {'OPTIONS': {'L1_TIMEOUT': 5}})
+        api_cache.set("detail", 1, {"title": "old"})
+
+        with mock.patch.object(api_cache, "cache", other_worker):
+            api_cache.invalidate("detail")
+        # This worker's L1 still has the old namespace version for a moment
+        self.assertEqual(api_cache.get("detail", 1), {"title": "old"})
+        with later(6):
+            self.assertIsNone(api_cache.get("detail", 1))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CachedAuthUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.auth = LoggingJWTAuthentication()
+        self.user = User.objects.create_user("alice")
+        self.other = User.objects.create_user("bob")
+
+    def resolve(self, token):
+        return self.auth.get_user(self.auth.get_validated_token(str(token)))
+
+    def assertCached(self, token):
+        with self.assertNumQueries(0):
+            self.resolve(token).userprofile
+
+    def test_warm_tokens_resolve_user_and_profile_without_queries(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.resolve(token), self.user)
+        self.assertCached(token)
+
+    def test_user_save_drops_every_token_of_that_user_only(self):
+        tokens = [AccessToken.for_user(self.user), AccessToken.for_user(self.user)]
+        other_token = AccessToken.for_user(self.other)
+        for token in tokens + [other_token]:
+            self.resolve(token)
+
+        self.user.is_active = False
+        self.user.save()
+        for token in tokens:
+            with self.assertRaises(AuthenticationFailed):
+                self.resolve(token)
+        self.assertCached(other_token)
+
+    def test_profile_save_drops_the_cached_user(self):
+        token = AccessToken.for_user(self.user)
+        self.resolve(token)
+
+        profile = self.user.userprofile
+        profile.mal_access_token = "new-token"
+        profile.save()
+        self.assertEqual(self.resolve(token).userprofile.mal_access_token, "new-token")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="syncer")
+
+    def test_plan_page_skips_unchanged_last_updated(self):
+        stored = {1: (datetime(2024, 1, 1, tzinfo=timezone.utc), True)}
+        to_create, to_update = plan_page([list_item(1), list_item(2)], stored, set())
+        self.assertEqual([item["node"]["id"] for item in to_create], [2])
+        self.assertEqual(to_update, [])
+
+    def test_plan_page_updates_changed_last_updated(self):
+        stored = {1: (datetime(2024, 1, 1, tzinfo=timezone.utc), True)}
+        _, to_update = plan_page([list_item(1, updated_at="2024-02-01T00:00:00+00:00")], stored, set())
+        self.assertEqual([item["node"]["id"] for item in to_update], [1])
+
+    def test_plan_page_updates_rows_missing_list_fields(self):
+        stored = {1: (datetime(2024, 1, 1, tzinfo=timezone.utc), False)}
+        _, to_update = plan_page([list_item(1)], stored, set())
+        self.assertEqual([item["node"]["id"] for item in to_update], [1])
+
+    def test_plan_page_skips_items_already_seen(self):
+        seen = set()
+        plan_page([list_item(1), list_item(2)], {}, seen)
+        to_create, to_update = plan_page([list_item(2), list_item(3)], {}, seen)
+        self.assertEqual([item["node"]["id"] for item in to_create], [3])
+        self.assertEqual(to_update, [])
+        self.assertEqual(seen, {1, 2, 3})
+
+    def test_counts(self):
+        counts = sync_user_pages(self.user, [[list_item(1), list_item(2)], [list_item(3)]])
+        self.assertEqual(counts, {"pages": 2, "created": 3, "updated": 0, "deleted": 0, "unchanged": 0})
+
+        counts = sync_user_pages(self.user, [
+            [list_item(1), list_item(2, updated_at="2024-02-01T00:00:00+00:00")],
+            [list_item(4)],
+        ])
+        self.assertEqual(counts, {"pages": 2, "created": 1, "updated": 1, "deleted": 1, "unchanged": 1})
+        self.assertEqual(stored_ids(self.user), {1, 2, 4})
+
+    def test_unchanged_list_writes_nothing(self):
+        sync_user_pages(self.user, [[list_item(1), list_item(2)]])
+        before = dict(AnimeEntry.objects.filter(user=self.user).values_list("mal_id", "updated_at"))
+
+        counts = sync_user_pages(self.user, [[list_item(1), list_item(2)]])
+        self.assertEqual(counts["unchanged"], 2)
+        self.assertEqual(counts["created"] + counts["updated"] + counts["deleted"], 0)
+        after = dict(AnimeEntry.objects.filter(user=self.user).values_list("mal_id", "updated_at"))
+        self.assertEqual(after, before)
+
+    def test_missing_list_fields_force_an_update(self):
+        sync_user_pages(self.user, [[list_item(1)]])
+        Anime.objects.filter(mal_id=1).update(list_fields_at=None)
+        self.assertEqual(stored_entries(self.user)[1][1], False)
+
+        counts = sync_user_pages(self.user, [[list_item(1)]])
+        self.assertEqual(counts["updated"], 1)
+        self.assertEqual(stored_entries(self.user)[1][1], True)
+
+    def test_items_repeated_across_pages_count_once(self):
+        counts = sync_user_pages(self.user, [[list_item(1), list_item(2)], [list_item(2), list_item(3)]])
+        self.assertEqual(counts["created"], 3)
+        self.assertEqual(stored_ids(self.user), {1, 2, 3})
+
+    def test_prune_false_keeps_missing_entries(self):
+        sync_user_pages(self.user, [[list_item(1), list_item(2, status="watching")]])
+
+        counts = sync_user_pages(self.user, [[list_item(1)]], prune=False)
+        self.assertEqual(counts["deleted"], 0)
+        self.assertEqual(stored_ids(self.user), {1, 2})
+
+        counts = sync_user_pages(self.user, [[list_item(1)]])
+        self.assertEqual(counts["deleted"], 1)
+        self.assertEqual(stored_ids(self.user), {1})
+
+    def test_small_batches_write_every_row(self):
+        items = [list_item(mal_id) for mal_id in range(1, 8)]
+        counts = sync_user_list(self.user, items, batch_size=3)
+        self.assertEqual(counts["created"], 7)
+        self.assertEqual(stored_ids(self.user), set(range(1, 8)))
+
+        items[0] = list_item(1, updated_at="2024-02-01T00:00:00+00:00", status="dropped")
+        counts = sync_user_list(self.user, items, batch_size=3)
+        self.assertEqual(counts["updated"], 1)
+        self.assertEqual(AnimeEntry.objects.get(user=self.user, mal_id=1).status, "dropped")
+
+    def test_failed_page_keeps_earlier_pages_and_prunes_nothing(self):
+        sync_user_pages(self.user, [[list_item(1), list_item(2)]])
+
+        def pages():
+            yield [list_item(3)]
+            raise RuntimeError("MAL went away")
+
+        with self.assertRaises(RuntimeError):
+            sync_user_pages(self.user, pages())
+        self.assertEqual(stored_ids(self.user), {1, 2, 3})
+
+
+class SyncJobQueueTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f"queued{n}") for n in range(3)]
+
+    def make_stale(self, job):
+        SyncJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=django_timezone.now() - jobs.STALE_AFTER - timedelta(seconds=1),
+        )
+
+    def test_second_enqueue_returns_the_active_job(self):
+        job, created = jobs.enqueue_sync(self.users[0])
+        self.assertTrue(created)
+
+        again, created = jobs.enqueue_sync(self.users[0])
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(SyncJob.objects.filter(user=self.users[0]).count(), 1)
+
+        jobs.finish(jobs.claim(job, "w1"), SyncJob.SUCCEEDED)
+        _, created = jobs.enqueue_sync(self.users[0])
+        self.assertTrue(created)
+
+    def test_claim_next_takes_the_oldest_queued_job(self):
+        queued = [jobs.enqueue_sync(user)[0] for user in self.users]
+        now = django_timezone.now()
+        for age, job in zip([1, 3, 2], queued):
+            SyncJob.objects.filter(pk=job.pk).update(created_at=now - timedelta(minutes=age))
+
+        claimed = [jobs.claim_next("w1").pk for _ in queued]
+        self.assertEqual(claimed, [queued[1].pk, queued[2].pk, queued[0].pk])
+        self.assertIsNone(jobs.claim_next("w1"))
+
+    def test_claimed_job_cannot_be_claimed_again(self):
+        job, _ = jobs.enqueue_sync(self.users[0])
+        self.assertIsNotNone(jobs.claim(job, "w1"))
+        self.assertIsNone(jobs.claim(job, "w2"))
+
+    def test_stale_running_job_is_requeued_and_counts_an_attempt(self):
+        job, _ = jobs.enqueue_sync(self.users[0])
+        jobs.claim(job, "w1")
+        self.assertEqual(jobs.reclaim_stale(), (0, 0))
+
+        self.make_stale(job)
+        self.assertEqual(jobs.reclaim_stale(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.worker), (SyncJob.QUEUED, 1, ""))
+
+        self.assertEqual(jobs.claim_next("w2").attempts, 2)
+
+    def test_stale_job_out_of_attempts_fails(self):
+        job, _ = jobs.enqueue_sync(self.users[0])
+        jobs.claim(job, "w1")
+        SyncJob.objects.filter(pk=job.pk).update(attempts=jobs.MAX_ATTEMPTS)
+        self.make_stale(job)
+
+        self.assertEqual(jobs.reclaim_stale(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, SyncJob.FAILED)
+        self.assertIsNotNone(job.finished_at)
+        # The user can queue a fresh sync again
+        self.assertTrue(jobs.enqueue_sync(self.users[0])[1])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CachedAnimeListPaginationTests(TestCase):
+    url = "/api/cached-animelist/"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="pager")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Two undated entries, and a tie on last_updated that the id breaks
+        sync_user_pages(self.user, [[
+            list_item(1, updated_at="2024-01-03T00:00:00+00:00"),
+            list_item(2, updated_at=None),
+            list_item(3, updated_at="2024-01-01T00:00:00+00:00", status="watching"),
+            list_item(4, updated_at="2024-01-03T00:00:00+00:00"),
+            list_item(5, updated_at=None, status="watching"),
+            list_item(6, updated_at="2024-01-02T00:00:00+00:00"),
+        ]])
+
+    def streamed_ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row["mal_id"] for row in fastjson.loads(body(response))]
+
+    def paged_ids(self, **params):
+        ids, cursor = [], None
+        while True:
+            page = self.client.get(self.url, dict(params, cursor=cursor) if cursor else params)
+            self.assertEqual(page.status_code, 200)
+            data = fastjson.loads(page.content)
+            ids += [row["mal_id"] for row in data["results"]]
+            cursor = data["next"]
+            if cursor is None:
+                return ids
+
+    def test_pages_cover_undated_entries(self):
+        newest_first = self.paged_ids(limit=2)
+        self.assertEqual(newest_first, [4, 1, 6, 3, 5, 2])
+        self.assertEqual(newest_first, self.streamed_ids(ordering="-last_updated"))
+
+        oldest_first = self.paged_ids(limit=2, ordering="last_updated")
+        self.assertEqual(oldest_first, [2, 5, 3, 6, 1, 4])
+        self.assertEqual(oldest_first, self.streamed_ids(ordering="last_updated"))
+
+    def test_page_sizes_that_split_segments(self):
+        for limit in (1, 3, 5, 6, 10):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.paged_ids(limit=limit), [4, 1, 6, 3, 5, 2])
+
+    def test_fields_and_status(self):
+        params = {"fields": "mal_id,title", "status": "watching", "ordering": "last_updated"}
+        rows = fastjson.loads(body(self.client.get(self.url, params)))
+        self.assertEqual(rows, [{"mal_id": 5, "title": "Anime 5"}, {"mal_id": 3, "title": "Anime 3"}])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cursor", fastjson.loads(response.content)["error"])
+
+    def test_cursor_of_another_ordering(self):
+        cursor = fastjson.loads(self.client.get(self.url, {"limit": 2}).content)["next"]
+        response = self.client.get(self.url, {"cursor": cursor, "ordering": "last_updated"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_fields(self):
+        response = self.client.get(self.url, {"fields": "mal_id,password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", fastjson.loads(response.content)["error"])
+
+    def test_invalid_ordering(self):
+        self.assertEqual(self.client.get(self.url, {"ordering": "score"}).status_code, 400)
+
+    def test_ndjson_continues_with_next_cursor_header(self):
+        ids, params = [], {"limit": 4, "format": "ndjson"}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "application/x-ndjson")
+            ids += [fastjson.loads(line)["mal_id"] for line in response.content.splitlines()]
+            if not response.has_header("X-Next-Cursor"):
+                break
+            params = {"cursor": response["X-Next-Cursor"], "format": "ndjson"}
+        self.assertEqual(ids, [4, 1, 6, 3, 5, 2])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AnimeListDeltaTests(TestCase):
+    url = "/api/cached-animelist/"
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="replica")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        sync_user_pages(self.user, [[list_item(1), list_item(2), list_item(3)]])
+
+    def delta(self, since, **params):
+        response = self.client.get(self.url, dict(params, since=since.isoformat()))
+        self.assertEqual(response.status_code, 200)
+        return fastjson.loads(body(response))
+
+    def test_shape(self):
+        since = django_timezone.now()
+        sync_user_pages(self.user, [[list_item(1, updated_at="2024-02-01T00:00:00+00:00"), list_item(2)]])
+
+        delta = self.delta(since, fields="mal_id,status")
+        self.assertEqual(set(delta), {"watermark", "deleted", "changed"})
+        self.assertEqual(delta["deleted"], [3])
+        self.assertEqual(delta["changed"], [{"mal_id": 1, "status": "completed"}])
+        self.assertTrue(delta["watermark"].endswith("Z"))
+        self.assertLessEqual(animelist.parse_since(delta["watermark"]), django_timezone.now() - animelist.DELTA_OVERLAP)
+
+    def test_full_list_watermark_starts_a_delta(self):
+        response = self.client.get(self.url)
+        body(response)
+        since = animelist.parse_since(response["X-Watermark"])
+        sync_user_pages(self.user, [[list_item(1), list_item(2), list_item(4)]])
+
+        delta = self.delta(since)
+        self.assertEqual(delta["deleted"], [3])
+        # The watermark trails the clock, so rows written just before it come again
+        self.assertIn(4, [row["mal_id"] for row in delta["changed"]])
+
+    def test_delete_then_add_back(self):
+        before_delete = django_timezone.now()
+        sync_user_pages(self.user, [[list_item(1), list_item(3)]])
+        self.assertTrue(AnimeEntryTombstone.objects.filter(user=self.user, mal_id=2).exists())
+        delta = self.delta(before_delete)
+        self.assertEqual(delta["deleted"], [2])
+        self.assertEqual(delta["changed"], [])
+
+        before_add = django_timezone.now()
+        sync_user_pages(self.user, [[list_item(1), list_item(2), list_item(3)]])
+        self.assertFalse(AnimeEntryTombstone.objects.filter(user=self.user, mal_id=2).exists())
+        for since in (before_add, before_delete):
+            with self.subTest(since=since):
+                delta = self.delta(since, fields="mal_id")
+                self.assertEqual(delta["deleted"], [])
+                self.assertEqual(delta["changed"], [{"mal_id": 2}])
+
+    def test_delete_stuck_behind_the_write_lock_is_not_missed(self):
+        start = django_timezone.now()
+        clock = mock.Mock(now=mock.Mock(return_value=start))
+        atomic = sync.transaction.atomic
+
+        @contextmanager
+        def waits_for_the_lock(*args, **kwargs):
+            # Another writer holds the database for longer than DELTA_OVERLAP
+            clock.now.return_value += timedelta(seconds=20)
+            with atomic(*args, **kwargs):
+                yield
+
+        with mock.patch.object(sync, "timezone", clock), \
+                mock.patch.object(sync.transaction, "atomic", waits_for_the_lock):
+            sync.delete_entries(self.user, [2])
+
+        # A replica that synced while the delete was waiting holds this watermark
+        since = animelist.parse_since(animelist.watermark(start + timedelta(seconds=10)))
+        self.assertEqual(self.delta(since)["deleted"], [2])
+
+    def test_history_expired(self):
+        since = django_timezone.now() - TOMBSTONE_RETENTION - timedelta(hours=1)
+        response = self.client.get(self.url, {"since": since.isoformat()})
+        self.assertEqual(response.status_code, 410)
+
+    def test_other_users_syncs_stay_out_of_the_delta(self):
+        since = django_timezone.now()
+        other = User.objects.create(username="other")
+        sync_user_pages(other, [[list_item(1, updated_at="2024-03-01T00:00:00+00:00")]])
+        self.assertEqual(self.delta(since)["changed"], [])
+
+        # A new title is a change for everyone who shows it
+        sync_user_pages(other, [[list_item(1, updated_at="2024-04-01T00:00:00+00:00", title="Renamed")]])
+        self.assertEqual(self.delta(since, fields="mal_id,title")["changed"], [{"mal_id": 1, "title": "Renamed"}])
+        self.assertEqual(self.delta(since, fields="mal_id,status")["changed"], [])
+
+    def test_invalid_since(self):
+        self.assertEqual(self.client.get(self.url, {"since": "yesterday"}).status_code, 400)
+        since = django_timezone.now().isoformat()
+        self.assertEqual(self.client.get(self.url, {"since": since, "limit": 10}).status_code, 400)
+
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SyncProgressPollingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="poller")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.job, _ = jobs.enqueue_sync(self.user)
+
+    @unittest.skipIf(settings.ASYNC_VIEWS, "ASGI serves the stream")
+    def test_streams_are_refused_under_wsgi(self):
+        response = self.client.get(f"/api/sync-progress/{self.job.pk}/", HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 406)
+
+    def test_status_carries_the_progress_record(self):
+        status = fastjson.loads(self.client.get(f"/api/sync-status/{self.job.pk}/").content)
+        self.assertEqual(status["progress"]["phase"], "queued")
+
+        jobs.claim(self.job, "w1")
+        progress.publish(self.job.pk, SyncJob.RUNNING, "fetching")
+        counts = {"pages": 2, "created": 150, "updated": 50, "deleted": 0, "unchanged": 0}
+        progress.publish(self.job.pk, SyncJob.RUNNING, "syncing", counts=counts)
+
+        status = fastjson.loads(self.client.get(f"/api/sync-status/{self.job.pk}/").content)
+        self.assertEqual(status["status"], SyncJob.RUNNING)
+        self.assertEqual(
+            {key: status["progress"][key] for key in ("job_id", "phase", "pages", "rows_upserted")},
+            {"job_id": self.job.pk, "phase": "syncing", "pages": 2, "rows_upserted": 200},
+        )
+        self.assertNotIn("seq", status["progress"])
+
+class CompressionTests(SimpleTestCase):
+    payload = fastjson.dumps([{"mal_id": n, "title": f"Anime {n}"} for n in range(200)])
+
+    def respond(self, response, accept_encoding=None, path="/api/cached-animelist/"):
+        headers = {"HTTP_ACCEPT_ENCODING": accept_encoding} if accept_encoding is not None else {}
+        request = RequestFactory().get(path, **headers)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, content=None):
+        response = HttpResponse(content or self.payload, content_type="application/json")
+        response["ETag"] = '"abc"'
+        return response
+
+    def test_negotiation(self):
+        best = "br" if brotli is not None else "gzip"
+        cases = {
+            "": None,
+            "identity": None,
+            "gzip": "gzip",
+            "gzip, br": best,
+            "br;q=0.5, gzip": "gzip",
+            "br;q=0, gzip;q=0.1": "gzip",
+            "gzip;q=0": None,
+            "*": best,
+            "*, gzip;q=0": "br" if brotli is not None else None,
+            "*;q=0": None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(accepted_encoding(header), expected)
+
+    def test_gzip(self):
+        response = self.respond(self.json_response(), "gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.payload)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    @unittest.skipIf(brotli is None, "Brotli is not installed")
+    def test_brotli(self):
+        response = self.respond(self.json_response(), "gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), self.payload)
+
+    def test_identity_is_left_alone(self):
+        for header in (None, "identity", "gzip;q=0"):
+            with self.subTest(header=header):
+                response = self.respond(self.json_response(), header)
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertEqual(response.content, self.payload)
+                self.assertEqual(response["ETag"], '"abc"')
+                self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_small_responses_are_left_alone(self):
+        response = self.respond(self.json_response(b'{"ok": true}'), "gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_compressed_etag_is_weak(self):
+        response = self.respond(self.json_response(), "gzip")
+        self.assertEqual(response["ETag"], 'W/"abc"')
+
+    def test_streamed_chunks_decompress_to_the_input(self):
+        chunks = [self.payload[i:i + 500] for i in range(0, len(self.payload), 500)]
+        response = self.respond(StreamingHttpResponse(iter(chunks), content_type="application/x-ndjson"), "gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.payload)
+
+    def test_gzip_header_is_padded_to_a_random_length(self):
+        lengths = set()
+        for padding in (0, 37):
+            with mock.patch("api.middleware.secrets.randbelow", return_value=padding):
+                response = self.respond(self.json_response(), "gzip")
+            self.assertEqual(gzip.decompress(response.content), self.payload)
+            self.assertEqual(response.content[3], gzip.FNAME)
+            lengths.add(len(response.content) - padding)
+        self.assertEqual(len(lengths), 1)
+
+    def test_auth_endpoints_are_not_compressed(self):
+        for path in ("/api/token/refresh/", "/api/exchange-token/", "/api/csrf-token/", "/admin/login/"):
+            with self.subTest(path=path):
+                response = self.respond(self.json_response(), "gzip, br", path=path)
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertEqual(response.content, self.payload)
+
+    def test_event_streams_are_not_compressed(self):
+        response = self.respond(StreamingHttpResponse(iter([b"data: {}\n\n"]), content_type="text/event-stream"), "gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecommendationSectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_late_sections_come_back_empty(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        results = views.run_sections_concurrently({
+            "fast": (lambda: [1],),
+            "slow": (release.wait,),
+        }, timeout=0.2)
+        self.assertEqual(results, {"fast": [1], "slow": None})
+
+    def test_section_mal_calls_time_out_within_the_deadline(self):
+        connect, read = views.RECOMMENDATION_MAL_TIMEOUT
+        self.assertLessEqual(connect + read, views.RECOMMENDATION_SECTION_TIMEOUT)
+
+    def test_hidden_gem_pools_pass_the_section_timeout(self):
+        with mock.patch.object(views.mal_client, "get", return_value={"data": [{"node": {"id": 1}}]}) as get:
+            self.assertEqual(views.hidden_gem_pool(1, "token", "Action"), [{"node": {"id": 1}}])
+        self.assertEqual(get.call_args.kwargs["timeout"], views.RECOMMENDATION_MAL_TIMEOUT)
+
+    def test_failed_hidden_gem_pool_is_empty(self):
+        with mock.patch.object(views.mal_client, "get", side_effect=MALError("MAL API timed out", status_code=504)):
+            self.assertEqual(views.hidden_gem_pool(1, "token", "Action"), [])
+
+    def test_cold_ranking_fetch_uses_the_given_timeout(self):
+        with mock.patch.object(ranking_cache.mal_client, "get", return_value={"data": []}) as get:
+            ranking_cache.get_ranking("token", timeout=views.RECOMMENDATION_MAL_TIMEOUT, **views.POPULARITY_RANKING_PARAMS)
+        self.assertEqual(get.call_args.kwargs["timeout"], views.RECOMMENDATION_MAL_TIMEOUT)
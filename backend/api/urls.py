@@ -1,8 +1,15 @@
 from django.urls import path, re_path
 from .views import mal_login, mal_callback, exchange_oauth_token, sync_mal_profile, cached_mal_profile
-from .views import sync_anime_list, get_cached_anime_list, session_status, mal_logout
+from .views import sync_anime_list, sync_status, sync_progress, get_cached_anime_list, session_status, mal_logout
 from .views import anime_detail, search_anime, get_stats_data, health_check, get_csrf_token, debug_config
 from .views import get_recommendations, ai_recommendation_chat, posthog_proxy, refresh_jwt_token
+from django.conf import settings
+
+if settings.ASYNC_VIEWS:
+    # Stats are a local read, so only the MAL-bound views and the streamed
+    # responses have async versions
+    from .async_views import anime_detail, search_anime, get_recommendations, posthog_proxy, sync_progress
+    from .async_views import get_cached_anime_list
 
 urlpatterns = [
     # Health check and debug
@@ -23,6 +30,8 @@ urlpatterns = [
     path('cached-profile/', cached_mal_profile, name = 'cached_mal_profile'),
 
     path('sync-animelist/', sync_anime_list, name = 'sync_anime_list'),
+    path('sync-status/<int:job_id>/', sync_status, name = 'sync_status'),
+    path('sync-progress/<int:job_id>/', sync_progress, name = 'sync_progress'),
     path('cached-animelist/', get_cached_anime_list, name = 'get_cached_anime_list'),
 
     path('anime/<int:anime_id>/', anime_detail, name='anime_detail'),
@@ -5,19 +5,21 @@ import time
 from google import genai
 from google.genai import types
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import json
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.permissions import IsAuthenticated
 
 from django.conf import settings
 from django.shortcuts import redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
@@ -29,7 +31,22 @@ from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import redirect
 
 from .models import AnimeEntry
-from .models import UserProfile
+from .models import UserProfile, UserStats, SyncJob
+from .conditional import make_etag, etag_matches, not_modified, with_etag
+from .mal_client import mal_client, async_mal_client, MALError
+from . import cache as api_cache
+from . import animelist, budget, catalog, fastjson, progress, ranking_cache, recommendation_cache, streaming
+from . import middleware as compression
+from .stats import serialize_stats
+from .sync import ingest_fetched_list
+from .jobs import enqueue_sync, serialize_job
+from .refresh import refresh_profile
+from .fastjson import FastJsonResponse
+from .renderers import EventStreamRenderer, FastJSONRenderer, NDJSONRenderer
+from .search_cache import (
+    canonical_query, clamp_limit, limit_bucket, get_cached, set_cached, slice_results,
+    DEFAULT_SEARCH_LIMIT,
+)
 
 # MAL Genre ID mapping (fetched from MAL API)
 GENRE_IDS = {
@@ -142,6 +159,13 @@ def debug_config(request):
         "total_users": User.objects.count(),
         "users_with_profiles": UserProfile.objects.count(),
         "users": list(User.objects.values('id', 'username', 'is_active')[:10]),
+
+        # MAL connection pool diagnostics
+        "mal_client": mal_client.stats(),
+        "async_mal_client": async_mal_client.stats(),
+        "cache": api_cache.stats(),
+        "mal_budget": budget.stats(),
+        "compression": compression.stats(),
     })
 
 # CSRF token endpoint for cross-origin requests
@@ -271,7 +295,7 @@ def exchange_oauth_token(request):
     logger.info(f"[exchange_oauth_token] Exchanging OAuth code for MAL token")
 
     try:
-        response = requests.post(MAL_TOKEN_URL, data=token_data, timeout=10)
+        response = mal_client.request("POST", MAL_TOKEN_URL, data=token_data, timeout=10)
         logger.info(f"[exchange_oauth_token] MAL token response status: {response.status_code}")
         
         if response.status_code != 200:
@@ -280,9 +304,9 @@ def exchange_oauth_token(request):
                 "error": "Failed to retrieve access token from MAL", 
                 "details": response.text
             }, status=400)
-    except requests.exceptions.RequestException as e:
-        logger.error(f"[exchange_oauth_token] Token request exception: {str(e)}")
-        return Response({"error": "Failed to connect to MAL API", "details": str(e)}, status=500)
+    except MALError as e:
+        logger.error(f"[exchange_oauth_token] Token request exception: {e.details}")
+        return Response({"error": "Failed to connect to MAL API", "details": e.details}, status=500)
     
     # Get MAL access token
     token_json = response.json()
@@ -291,9 +315,10 @@ def exchange_oauth_token(request):
 
     # Fetch user info from MAL
     try:
-        user_info_response = requests.get(
-            "https://api.myanimelist.net/v2/users/@me",
-            headers={"Authorization": f"Bearer {mal_access_token}"},
+        user_info_response = mal_client.request(
+            "GET",
+            "/users/@me",
+            token=mal_access_token,
             timeout=10
         )
         
@@ -302,9 +327,9 @@ def exchange_oauth_token(request):
         if user_info_response.status_code != 200:
             logger.error(f"[exchange_oauth_token] Failed to fetch MAL user info: {user_info_response.status_code}")
             return Response({"error": "Failed to fetch MAL user info"}, status=400)
-    except requests.exceptions.RequestException as e:
-        logger.error(f"[exchange_oauth_token] User info request exception: {str(e)}")
-        return Response({"error": "Failed to fetch user info from MAL", "details": str(e)}, status=500)
+    except MALError as e:
+        logger.error(f"[exchange_oauth_token] User info request exception: {e.details}")
+        return Response({"error": "Failed to fetch user info from MAL", "details": e.details}, status=500)
     
     mal_user = user_info_response.json()
     mal_username = mal_user.get("name")
@@ -417,19 +442,10 @@ def sync_mal_profile(request):
         logger.error(f"[sync_mal_profile] No MAL token for user: {request.user.username}")
         return Response({"error": "Not authenticated with MAL"}, status=401)
 
-    headers = {"Authorization": f"Bearer {token}"}
-    r = requests.get("https://api.myanimelist.net/v2/users/@me", headers=headers)
-    if r.status_code != 200:
-        return Response({"error": "MAL error", "details": r.text}, status=400)
-
-    data = r.json()
-    prof = request.user.userprofile
-    prof.name = data.get("name")
-    prof.birthday = data.get("birthday")
-    prof.location = data.get("location")
-    prof.joined_at = data.get("joined_at")
-    prof.picture = data.get("picture") # or data.get("main_picture", {}).get("medium")
-    prof.save()
+    try:
+        refresh_profile(profile)
+    except MALError as e:
+        return Response(e.to_dict(), status=e.status_code)
 
     return Response({"message": "Profile synced"})
 
@@ -443,29 +459,34 @@ def cached_mal_profile(request):
         prof = request.user.userprofile
         logger.info(f"[cached_mal_profile] Has MAL token: {bool(prof.mal_access_token)}")
         logger.info(f"[cached_mal_profile] Profile data: name={prof.name}, picture={prof.picture}")
-        return Response({
+        data = {
             "name": prof.name,
             "birthday": prof.birthday,
             "location": prof.location,
             "joined_at": prof.joined_at,
             "picture": prof.picture,
-        })
+        }
     except UserProfile.DoesNotExist:
         logger.error(f"[cached_mal_profile] UserProfile does not exist for user: {request.user.username}")
         # Create profile if missing
         prof = UserProfile.objects.create(user=request.user)
         logger.info(f"[cached_mal_profile] Created missing profile for user: {request.user.username}")
-        return Response({
+        data = {
             "name": prof.name or request.user.username,
             "birthday": prof.birthday,
             "location": prof.location,
             "joined_at": prof.joined_at,
             "picture": prof.picture,
-        })
+        }
     except Exception as e:
         logger.error(f"[cached_mal_profile] Error: {str(e)}", exc_info=True)
         return Response({"error": str(e)}, status=500)
 
+    etag = make_etag("profile", request.user.id, *data.values())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return with_etag(Response(data), etag)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def sync_anime_list(request):
@@ -476,63 +497,121 @@ def sync_anime_list(request):
         access_token = profile.mal_access_token
     except UserProfile.DoesNotExist:
         logger.error(f"[sync_anime_list] No profile found")
-        return JsonResponse({"error": "User profile not found"}, status=404)
+        return FastJsonResponse({"error": "User profile not found"}, status=404)
     
     if not access_token:
         logger.error(f"[sync_anime_list] No MAL token")
-        return JsonResponse({"error": "Not authenticated with MAL"}, status=401)
+        return FastJsonResponse({"error": "Not authenticated with MAL"}, status=401)
+
+    # The sync itself runs on a run_sync_worker process; a retry while one
+    # is queued or running gets that job back instead of a second sync
+    job, created = enqueue_sync(request.user)
+    return FastJsonResponse(
+        {"message": "Sync queued" if created else "Sync already in progress", **serialize_job(job)},
+        status=202,
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_status(request, job_id):
+    """
+    The job, plus the same progress record the event stream sends, so
+    clients polling under WSGI can still show pages and an ETA
+    """
+    job = SyncJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return FastJsonResponse({"error": "Sync job not found"}, status=404)
+    record = progress.initial_record(job)
+    return FastJsonResponse({**serialize_job(job), "progress": progress.event_payload(record)})
+
+def event_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # keep nginx from buffering the stream
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, EventStreamRenderer])
+def sync_progress(request, job_id):
+    """
+    Server-Sent Events for a sync job are served by ``async_views.sync_progress``
+    under ASGI only: under WSGI each open stream would hold a worker thread
+    for up to ``progress.STREAM_MAX_SECONDS``. Answers 406 here, and clients
+    poll ``sync-status`` instead.
+    """
+    return FastJsonResponse({"error": "Progress streams need ASYNC_VIEWS, poll sync-status instead"}, status=406)
 
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = "https://api.myanimelist.net/v2/users/@me/animelist"
-    params = {"fields": "list_status", "limit": 1000}
-    response = requests.get(url, headers=headers, params=params)
+def anime_list_etag(request, as_ndjson=False):
+    """
+    Validator of the user's cached list, from aggregates only. Any
+    insert/update bumps max(updated_at) and any delete changes the count, so
+    these (plus the newest title or picture change in the catalog) are enough
+    to validate the whole list. Returns ``(etag, count)``.
+    """
+    summary = AnimeEntry.objects.filter(user=request.user).aggregate(**animelist.SUMMARY)
+    etag = make_etag(
+        "animelist", request.user.id, summary["count"], summary["latest"], summary["catalog"],
+        request.GET.urlencode(), "ndjson" if as_ndjson else "json",
+    )
+    return etag, summary["count"]
 
-    if response.status_code != 200:
-        return JsonResponse({"error": "Failed to fetch anime list", "details": response.text}, status=400)
 
-    anime_list = response.json().get("data", [])
+ANIME_LIST_HISTORY_EXPIRED = "since is older than the change history, reload the whole list"
 
-    AnimeEntry.objects.filter(user=request.user).delete()
 
-    for item in anime_list:
-        anime = item["node"]
-        status = item["list_status"]
-        AnimeEntry.objects.create(
-            user=request.user,
-            mal_id=anime["id"],
-            title=anime["title"],
-            status=status.get("status", ""),
-            image_url=anime.get("main_picture", {}).get("medium"),
-            score=status.get("score"),
-            episodes_watched=status.get("num_episodes_watched"),
-            is_rewatching=status.get("is_rewatching", False),
-            start_date=status.get("start_date") or None,
-            finish_date=status.get("finish_date") or None,
-            last_updated=status.get("updated_at") or None
-        )
+def anime_list_page_response(results, next_cursor, as_ndjson=False):
+    """
+    One ``cached-animelist`` page: ``{"results", "next"}``, or NDJSON rows
+    with the next cursor in ``X-Next-Cursor``
+    """
+    if not as_ndjson:
+        return FastJsonResponse({"results": results, "next": next_cursor})
+    response = HttpResponse(b"".join(fastjson.dumps(row) + b"\n" for row in results),
+                            content_type=streaming.NDJSON_CONTENT_TYPE)
+    if next_cursor:
+        response["X-Next-Cursor"] = next_cursor
+    patch_vary_headers(response, ["Accept"])
+    return response
 
-    return JsonResponse({"message": "Anime list synced", "count": len(anime_list)})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([FastJSONRenderer, NDJSONRenderer])
 def get_cached_anime_list(request):
+    """
+    The user's synced list, streamed from the database in chunks so memory
+    stays flat however long the list is. A JSON array by default, NDJSON with
+    ``?format=ndjson`` or ``Accept: application/x-ndjson``. Fields, status
+    filter, ordering, pages and deltas are chosen with the ``api.animelist``
+    options.
+    """
     logger.info(f"[get_cached_anime_list] User: {request.user.username} (ID: {request.user.id})")
-    entries = AnimeEntry.objects.filter(user=request.user).values(
-        "mal_id",
-        "title",
-        "image_url",
-        "status",
-        "score",
-        "episodes_watched",
-        "is_rewatching",
-        "start_date",
-        "finish_date",
-        "last_updated",
-    )
-    logger.info(f"[get_cached_anime_list] Found {len(entries)} entries")
+    as_ndjson = streaming.wants_ndjson(request)
+    try:
+        query = animelist.parse_query(request.GET)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    # Taken before any row is read
+    mark = animelist.watermark()
+
+    etag, count = anime_list_etag(request, as_ndjson)
+    if etag_matches(request, etag):
+        logger.info(f"[get_cached_anime_list] Not modified ({count} entries)")
+        return not_modified(etag)
+
+    if query["since"] is not None:
+        if animelist.since_expired(query["since"]):
+            return Response({"error": ANIME_LIST_HISTORY_EXPIRED}, status=410)
+        changed, deleted = animelist.changes(request.user, query)
+        logger.info(f"[get_cached_anime_list] Delta since {query['since']}, {len(deleted)} deleted")
+        rows = changed.iterator(chunk_size=streaming.STREAM_CHUNK_SIZE)
+        return with_etag(streaming.stream_object({"watermark": mark, "deleted": deleted}, "changed", rows), etag)
+
+    logger.info(f"[get_cached_anime_list] Found {count} entries")
     
     # If no entries, check profile status for debugging
-    if len(entries) == 0:
+    if count == 0:
         try:
             profile = request.user.userprofile
             has_token = bool(profile.mal_access_token)
@@ -540,7 +619,14 @@ def get_cached_anime_list(request):
         except UserProfile.DoesNotExist:
             logger.warning(f"[get_cached_anime_list] 0 entries - Profile missing for user {request.user.username}")
     
-    return JsonResponse(list(entries), safe=False)
+    if query["limit"] is not None:
+        results, next_cursor = animelist.page(request.user, query)
+        response = anime_list_page_response(results, next_cursor, as_ndjson)
+    else:
+        rows = animelist.rows(request.user, query).iterator(chunk_size=streaming.STREAM_CHUNK_SIZE)
+        response = streaming.stream_rows(rows, as_ndjson)
+    response["X-Watermark"] = mark
+    return with_etag(response, etag)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -564,7 +650,7 @@ def mal_logout(request):
     logger.info(f"[mal_logout] User logging out: {request.user.username}")
     # With JWT, frontend just deletes the token
     # No server-side session to clear
-    return JsonResponse({"message": "Logout successful"})
+    return FastJsonResponse({"message": "Logout successful"})
 
 
 @api_view(['GET'])
@@ -583,22 +669,11 @@ def anime_detail(request, anime_id):
         logger.error(f"[anime_detail] No MAL token")
         return Response({'error': 'Not authenticated with MAL'}, status=401)
 
-    url = f'https://api.myanimelist.net/v2/anime/{anime_id}'
-    params = {
-      'fields': 'id,title,main_picture,alternative_titles,'
-                'start_date,end_date,synopsis,mean,rank,'
-                'popularity,num_list_users,num_scoring_users,'
-                'nsfw,created_at,updated_at,media_type,status,'
-                'genres,my_list_status,num_episodes,start_season,'
-                'broadcast,source,average_episode_duration,'
-                'rating,pictures,background,related_anime,'
-                'related_manga,recommendations,studios,statistics'
-    }
-    headers = {'Authorization': f'Bearer {token}'}
-    r = requests.get(url, headers=headers, params=params)
-    if r.status_code == 200:
-        return Response(r.json())
-    return Response({'error': 'MAL error', 'details': r.text}, status=r.status_code)
+    # Shared fields come from the catalog, only my_list_status is per-user
+    try:
+        return FastJsonResponse(catalog.get_anime_detail(request.user, token, anime_id))
+    except MALError as e:
+        return Response(e.to_dict(), status=e.status_code)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -616,77 +691,72 @@ def search_anime(request):
         logger.error(f"[search_anime] No MAL token")
         return Response({"error": "Not authenticated with MAL"}, status=401)
 
-    query = request.GET.get("q")
-    limit = request.GET.get("limit", 10)
+    query = canonical_query(request.GET.get("q"))
+    limit = clamp_limit(request.GET.get("limit", DEFAULT_SEARCH_LIMIT))
 
     if not query:
         return Response({"error": "Missing search query"}, status=400)
 
-    url = "https://api.myanimelist.net/v2/anime"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {
-        "q": query,
-        "limit": limit
-    }
+    # Results are user-independent, so one cached bucket serves everyone
+    bucket = limit_bucket(limit)
+    payload = get_cached(query, bucket)
+    if payload is None:
+        params = {
+            "q": query,
+            "limit": bucket
+        }
+        try:
+            payload = mal_client.get("/anime", token, params=params)
+        except MALError as e:
+            return Response(e.to_dict(), status=e.status_code)
+        set_cached(query, bucket, payload)
 
-    r = requests.get(url, headers=headers, params=params)
-    if r.status_code == 200:
-        return Response(r.json())
-    
-    return Response({"error": "MAL error", "details": r.text}, status=r.status_code)
+    return Response(slice_results(payload, limit))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_stats_data(request):
     """
-    Fetches detailed anime data from MAL for stats calculations
+    Stats page rollups, read from the user's materialized UserStats row.
+    Kept current by syncs, no MAL call is made here.
     """
     logger.info(f"[get_stats_data] User: {request.user.username}")
-    
-    try:
-        profile = request.user.userprofile
-        token = profile.mal_access_token
-    except UserProfile.DoesNotExist:
-        logger.error(f"[get_stats_data] No profile found")
-        return Response({"error": "User profile not found"}, status=404)
-    
-    if not token:
-        logger.error(f"[get_stats_data] No MAL token")
-        return Response({"error": "Not authenticated with MAL"}, status=401)
 
-    # Get user's anime list with detailed fields
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.myanimelist.net/v2/users/@me/animelist"
-    params = {
-        "fields": "list_status,genres,studios,num_episodes,average_episode_duration,media_type",
-        "limit": 1000,
-        "status": "completed"  # Focus on completed anime for accurate stats
-    }
-    
-    response = requests.get(url, headers=headers, params=params)
-    
-    if response.status_code != 200:
-        return Response({"error": "Failed to fetch anime list", "details": response.text}, status=400)
-    
-    anime_data = response.json().get("data", [])
-    
-    # Process data for stats
-    stats_list = []
-    for item in anime_data:
-        anime = item["node"]
-        list_status = item.get("list_status", {})
-        
-        stats_list.append({
-            "title": anime.get("title"),
-            "score": list_status.get("score", 0),
-            "genres": [g["name"] for g in anime.get("genres", [])],
-            "studios": [s["name"] for s in anime.get("studios", [])],
-            "num_episodes": anime.get("num_episodes", 0),
-            "average_episode_duration": anime.get("average_episode_duration", 0),
-            "media_type": anime.get("media_type", ""),
-        })
-    
-    return Response(stats_list)
+    user_stats = UserStats.objects.filter(user=request.user).first()
+    return Response(serialize_stats(user_stats))
+
+
+def user_list_key(params):
+    return f"animelist:{api_cache.hashed(sorted(params.items()))}"
+
+
+def fetch_user_list(user, token, params):
+    """
+    The user's MAL list for ``params``, cached per user until their next sync.
+    Freshly fetched lists are also written to the user's stored entries.
+    """
+    key = user_list_key(params)
+    data = api_cache.get("user_list", key, scope=user.id)
+    if data is None:
+        data = mal_client.get_all("/users/@me/animelist", token, params=params)
+        api_cache.set("user_list", key, data, scope=user.id)
+        ingest_fetched_list(user, data)
+    return data
+
+
+def user_has_synced_list(user):
+    # Read fresh: request.user.userprofile may come from the auth cache
+    return UserProfile.objects.filter(user=user, list_synced_at__isnull=False).exists()
+
+
+def fetch_completed_list(user, token):
+    """
+    The user's completed anime for recommendations: joined from the stored
+    entries and catalog once a full sync has run, otherwise fetched from MAL
+    """
+    if user_has_synced_list(user):
+        return catalog.list_items(user, status="completed")
+    return fetch_user_list(user, token, RECOMMENDATION_LIST_PARAMS)
 
 
 # ============= RECOMMENDATIONS SYSTEM =============
@@ -716,22 +786,63 @@ def get_recommendations(request):
         logger.error(f"[get_recommendations] No MAL token")
         return Response({"error": "Not authenticated with MAL"}, status=401)
 
-    # Get user's completed/high-rated anime
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.myanimelist.net/v2/users/@me/animelist"
-    params = {
-        "fields": "list_status,genres,studios,themes,media_type",
-        "limit": 1000,
-        "status": "completed"
-    }
+    # Preference profile from the user's completed/high-rated anime, cached
+    # until their next sync
+    try:
+        prefs = recommendation_cache.get_profile(
+            request.user.id,
+            lambda: build_preference_profile(fetch_completed_list(request.user, token)),
+        )
+    except MALError as e:
+        return Response({"error": "Failed to fetch anime list"}, status=e.status_code)
+    
+    watched_ids = prefs["watched_ids"]
+    top_genres = prefs["top_genres"]
+    top_studios = prefs["top_studios"]
     
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code != 200:
-        return Response({"error": "Failed to fetch anime list"}, status=400)
+    # Pick ONE random anchor from high-rated anime (changes on regenerate)
+    anchor = pick_anchor(prefs["high_rated_anime"])
+    
+    # Generate recommendations from different angles. None of the sections
+    # depend on each other, so their MAL calls run concurrently. Search
+    # sections read per-user cached candidate pools, so a regenerate only
+    # re-ranks.
+    user_id = request.user.id
+    sections = {}
+    # 1. Because you liked X (ONE random anchor, changes on regenerate)
+    if anchor:
+        sections["because_you_liked"] = (find_similar_anime, token, anchor, watched_ids)
+    # 2. From your favorite genres
+    if top_genres:
+        sections["from_genres"] = (search_by_genre, user_id, token, top_genres[0][0], watched_ids, 10)
+    # 3. From your favorite studios
+    if top_studios:
+        sections["from_studios"] = (search_by_studio, user_id, token, top_studios[0][0], watched_ids, 8)
+    # 4. Hidden gems (high-rated but less popular), one section per genre
+    gem_genres = {f"hidden_gems:{genre}": genre for genre, _ in top_genres[:HIDDEN_GEM_GENRES]}
+    for name, genre in gem_genres.items():
+        sections[name] = (hidden_gem_pool, user_id, token, genre)
     
-    user_anime = response.json().get("data", [])
+    results = run_sections_concurrently(sections)
+    if gem_genres:
+        results["hidden_gems"] = filter_hidden_gems([results.pop(name) for name in gem_genres], watched_ids)
+    recommendations = assemble_recommendations(anchor, top_genres, top_studios, results)
     
-    # Extract user preferences
+    return Response(recommendations)
+
+
+RECOMMENDATION_LIST_PARAMS = {
+    # Everything the catalog stores, so the fetched list can be ingested too
+    "fields": f"list_status,{catalog.LIST_CATALOG_FIELDS}",
+    "limit": 1000,
+    "status": "completed"
+}
+
+
+def build_preference_profile(user_anime):
+    """
+    Build a score-weighted genre/studio/theme profile from the user's completed list
+    """
     watched_ids = set()
     genre_scores = defaultdict(int)
     studio_scores = defaultdict(int)
@@ -767,15 +878,68 @@ def get_recommendations(request):
         for theme in anime.get("themes", []):
             theme_scores[theme["name"]] += weight
     
-    # Get top preferences
-    top_genres = sorted(genre_scores.items(), key=lambda x: x[1], reverse=True)[:5]
-    top_studios = sorted(studio_scores.items(), key=lambda x: x[1], reverse=True)[:3]
-    
-    # Pick ONE random anchor from high-rated anime (changes on regenerate)
+    return {
+        "watched_ids": watched_ids,
+        "genre_scores": dict(genre_scores),
+        "studio_scores": dict(studio_scores),
+        "theme_scores": dict(theme_scores),
+        "high_rated_anime": high_rated_anime,
+        # Get top preferences
+        "top_genres": sorted(genre_scores.items(), key=lambda x: x[1], reverse=True)[:5],
+        "top_studios": sorted(studio_scores.items(), key=lambda x: x[1], reverse=True)[:3],
+    }
+
+
+def pick_anchor(high_rated_anime):
     import random
-    anchor = random.choice(high_rated_anime) if high_rated_anime else None
+    return random.choice(high_rated_anime) if high_rated_anime else None
+
+
+# Each recommendation section gets this long (seconds) before it is dropped
+RECOMMENDATION_SECTION_TIMEOUT = 15
+
+# Connect/read timeouts for the MAL calls sections make. They fit inside the
+# section deadline, so a section that missed it stops waiting on MAL and frees
+# its pool worker soon after, instead of holding it for the client's default
+RECOMMENDATION_MAL_TIMEOUT = (3, RECOMMENDATION_SECTION_TIMEOUT - 3)
+
+# Hidden gems search this many of the user's top genres, one section each
+HIDDEN_GEM_GENRES = 2
+
+# Shared pool for the recommendation fan-out; sized to the MAL session's pool
+_section_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="recs")
+
+
+def run_sections_concurrently(sections, timeout=RECOMMENDATION_SECTION_TIMEOUT):
+    """
+    Run ``{name: (func, *args)}`` on the shared pool and collect the results.
+    A section that fails or misses the deadline comes back as None so the rest
+    of the page still renders. A late section can't be stopped once it runs;
+    its MAL calls time out by ``RECOMMENDATION_MAL_TIMEOUT`` instead.
+    """
+    futures = {
+        name: _section_executor.submit(func, *args)
+        for name, (func, *args) in sections.items()
+    }
+    deadline = time.monotonic() + timeout
     
-    # Generate recommendations from different angles
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FuturesTimeoutError:
+            # Only drops sections still queued behind a busy pool
+            future.cancel()
+            logger.warning(f"[get_recommendations] Section '{name}' timed out after {timeout}s")
+            results[name] = None
+        except Exception as e:
+            logger.error(f"[get_recommendations] Section '{name}' failed: {e}", exc_info=True)
+            results[name] = None
+    return results
+
+
+def assemble_recommendations(anchor, top_genres, top_studios, results):
+    """Shape per-section results into the payload the frontend expects"""
     recommendations = {
         "because_you_liked": [],
         "from_genres": [],
@@ -783,39 +947,29 @@ def get_recommendations(request):
         "hidden_gems": []
     }
     
-    # 1. Because you liked X (ONE random anchor, changes on regenerate)
-    if anchor:
-        similar = find_similar_anime(token, anchor, watched_ids)
-        if similar:
-            recommendations["because_you_liked"].append({
-                "anchor": anchor["title"],
-                "anime": similar[:6]  # Show 6 recommendations
-            })
+    similar = results.get("because_you_liked")
+    if anchor and similar:
+        recommendations["because_you_liked"].append({
+            "anchor": anchor["title"],
+            "anime": similar[:6]  # Show 6 recommendations
+        })
     
-    # 2. From your favorite genres
     if top_genres:
-        genre_name = top_genres[0][0]
-        genre_anime = search_by_genre(token, genre_name, watched_ids, limit=10)
         recommendations["from_genres"] = {
-            "genre": genre_name,
-            "anime": genre_anime
+            "genre": top_genres[0][0],
+            "anime": results.get("from_genres") or []
         }
     
-    # 3. From your favorite studios
     if top_studios:
-        studio_name = top_studios[0][0]
-        studio_anime = search_by_studio(token, studio_name, watched_ids, limit=8)
         recommendations["from_studios"] = {
-            "studio": studio_name,
-            "anime": studio_anime
+            "studio": top_studios[0][0],
+            "anime": results.get("from_studios") or []
         }
     
-    # 4. Hidden gems (high-rated but less popular)
     if top_genres:
-        gems = find_hidden_gems(token, [g[0] for g in top_genres], watched_ids)
-        recommendations["hidden_gems"] = gems[:8]
+        recommendations["hidden_gems"] = (results.get("hidden_gems") or [])[:8]
     
-    return Response(recommendations)
+    return recommendations
 
 
 def get_genre_compatibility(genre1, genre2):
@@ -939,14 +1093,36 @@ def calculate_similarity_score(anchor_anime, candidate_anime):
     return similarity
 
 
+# Popular anime pool that "because you liked" candidates are drawn from
+POPULARITY_RANKING_PARAMS = {
+    "ranking_type": "bypopularity",
+    "limit": 500,  # Increased from 100 to 500
+    "fields": "id,title,main_picture,genres,themes,mean,popularity,num_list_users"
+}
+
+
 def find_similar_anime(token, anchor_anime, watched_ids):
     """Find anime similar to the anchor by fetching popular anime and filtering by genre"""
-    import json
-    from pathlib import Path
+    # Search using anchor's main genre
+    if not anchor_anime.get("genres"):
+        return []
     
-    headers = {"Authorization": f"Bearer {token}"}
+    # Fetch top-ranked anime by popularity (shared across users) and filter by genre
+    try:
+        ranking_data = ranking_cache.get_ranking(
+            token, **POPULARITY_RANKING_PARAMS, timeout=RECOMMENDATION_MAL_TIMEOUT,
+        )
+    except MALError as e:
+        logger.warning(f"[find_similar_anime] Ranking fetch failed: {e.message}")
+        ranking_data = []
+    
+    return rank_similar_anime(anchor_anime, ranking_data, watched_ids)
+
+
+def rank_similar_anime(anchor_anime, ranking_data, watched_ids):
+    """Filter and score the popularity ranking against the anchor"""
+    from pathlib import Path
     
-    # Search using anchor's main genre
     if not anchor_anime.get("genres"):
         return []
     
@@ -974,22 +1150,10 @@ def find_similar_anime(token, anchor_anime, watched_ids):
     main_genre_id = GENRE_IDS.get(main_genre)
     secondary_genre_id = GENRE_IDS.get(secondary_genre) if secondary_genre else None
     
-    # Fetch top-ranked anime by popularity and filter by genre
     all_candidates = {}
-    ranking_url = "https://api.myanimelist.net/v2/anime/ranking"
-    
-    # Fetch popular anime (increased limit for better coverage)
-    params = {
-        "ranking_type": "bypopularity",
-        "limit": 500,  # Increased from 100 to 500
-        "fields": "id,title,main_picture,genres,themes,mean,popularity,num_list_users"
-    }
-    
     search_results = []
-    response = requests.get(ranking_url, headers=headers, params=params)
-    
-    if response.status_code == 200:
-        for item in response.json().get("data", []):
+    if ranking_data:
+        for item in ranking_data:
             anime = item["node"]
             anime_genre_ids = [g.get("id") for g in anime.get("genres", [])]
             
@@ -1172,21 +1336,32 @@ def extract_base_title(title):
     return base.strip()
 
 
-def search_by_genre(token, genre_name, watched_ids, limit=10):
-    """Search anime by genre"""
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.myanimelist.net/v2/anime"
-    params = {
+def genre_search_params(genre_name):
+    return {
         "q": genre_name,
         "limit": 50,
         "fields": "id,title,main_picture,mean,popularity,genres,num_list_users"
     }
-    
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code != 200:
+
+
+def fetch_candidate_pool(user_id, token, params):
+    """MAL search results behind a recommendation section, cached per user until their next sync"""
+    return recommendation_cache.get_pool(
+        user_id, "/anime", params,
+        lambda: mal_client.get("/anime", token, params=params, timeout=RECOMMENDATION_MAL_TIMEOUT).get("data", []),
+    )
+
+
+def search_by_genre(user_id, token, genre_name, watched_ids, limit=10):
+    """Search anime by genre"""
+    try:
+        results = fetch_candidate_pool(user_id, token, genre_search_params(genre_name))
+    except MALError:
         return []
-    
-    results = response.json().get("data", [])
+    return filter_genre_results(results, genre_name, watched_ids, limit)
+
+
+def filter_genre_results(results, genre_name, watched_ids, limit=10):
     anime_list = []
     seen_base_titles = set()
     
@@ -1222,21 +1397,24 @@ def search_by_genre(token, genre_name, watched_ids, limit=10):
     return sorted(anime_list, key=lambda x: x["score"], reverse=True)[:limit]
 
 
-def search_by_studio(token, studio_name, watched_ids, limit=8):
-    """Search anime by studio"""
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.myanimelist.net/v2/anime"
-    params = {
+def studio_search_params(studio_name):
+    return {
         "q": studio_name,
         "limit": 50,
         "fields": "id,title,main_picture,mean,studios,popularity,num_list_users"
     }
-    
-    response = requests.get(url, headers=headers, params=params)
-    if response.status_code != 200:
+
+
+def search_by_studio(user_id, token, studio_name, watched_ids, limit=8):
+    """Search anime by studio"""
+    try:
+        results = fetch_candidate_pool(user_id, token, studio_search_params(studio_name))
+    except MALError:
         return []
-    
-    results = response.json().get("data", [])
+    return filter_studio_results(results, studio_name, watched_ids, limit)
+
+
+def filter_studio_results(results, studio_name, watched_ids, limit=8):
     anime_list = []
     seen_base_titles = set()
     
@@ -1271,24 +1449,28 @@ def search_by_studio(token, studio_name, watched_ids, limit=8):
     return sorted(anime_list, key=lambda x: x["score"], reverse=True)[:limit]
 
 
-def find_hidden_gems(token, genres, watched_ids):
-    """Find highly-rated but less popular anime"""
-    headers = {"Authorization": f"Bearer {token}"}
-    url = "https://api.myanimelist.net/v2/anime"
-    
+def hidden_gem_params(genre):
+    return {
+        "q": genre,
+        "limit": 30,
+        "fields": "id,title,main_picture,mean,popularity,num_list_users"
+    }
+
+
+def hidden_gem_pool(user_id, token, genre):
+    """Candidates for hidden gems from one genre; ``filter_hidden_gems`` combines the genres"""
+    try:
+        return fetch_candidate_pool(user_id, token, hidden_gem_params(genre))
+    except MALError:
+        return []
+
+
+def filter_hidden_gems(results_by_genre, watched_ids):
     all_gems = []
     seen_base_titles = set()
     
-    for genre in genres[:2]:  # Search top 2 genres
-        params = {
-            "q": genre,
-            "limit": 30,
-            "fields": "id,title,main_picture,mean,popularity,num_list_users"
-        }
-        
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            results = response.json().get("data", [])
+    for results in results_by_genre:
+        if results:
             for item in results:
                 anime = item["node"]
                 if anime["id"] not in watched_ids:
@@ -1495,8 +1677,4 @@ def posthog_proxy(request, path=''):
         
     except Exception as e:
         logger.error(f"[PostHog Proxy Error] {e}")
-        return HttpResponse(
-            json.dumps({'error': str(e)}),
-            status=500,
-            content_type='application/json'
-        )
+        return FastJsonResponse({'error': str(e)}, status=500)
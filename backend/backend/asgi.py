@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run with ``uvicorn backend.asgi:application`` and set ASYNC_VIEWS=True to serve
+the MAL-bound endpoints from api/async_views.py without blocking a thread per
+outbound request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
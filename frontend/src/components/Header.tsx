@@ -2,6 +2,7 @@ import { User } from 'lucide-react';
 import { useState } from 'react';
 import { Menu, X } from 'lucide-react';
 import { clearAuth } from '../utils/auth';
+import { clearAnimeListReplica } from '../utils/animeList';
 
 const Header = ({setIsLoggedIn} : {setIsLoggedIn: React.Dispatch<React.SetStateAction<boolean>>}) => {
     const [isMenuOpen, setIsMenuOpen] = useState(false);
@@ -15,8 +16,9 @@ const Header = ({setIsLoggedIn} : {setIsLoggedIn: React.Dispatch<React.SetStateA
     const handleLogout = async () => {
         console.log('[Header] Logging out user');
         
-        // Clear JWT tokens from localStorage
+        // Clear JWT tokens and the list replica from localStorage
         clearAuth();
+        clearAnimeListReplica();
         
         // Update logged-in state
         setIsLoggedIn(false);
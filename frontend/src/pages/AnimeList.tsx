@@ -5,27 +5,15 @@ import { Link } from 'react-router-dom';
 import Header from '../components/Header';
 import Footer from '../components/Footer';
 import LoadingScreen from '../components/LoadingScreen';
-import { API_URL } from '../config';
-import { authFetch } from '../utils/fetch';
+import { describeProgress, syncAnimeList, SyncProgress } from '../utils/sync';
 import { isAuthenticated } from '../utils/auth';
-
-type AnimeEntry = {
-    mal_id: number;
-    title: string;
-    image_url: string;
-    status: string;
-    score: number;
-    episodes_watched: number;
-    is_rewatching: boolean;
-    start_date: string;
-    finish_date: string;
-    last_updated: string;
-};
+import { AnimeEntry, loadAnimeList } from '../utils/animeList';
 
 const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLoggedIn: React.Dispatch<React.SetStateAction<boolean>>}) => {
     const [animeList, setAnimeList] = useState<AnimeEntry[]>([]);
     const [loading, setLoading] = useState(true);
     const [syncing, setSyncing] = useState(false);
+    const [syncProgress, setSyncProgress] = useState<SyncProgress | null>(null);
     const [authChecked, setAuthChecked] = useState(false);
     const [filterStatus, setFilterStatus] = useState<string>('all');
     const [sortBy, setSortBy] = useState<string>('title');
@@ -42,11 +30,7 @@ const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLogg
       
     // Anime list loader
     const loadAnime = async () => {
-        const res = await authFetch(`${API_URL}/api/cached-animelist/`);
-        if (res.ok) {
-            const data: AnimeEntry[] = await res.json();
-            setAnimeList(data);
-        }
+        setAnimeList(await loadAnimeList());
         setLoading(false);
     };
 
@@ -57,8 +41,8 @@ const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLogg
         setSyncing(true);
         const start = Date.now();
       
-        const res = await authFetch(`${API_URL}/api/sync-animelist/`);
-        if (res.ok) {
+        const job = await syncAnimeList(setSyncProgress);
+        if (job?.status === 'succeeded') {
           await loadAnime();
         }
       
@@ -67,6 +51,7 @@ const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLogg
             await delay(minDuration - elapsed);
         }
         setSyncing(false);
+        setSyncProgress(null);
     };
     
     // Load list after confirming session
@@ -77,16 +62,13 @@ const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLogg
             setSyncing(true);
         
             // 1) Fetch cached data directly:
-            const cacheRes = await authFetch(`${API_URL}/api/cached-animelist/`);
-            const cacheData: AnimeEntry[] = cacheRes.ok ? await cacheRes.json() : [];
+            const cacheData = await loadAnimeList();
         
             // 2) If cache was empty, sync from MAL:
             if (cacheData.length === 0) {
-                await authFetch(`${API_URL}/api/sync-animelist/`);
+                await syncAnimeList(setSyncProgress);
                 // 3) Re-fetch cache after sync:
-                const updatedRes = await authFetch(`${API_URL}/api/cached-animelist/`);
-                const updatedData: AnimeEntry[] = updatedRes.ok ? await updatedRes.json() : [];
-                setAnimeList(updatedData);
+                setAnimeList(await loadAnimeList());
             } else {
                 // If cache wasn’t empty, just use it
                 setAnimeList(cacheData);
@@ -94,6 +76,7 @@ const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLogg
         
             setLoading(false);
             setSyncing(false);
+            setSyncProgress(null);
             })();
         }
     }, [authChecked, isLoggedIn]);
@@ -189,7 +172,7 @@ const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLogg
                                 {syncing ? (
                                     <>
                                         <RefreshCw className="h-4.5 w-4.5 mr-1 animate-spin" />
-                                        Syncing...
+                                        {describeProgress(syncProgress)}
                                     </>
                                 ) : (
                                     <>
@@ -406,7 +389,7 @@ const AnimeList = ({isLoggedIn, setIsLoggedIn} : {isLoggedIn: boolean, setIsLogg
                             disabled={syncing}
                             className="bg-gradient-to-r from-pink-500 to-purple-500 hover:from-pink-600 hover:to-purple-600 text-white px-8 py-3 rounded-full shadow-lg shadow-purple-500/30 disabled:opacity-50"
                         >
-                            {syncing ? 'Syncing...' : 'Sync with MyAnimeList'}
+                            {syncing ? describeProgress(syncProgress) : 'Sync with MyAnimeList'}
                         </button>
                     </div>
                 </div>
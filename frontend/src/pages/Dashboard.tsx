@@ -6,6 +6,8 @@ import Footer from '../components/Footer';
 import LoadingScreen from '../components/LoadingScreen';
 import { API_URL } from '../config';
 import { authFetch } from '../utils/fetch';
+import { syncAnimeList } from '../utils/sync';
+import { loadAnimeList } from '../utils/animeList';
 
 type Profile = {
     name: string;
@@ -22,18 +24,17 @@ type AnimeEntry = {
     last_updated: string;
 };
 
-type StatsData = {
-    title: string;
-    score: number;
-    genres: string[];
-    num_episodes: number;
-    average_episode_duration: number;
+type StatsSummary = {
+    completed_count: number;
+    total_watch_minutes: number;
+    average_score: number | null;
+    genres: { name: string; count: number }[];
 };
 
 const Dashboard = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
     const [profile, setProfile] = useState<Profile | null>(null);
     const [animeList, setAnimeList] = useState<AnimeEntry[]>([]);
-    const [statsData, setStatsData] = useState<StatsData[]>([]);
+    const [statsData, setStatsData] = useState<StatsSummary | null>(null);
     const [loading, setLoading] = useState(true);
     const [syncing, setSyncing] = useState(false);
 
@@ -47,10 +48,7 @@ const Dashboard = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
         }
 
         // Fetch anime list
-        const animeRes = await authFetch(`${API_URL}/api/cached-animelist/`);
-        if (animeRes.ok) {
-            setAnimeList(await animeRes.json());
-        }
+        setAnimeList(await loadAnimeList());
 
         // Fetch stats data
         const statsRes = await authFetch(`${API_URL}/api/stats-data/`);
@@ -68,7 +66,7 @@ const Dashboard = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
         await authFetch(`${API_URL}/api/sync-profile/`);
 
         // Sync anime list
-        await authFetch(`${API_URL}/api/sync-animelist/`);
+        await syncAnimeList();
 
         // Reload all data
         await loadData();
@@ -94,29 +92,15 @@ const Dashboard = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
         .slice(0, 6);
 
     // Calculate quick stats
-    const totalCompleted = statsData.length;
-    const totalTimeMinutes = statsData.reduce((total, anime) => {
-        const eps = anime.num_episodes || 0;
-        const dur = anime.average_episode_duration || 0;
-        return total + (eps * dur) / 60;
-    }, 0);
-    const totalDays = Math.floor(totalTimeMinutes / 60 / 24);
+    const totalCompleted = statsData?.completed_count ?? 0;
+    const totalDays = Math.floor((statsData?.total_watch_minutes ?? 0) / 60 / 24);
 
-    const avgScore = statsData.length > 0 
-        ? (statsData.reduce((sum, a) => sum + (a.score || 0), 0) / statsData.filter(a => a.score > 0).length).toFixed(1)
-        : 0;
+    const avgScore = statsData?.average_score != null ? statsData.average_score.toFixed(1) : 0;
 
     // Top genres
-    const genreMap = new Map<string, number>();
-    statsData.forEach(anime => {
-        anime.genres?.forEach(genre => {
-            genreMap.set(genre, (genreMap.get(genre) || 0) + 1);
-        });
-    });
-    const topGenres = Array.from(genreMap.entries())
-        .sort((a, b) => b[1] - a[1])
+    const topGenres = (statsData?.genres ?? [])
         .slice(0, 5)
-        .map(([name]) => name);
+        .map(({ name }) => name);
 
     return (
         <div className="min-h-screen bg-gradient-to-b from-gray-900 to-fuchsia-950 text-white">
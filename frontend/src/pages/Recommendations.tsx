@@ -78,7 +78,7 @@ const Recommendations = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
     };
 
     const loadUserAnimeList = async () => {
-        const res = await authFetch(`${API_URL}/api/cached-animelist/`);
+        const res = await authFetch(`${API_URL}/api/cached-animelist/?status=completed&fields=title,status,score`);
         if (res.ok) {
             const data = await res.json();
             console.log('[AI Chat] Fetched anime list:', data.length, 'total anime');
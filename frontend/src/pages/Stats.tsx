@@ -7,18 +7,35 @@ import LoadingScreen from '../components/LoadingScreen';
 import { API_URL } from '../config';
 import { authFetch } from '../utils/fetch';
 
-type AnimeEntry = {
-    title: string;
-    score: number;
-    genres: string[];
-    studios: string[];
-    num_episodes: number;
-    average_episode_duration: number; // in seconds
-    media_type: string;
+type RankedCount = {
+    name: string;
+    count: number;
+};
+
+type StatsSummary = {
+    completed_count: number;
+    total_watch_minutes: number;
+    average_score: number | null;
+    genres: RankedCount[];
+    studios: RankedCount[];
+    media_types: RankedCount[];
+    score_histogram: { score: number; count: number }[];
+    top_rated: string[];
+};
+
+const EMPTY_STATS: StatsSummary = {
+    completed_count: 0,
+    total_watch_minutes: 0,
+    average_score: null,
+    genres: [],
+    studios: [],
+    media_types: [],
+    score_histogram: [],
+    top_rated: [],
 };
 
 const Stats = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
-    const [animeList, setAnimeList] = useState<AnimeEntry[]>([]);
+    const [stats, setStats] = useState<StatsSummary>(EMPTY_STATS);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
@@ -26,7 +43,7 @@ const Stats = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
             const res = await authFetch(`${API_URL}/api/stats-data/`);
             if (res.ok) {
                 const data = await res.json();
-                setAnimeList(data);
+                setStats(data);
             }
             setLoading(false);
         })();
@@ -38,57 +55,26 @@ const Stats = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
         </div>
     );
 
-    // ---------- Breakdown Functions ----------
-    const countBy = (key: keyof AnimeEntry, flatten = false) => {
-        const map = new Map<string, number>();
-        animeList.forEach((anime) => {
-            const values = flatten ? (anime[key] as string[]) : [anime[key] as string];
-            values.forEach((v) => {
-                if (!v) return;
-                map.set(v, (map.get(v) || 0) + 1);
-            });
-        });
-        return Array.from(map.entries())
-            .map(([name, count]) => ({ name, count }))
-            .sort((a, b) => b.count - a.count);
-    };
-
-    const genreData = countBy('genres', true).slice(0, 10);
-    const studioData = countBy('studios', true).slice(0, 10);
+    // ---------- Breakdowns (aggregated server-side) ----------
+    const genreData = stats.genres.slice(0, 10);
+    const studioData = stats.studios.slice(0, 10);
     
     // Score distribution
-    const scoreMap = new Map<number, number>();
-    animeList.forEach(anime => {
-        if (anime.score > 0) {
-            scoreMap.set(anime.score, (scoreMap.get(anime.score) || 0) + 1);
-        }
-    });
-    const scoreData = Array.from(scoreMap.entries())
-        .map(([score, count]) => ({ name: score.toString(), count }))
-        .sort((a, b) => parseInt(a.name) - parseInt(b.name));
+    const scoreData = stats.score_histogram
+        .map(({ score, count }) => ({ name: score.toString(), count }));
 
-    // Total time calculation
-    const totalTimeMinutes = animeList.reduce((total, anime) => {
-        const eps = anime.num_episodes || 0;
-        const dur = anime.average_episode_duration || 0;
-        return total + (eps * dur) / 60;
-    }, 0);
-    const totalHours = Math.round(totalTimeMinutes / 60);
+    // Total time
+    const totalHours = Math.round(stats.total_watch_minutes / 60);
     const totalDays = Math.floor(totalHours / 24);
 
     // Top rated anime (10s)
-    const topRated = animeList
-        .filter(a => a.score === 10)
-        .slice(0, 5);
+    const topRated = stats.top_rated
+        .slice(0, 5)
+        .map(title => ({ title }));
 
     // Media type breakdown
-    const mediaTypeMap = new Map<string, number>();
-    animeList.forEach(anime => {
-        const type = anime.media_type || 'unknown';
-        mediaTypeMap.set(type, (mediaTypeMap.get(type) || 0) + 1);
-    });
-    const mediaTypeData = Array.from(mediaTypeMap.entries())
-        .map(([name, value]) => ({ name: name.toUpperCase(), value }));
+    const mediaTypeData = stats.media_types
+        .map(({ name, count }) => ({ name: name.toUpperCase(), value: count }));
 
     // Color palettes
     const GENRE_COLORS = ['#c084fc', '#a855f7', '#9333ea', '#7e22ce', '#6b21a8'];
@@ -97,9 +83,7 @@ const Stats = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
     const PIE_COLORS = ['#c084fc', '#f472b6', '#7dd3fc', '#fbbf24', '#34d399'];
 
     // Calculate average score
-    const avgScore = animeList.length > 0 
-        ? (animeList.reduce((sum, a) => sum + (a.score || 0), 0) / animeList.filter(a => a.score > 0).length).toFixed(2)
-        : 0;
+    const avgScore = stats.average_score !== null ? stats.average_score.toFixed(2) : 0;
 
     return (
         <div className="min-h-screen bg-gradient-to-b from-gray-900 to-fuchsia-950 text-white">
@@ -116,7 +100,7 @@ const Stats = ({ setIsLoggedIn }: { setIsLoggedIn: any }) => {
                         <div className="flex items-center justify-between">
                             <div>
                                 <p className="text-sm opacity-80 mb-1">Total Completed</p>
-                                <p className="text-3xl font-bold">{animeList.length}</p>
+                                <p className="text-3xl font-bold">{stats.completed_count}</p>
                             </div>
                             <div className="icon">
                                 <Film size={24} />
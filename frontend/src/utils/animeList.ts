@@ -0,0 +1,97 @@
+/**
+ * Local replica of the user's cached anime list. The first load downloads
+ * the whole list and remembers its watermark; after that only the entries
+ * changed or deleted since then are fetched (`?since=`) and merged in, so a
+ * sync that touched a few entries costs a few rows instead of the whole list.
+ */
+import { API_URL } from '../config';
+import { authFetch } from './fetch';
+import { getUserData } from './auth';
+
+export interface AnimeEntry {
+    mal_id: number;
+    title: string;
+    image_url: string;
+    status: string;
+    score: number;
+    episodes_watched: number;
+    is_rewatching: boolean;
+    start_date: string;
+    finish_date: string;
+    last_updated: string;
+}
+
+interface Replica {
+    username: string;
+    watermark: string;
+    entries: AnimeEntry[];
+}
+
+interface Delta {
+    watermark: string;
+    deleted: number[];
+    changed: AnimeEntry[];
+}
+
+const REPLICA_KEY = 'anime_list_replica';
+
+const readReplica = (): Replica | null => {
+    const data = localStorage.getItem(REPLICA_KEY);
+    if (!data) return null;
+    try {
+        const replica: Replica = JSON.parse(data);
+        // Another account logged in on this browser since
+        return replica.username === getUserData()?.username ? replica : null;
+    } catch {
+        return null;
+    }
+};
+
+const writeReplica = (watermark: string, entries: AnimeEntry[]) => {
+    const username = getUserData()?.username;
+    if (!username) return;
+    try {
+        localStorage.setItem(REPLICA_KEY, JSON.stringify({ username, watermark, entries }));
+    } catch {
+        // Over the storage quota: keep doing full loads
+        localStorage.removeItem(REPLICA_KEY);
+    }
+};
+
+export const clearAnimeListReplica = () => {
+    localStorage.removeItem(REPLICA_KEY);
+};
+
+const loadFullList = async (): Promise<AnimeEntry[]> => {
+    const res = await authFetch(`${API_URL}/api/cached-animelist/`);
+    if (!res.ok) return [];
+    const entries: AnimeEntry[] = await res.json();
+    const watermark = res.headers.get('X-Watermark');
+    if (watermark) {
+        writeReplica(watermark, entries);
+    }
+    return entries;
+};
+
+/** The user's list: the local replica brought up to date, or a full download */
+export const loadAnimeList = async (): Promise<AnimeEntry[]> => {
+    const replica = readReplica();
+    if (!replica) return loadFullList();
+
+    const params = new URLSearchParams({ since: replica.watermark });
+    const res = await authFetch(`${API_URL}/api/cached-animelist/?${params}`);
+    if (!res.ok) {
+        // 410: the replica is older than the server's change history
+        console.log(`[AnimeList] Delta failed (${res.status}), reloading the whole list`);
+        return loadFullList();
+    }
+
+    const delta: Delta = await res.json();
+    const entries = new Map(replica.entries.map(entry => [entry.mal_id, entry]));
+    delta.deleted.forEach(malId => entries.delete(malId));
+    delta.changed.forEach(entry => entries.set(entry.mal_id, entry));
+    const merged = [...entries.values()];
+    writeReplica(delta.watermark, merged);
+    console.log(`[AnimeList] Delta: ${delta.changed.length} changed, ${delta.deleted.length} deleted`);
+    return merged;
+};
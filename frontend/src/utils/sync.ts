@@ -0,0 +1,163 @@
+/**
+ * Anime list sync helpers. The backend queues syncs as background jobs and
+ * answers 202 with a job id, so callers wait here until the job finishes:
+ * by following the job's Server-Sent Events stream, or by polling its status.
+ * The stream is only served by the ASGI backend; the WSGI one answers 406,
+ * after which this page polls straight away for the rest of its life. Polled
+ * statuses carry the same progress record, so progress still shows.
+ */
+import { API_URL } from '../config';
+import { authFetch } from './fetch';
+
+export interface SyncJob {
+    job_id: number;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    result: { pages: number; created: number; updated: number; deleted: number; unchanged: number } | null;
+    error: string | null;
+    progress?: SyncProgress;
+}
+
+export interface SyncProgress {
+    job_id: number;
+    status: SyncJob['status'];
+    phase: 'queued' | 'fetching' | 'syncing' | 'pruning' | 'stats' | 'done' | 'failed';
+    pages: number;
+    rows_upserted: number;
+    expected_pages?: number;
+    eta_seconds: number | null;
+    result: SyncJob['result'];
+    error: string | null;
+}
+
+type ProgressCallback = (progress: SyncProgress) => void;
+
+const POLL_INTERVAL_MS = 1000;
+const MAX_WAIT_MS = 5 * 60 * 1000;
+
+// Set once the backend answers 406 for a progress stream (WSGI deployment)
+let progressStreamsUnavailable = false;
+
+const delay = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+/** Short label for a sync button, e.g. "Syncing 2/4 pages (~3s)" */
+export const describeProgress = (progress: SyncProgress | null): string => {
+    if (!progress || progress.phase === 'queued' || progress.phase === 'fetching') {
+        return 'Syncing...';
+    }
+    if (progress.phase !== 'syncing') {
+        return 'Finishing up...';
+    }
+    const pages = progress.expected_pages ? `${progress.pages}/${progress.expected_pages}` : `${progress.pages}`;
+    const eta = progress.eta_seconds != null ? ` (~${Math.ceil(progress.eta_seconds)}s)` : '';
+    return `Syncing ${pages} pages${eta}`;
+};
+
+const isActive = (status: SyncJob['status']) => status === 'queued' || status === 'running';
+
+/**
+ * Parse an SSE body into ``[event, data]`` pairs. EventSource can't send the
+ * JWT header, so the stream is read from fetch instead.
+ */
+async function* readEvents(res: Response): AsyncGenerator<[string, string]> {
+    const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            return;
+        }
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+            let event = 'message';
+            const data: string[] = [];
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data.push(line.slice(6));
+            }
+            if (data.length) {
+                yield [event, data.join('\n')];
+            }
+        }
+    }
+}
+
+/**
+ * Follow the job's progress stream until its ``done`` event. Resolves with
+ * the finished job, or null if the stream ended early or isn't served.
+ */
+const streamJob = async (jobId: number, onProgress?: ProgressCallback): Promise<SyncJob | null> => {
+    try {
+        const res = await authFetch(`${API_URL}/api/sync-progress/${jobId}/`, {
+            headers: { Accept: 'text/event-stream' },
+        });
+        if (res.status === 406) {
+            console.info('[Sync] Progress streams are not served by this backend, polling sync-status');
+            progressStreamsUnavailable = true;
+            return null;
+        }
+        if (!res.ok || !res.body) {
+            return null;
+        }
+        for await (const [event, data] of readEvents(res)) {
+            if (event !== 'progress' && event !== 'done') {
+                continue;
+            }
+            const progress: SyncProgress = JSON.parse(data);
+            onProgress?.(progress);
+            if (event === 'done') {
+                return { job_id: progress.job_id, status: progress.status, result: progress.result, error: progress.error };
+            }
+        }
+    } catch (error) {
+        console.warn('[Sync] Progress stream failed, polling instead:', error);
+    }
+    return null;
+};
+
+/** Poll the job's status until it finishes, passing each progress record on */
+const pollJob = async (job: SyncJob, onProgress?: ProgressCallback): Promise<SyncJob | null> => {
+    const deadline = Date.now() + MAX_WAIT_MS;
+
+    while (isActive(job.status)) {
+        if (Date.now() > deadline) {
+            console.warn('[Sync] Gave up waiting for sync job', job.job_id);
+            return null;
+        }
+        await delay(POLL_INTERVAL_MS);
+        const statusRes = await authFetch(`${API_URL}/api/sync-status/${job.job_id}/`);
+        if (!statusRes.ok) {
+            return null;
+        }
+        job = await statusRes.json();
+        if (job.progress) {
+            onProgress?.(job.progress);
+        }
+    }
+    return job;
+};
+
+/**
+ * Start (or join) a list sync and resolve with the finished job,
+ * or null if it could not be queued or did not finish in time.
+ * ``onProgress`` receives live progress (phase, pages, ETA) while it runs.
+ */
+export const syncAnimeList = async (onProgress?: ProgressCallback): Promise<SyncJob | null> => {
+    const res = await authFetch(`${API_URL}/api/sync-animelist/`);
+    if (!res.ok) {
+        return null;
+    }
+
+    let job: SyncJob | null = await res.json();
+    if (job && isActive(job.status)) {
+        const streamed = progressStreamsUnavailable ? null : await streamJob(job.job_id, onProgress);
+        job = streamed ?? (await pollJob(job, onProgress));
+    }
+
+    if (job?.status === 'failed') {
+        console.error('[Sync] Sync failed:', job.error);
+    }
+    return job;
+};